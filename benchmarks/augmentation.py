@@ -0,0 +1,49 @@
+"""
+Throughput of the batch augmentations, in samples per second on a single core.
+
+Run with:
+
+    python -m benchmarks.augmentation
+"""
+import time
+
+import numpy as np
+
+from learn.data_management.augmentation import ImageAffineAugmentation, SkeletonAugmentation
+
+BATCH_SIZE = 128
+N_REPEATS = 50
+
+
+def samples_per_second(augmentation, batch):
+    # warm-up, allocates the output buffers
+    augmentation(batch)
+
+    start = time.time()
+    for _ in range(N_REPEATS):
+        augmentation(batch)
+    return N_REPEATS * len(batch) / (time.time() - start)
+
+
+def main():
+    random = np.random.RandomState(0)
+    images = random.uniform(size=(BATCH_SIZE, 28, 28, 1)).astype(np.float32)
+    # (batch, frames, bodies * joints * 3), as the skeleton provider yields it
+    sequences = random.normal(size=(BATCH_SIZE, 300, 2 * 25 * 3)).astype(np.float32)
+
+    configurations = [
+        ("mnist affine", ImageAffineAugmentation(rotation_range=10, shear_range=10,
+                                                 zoom_range=0.1, shift_range=0.1), images),
+        ("skeleton rotation + scale", SkeletonAugmentation(rotation_range=(10, 45, 10),
+                                                           scale_range=0.1), sequences),
+        ("skeleton crop + rotation", SkeletonAugmentation(rotation_range=(10, 45, 10),
+                                                          crop_length=100), sequences),
+    ]
+
+    print("{:<32}{:>20}".format("augmentation", "samples / s"))
+    for name, augmentation, batch in configurations:
+        print("{:<32}{:>20.0f}".format(name, samples_per_second(augmentation, batch)))
+
+
+if __name__ == "__main__":
+    main()
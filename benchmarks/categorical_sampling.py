@@ -0,0 +1,57 @@
+"""
+Benchmark of the Categorical sampling modes (multinomial vs. Gumbel) at large batch sizes.
+
+Run with:
+
+    python -m benchmarks.categorical_sampling
+"""
+import time
+
+import numpy as np
+import keras.backend as K
+
+from learn.stats.distributions import Categorical
+
+N_CLASSES = 10
+BATCH_SIZES = [128, 1024, 8192, 65536]
+N_REPEATS = 50
+
+
+def time_sampling(dist, batch_size, with_gradients=False):
+    p_vals = K.placeholder(shape=(None, N_CLASSES))
+    samples = dist.sample({'p_vals': p_vals})
+    outputs = [samples]
+    if with_gradients:
+        outputs += K.gradients(K.sum(samples * K.arange(N_CLASSES, dtype=K.floatx())), [p_vals])
+
+    sample_fn = K.function(inputs=[p_vals], outputs=outputs)
+    feed = np.ones((batch_size, N_CLASSES), dtype=np.float32) / N_CLASSES
+
+    # warm-up, the first call includes the graph setup
+    sample_fn([feed])
+
+    start = time.time()
+    for _ in range(N_REPEATS):
+        sample_fn([feed])
+    return (time.time() - start) / N_REPEATS
+
+
+def main():
+    configurations = [
+        ("multinomial", Categorical(N_CLASSES, sampling="multinomial"), False),
+        ("gumbel_max", Categorical(N_CLASSES, sampling="gumbel_max"), False),
+        ("gumbel_softmax", Categorical(N_CLASSES, sampling="gumbel_softmax",
+                                       straight_through=False), True),
+        ("gumbel_softmax (straight-through)", Categorical(N_CLASSES, sampling="gumbel_softmax",
+                                                          straight_through=True), True),
+    ]
+
+    print("{:<36}{:>12}{:>16}".format("sampling", "batch size", "ms / call"))
+    for batch_size in BATCH_SIZES:
+        for name, dist, with_gradients in configurations:
+            seconds = time_sampling(dist, batch_size, with_gradients)
+            print("{:<36}{:>12}{:>16.3f}".format(name, batch_size, seconds * 1000))
+
+
+if __name__ == "__main__":
+    main()
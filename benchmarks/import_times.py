@@ -0,0 +1,52 @@
+"""
+Benchmark of the import time of the learn subpackages. Every import runs in a fresh
+interpreter, the reported time is the median over several runs.
+
+Run with:
+
+    python -m benchmarks.import_times
+
+For a per-module breakdown of a single import use python -X importtime -c "import <module>".
+"""
+import subprocess
+import sys
+
+MODULES = [
+    "learn",
+    "learn.stats.distributions",
+    "learn.networks.registry",
+    "learn.networks.convnets",
+    "learn.models.infogan",
+    "learn.train",
+    "learn.train.observers",
+    "learn.train.observers.logger",
+    "learn.train.observers.infogan_tensorboard",
+    "learn.data_management",
+    "learn.data_management.mnist_semi_supervised",
+    "learn.utils.visualization",
+    "learn.utils.skeleton_movies",
+]
+N_RUNS = 5
+
+TIMING_SCRIPT = "import time; start = time.time(); import {}; print(time.time() - start)"
+
+
+def import_seconds(module):
+    output = subprocess.check_output([sys.executable, "-c", TIMING_SCRIPT.format(module)],
+                                     stderr=subprocess.DEVNULL)
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    print("{:<46}{:>14}".format("module", "median [ms]"))
+    for module in MODULES:
+        try:
+            runs = sorted(import_seconds(module) for _ in range(N_RUNS))
+        except subprocess.CalledProcessError:
+            print("{:<46}{:>14}".format(module, "failed"))
+            continue
+        print("{:<46}{:>14.1f}".format(module, runs[N_RUNS // 2] * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Memory / time tradeoff of gradient checkpointing (checkpoint_segment_length) in the recurrent
+InfoGAN networks, for a training step (forward + backward) on NTU-sized skeleton sequences.
+
+Every configuration runs in a fresh interpreter, the memory is the growth of the peak resident
+memory of the process over the training steps, i.e. after the graph has been built:
+
+    python -m benchmarks.recurrent_checkpointing
+
+The sequences are random unless a skeleton store (see learn.data_management.skeleton_store)
+is given, the first body of its first sequences is used then:
+
+    python -m benchmarks.recurrent_checkpointing skeletons_store
+"""
+import resource
+import subprocess
+import sys
+import time
+
+BATCH_SIZE = 64
+DATA_DIM = 25 * 3
+LATENT_DIM = 74
+SEQUENCE_LENGTHS = [150, 300]
+# None is the plain network, without recomputation
+SEGMENT_LENGTHS = [None, 100, 50, 25]
+N_REPEATS = 5
+
+
+def peak_memory_mb():
+    # ru_maxrss is in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+
+def load_sequences(store_dir, recurrent_dim):
+    import numpy as np
+
+    if store_dir is None:
+        return np.random.normal(size=(BATCH_SIZE, recurrent_dim, DATA_DIM)).astype(np.float32)
+
+    from learn.data_management.skeleton_store import SkeletonStore
+    data = SkeletonStore(store_dir).padded("xyz", max_frames=recurrent_dim, max_bodies=1)
+    assert len(data) >= BATCH_SIZE, "The store needs at least {} sequences.".format(BATCH_SIZE)
+    return data[:BATCH_SIZE].reshape((BATCH_SIZE, recurrent_dim, DATA_DIM))
+
+
+def run(network_name, recurrent_dim, segment_length, store_dir=None):
+    import numpy as np
+    import keras.backend as K
+    from learn.networks.rnns import RNNSharedNet, RNNGeneratorNetwork
+
+    if network_name == "shared":
+        network = RNNSharedNet(recurrent_dim=recurrent_dim, data_shape=(DATA_DIM, ),
+                               checkpoint_segment_length=segment_length)
+        feed = load_sequences(store_dir, recurrent_dim)
+    else:
+        network = RNNGeneratorNetwork(recurrent_dim=recurrent_dim, latent_dim=LATENT_DIM,
+                                      data_dim=DATA_DIM, q_data_params_dim=2,
+                                      checkpoint_segment_length=segment_length)
+        feed = np.random.normal(size=(BATCH_SIZE, recurrent_dim, LATENT_DIM)) \
+            .astype(np.float32)
+
+    inputs = K.placeholder(shape=(None, ) + feed.shape[1:])
+    outputs = network.apply(inputs)
+    grads = K.gradients(K.sum(K.square(outputs)), network.model.trainable_weights)
+    step_fn = K.function(inputs=[inputs, K.learning_phase()], outputs=grads)
+
+    memory_before = peak_memory_mb()
+    # the first call initializes the variables and the tensorflow kernels
+    step_fn([feed, 1])
+
+    start = time.time()
+    for _ in range(N_REPEATS):
+        step_fn([feed, 1])
+    step_seconds = (time.time() - start) / N_REPEATS
+
+    print("{:<10}{:>8}{:>10}{:>16.0f}{:>14.1f}".format(network_name, recurrent_dim,
+                                                       segment_length or "-",
+                                                       peak_memory_mb() - memory_before,
+                                                       step_seconds * 1000))
+    sys.stdout.flush()
+
+
+def main():
+    if len(sys.argv) > 3:
+        segment_length = int(sys.argv[3]) or None
+        run(sys.argv[1], int(sys.argv[2]), segment_length,
+            sys.argv[4] if len(sys.argv) > 4 else None)
+        return
+
+    store_args = sys.argv[1:2]
+    print("{:<10}{:>8}{:>10}{:>16}{:>14}".format("network", "frames", "segment",
+                                                 "step memory [MB]", "ms / step"))
+    for network_name in ["shared", "generator"]:
+        for recurrent_dim in SEQUENCE_LENGTHS:
+            for segment_length in SEGMENT_LENGTHS:
+                subprocess.check_call([sys.executable, "-m", "benchmarks.recurrent_checkpointing",
+                                       network_name, str(recurrent_dim),
+                                       str(segment_length or 0)] + store_args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark of a training step (forward + backward) of the recurrent InfoGAN networks on
+NTU-sized skeleton sequences (up to 300 frames x 25 joints x 3 coordinates).
+
+Run with:
+
+    python -m benchmarks.recurrent_nets
+"""
+import time
+
+import numpy as np
+import keras.backend as K
+
+from learn.networks.rnns import RNNSharedNet, RNNGeneratorNetwork
+
+BATCH_SIZE = 16
+DATA_DIM = 25 * 3
+LATENT_DIM = 74
+SEQUENCE_LENGTHS = [50, 150, 300]
+N_REPEATS = 10
+
+CONFIGURATIONS = [
+    ("TimeDistributed + GRU", {}),
+    ("fused", {'fused': True}),
+    ("fused + GRU implementation 2", {'fused': True, 'gru_implementation': 2}),
+    ("fused + unrolled", {'fused': True, 'unroll': True}),
+]
+
+
+def time_step(network, input_shape):
+    inputs = K.placeholder(shape=(None, ) + input_shape)
+    outputs = network.apply(inputs)
+    weights = network.model.trainable_weights
+    grads = K.gradients(K.sum(outputs), weights)
+
+    step_fn = K.function(inputs=[inputs, K.learning_phase()], outputs=grads)
+    feed = np.random.normal(size=(BATCH_SIZE, ) + input_shape).astype(np.float32)
+
+    start = time.time()
+    step_fn([feed, 1])
+    build_seconds = time.time() - start
+
+    start = time.time()
+    for _ in range(N_REPEATS):
+        step_fn([feed, 1])
+    return build_seconds, (time.time() - start) / N_REPEATS
+
+
+def main():
+    print("{:<10}{:<32}{:>8}{:>16}{:>16}".format("network", "configuration", "frames",
+                                                 "first call [s]", "ms / step"))
+    for recurrent_dim in SEQUENCE_LENGTHS:
+        for name, config in CONFIGURATIONS:
+            K.clear_session()
+            shared_net = RNNSharedNet(recurrent_dim=recurrent_dim, data_shape=(DATA_DIM, ),
+                                      **config)
+            first, step = time_step(shared_net, (recurrent_dim, DATA_DIM))
+            print("{:<10}{:<32}{:>8}{:>16.2f}{:>16.1f}".format("shared", name, recurrent_dim,
+                                                               first, step * 1000))
+
+            K.clear_session()
+            gen_net = RNNGeneratorNetwork(recurrent_dim=recurrent_dim, latent_dim=LATENT_DIM,
+                                          data_dim=DATA_DIM, q_data_params_dim=1, **config)
+            first, step = time_step(gen_net, (recurrent_dim, LATENT_DIM))
+            print("{:<10}{:<32}{:>8}{:>16.2f}{:>16.1f}".format("generator", name, recurrent_dim,
+                                                               first, step * 1000))
+
+
+if __name__ == "__main__":
+    main()
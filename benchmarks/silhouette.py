@@ -0,0 +1,56 @@
+"""
+Benchmark of the memory bounded silhouette scores against sklearn on growing encoding sets.
+sklearn is skipped above SKLEARN_MAX_N, where its N x N distance matrix gets too large.
+
+Run with:
+
+    python -m benchmarks.silhouette
+"""
+import time
+
+import numpy as np
+
+from learn.evaluation.silhouette import silhouette_score, sampled_silhouette_score
+
+N_CLUSTERS = 10
+ENCODING_DIM = 12
+SIZES = [2500, 10000, 60000]
+SKLEARN_MAX_N = 10000
+
+
+def make_encodings(n, random_state):
+    labels = random_state.randint(N_CLUSTERS, size=n)
+    centers = random_state.normal(scale=3, size=(N_CLUSTERS, ENCODING_DIM))
+    return centers[labels] + random_state.normal(size=(n, ENCODING_DIM)), labels
+
+
+def timed(function, *args, **kwargs):
+    start = time.time()
+    result = function(*args, **kwargs)
+    return result, time.time() - start
+
+
+def main():
+    from sklearn import metrics
+
+    random_state = np.random.RandomState(0)
+
+    print("{:<10}{:<22}{:>12}{:>28}".format("N", "method", "seconds", "score"))
+    for n in SIZES:
+        X, labels = make_encodings(n, random_state)
+
+        if n <= SKLEARN_MAX_N:
+            score, seconds = timed(metrics.silhouette_score, X, labels)
+            print("{:<10}{:<22}{:>12.2f}{:>28.4f}".format(n, "sklearn", seconds, score))
+
+        score, seconds = timed(silhouette_score, X, labels)
+        print("{:<10}{:<22}{:>12.2f}{:>28.4f}".format(n, "chunked", seconds, score))
+
+        (score, (low, high)), seconds = timed(sampled_silhouette_score, X, labels,
+                                              n_samples=2000, random_state=0)
+        print("{:<10}{:<22}{:>12.2f}{:>28}".format(
+            n, "sampled (2000)", seconds, "{:.4f} [{:.4f}, {:.4f}]".format(score, low, high)))
+
+
+if __name__ == "__main__":
+    main()
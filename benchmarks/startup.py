@@ -0,0 +1,147 @@
+"""
+Startup benchmark of the InfoGAN: import time, build time of each stage of the graph and
+latency of the first training steps, for the MNIST and the recurrent (skeleton) configurations.
+Each configuration also encodes a batch of odd size, which the inference paths must handle
+(e.g. the last chunk of a test set, with the grouped batch normalization of the joint pass).
+
+Every configuration runs in a fresh interpreter, so that nothing is imported or built yet:
+
+    python -m benchmarks.startup
+
+or a single configuration in the current interpreter:
+
+    python -m benchmarks.startup recurrent
+"""
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+
+CONFIGURATIONS = ["mnist", "mnist_joint", "recurrent"]
+
+BATCH_SIZE = 32
+RECURRENT_DIM = 300
+SKELETON_DIM = 25 * 3
+
+
+def build_recurrent_infogan(batch_size=BATCH_SIZE, recurrent_dim=RECURRENT_DIM,
+                            data_dim=SKELETON_DIM, windows_per_sequence=None):
+    """
+    build_recurrent_infogan puts together the recurrent InfoGAN for skeleton sequences,
+    with windows_per_sequence set it is built for truncated BPTT over windows of
+    recurrent_dim frames
+    """
+    import numpy as np
+
+    from learn.models.infogan import InfoGAN2, InfoganDiscriminatorImpl, InfoganPriorImpl, \
+        InfoganEncoderImpl, InfoganGeneratorImpl
+    from learn.networks.rnns import RNNGeneratorNetwork, RNNSharedNet, RNNEncoderNetwork, \
+        RNNDiscriminatorNetwork
+    from learn.stats.distributions import Categorical, IsotropicGaussian, IsotropicGaussian2
+
+    meaningful_dists = {'c1': Categorical(n_classes=10),
+                        'c2': IsotropicGaussian(dim=1),
+                        'c3': IsotropicGaussian(dim=1)
+                        }
+    noise_dists = {'z': IsotropicGaussian(dim=62)}
+    # the generator outputs a mean and a std. dev. for each coordinate
+    data_dist = IsotropicGaussian2(dim=1)
+
+    shape = (batch_size, recurrent_dim)
+    prior_params = {'c1': {'p_vals': np.ones(shape + (10, ), dtype=np.float32) / 10},
+                    'c2': {'mean': np.zeros(shape + (1, ), dtype=np.float32),
+                           'std': np.ones(shape + (1, ), dtype=np.float32)},
+                    'c3': {'mean': np.zeros(shape + (1, ), dtype=np.float32),
+                           'std': np.ones(shape + (1, ), dtype=np.float32)},
+                    'z': {'mean': np.zeros(shape + (62, ), dtype=np.float32),
+                          'std': np.ones(shape + (62, ), dtype=np.float32)}
+                    }
+
+    prior = InfoganPriorImpl(meaningful_dists=meaningful_dists,
+                             noise_dists=noise_dists,
+                             prior_params=prior_params,
+                             recurrent_dim=recurrent_dim)
+
+    window_batch_size = batch_size if windows_per_sequence else None
+    gen_net = RNNGeneratorNetwork(recurrent_dim=recurrent_dim, latent_dim=74,
+                                  data_dim=data_dim, q_data_params_dim=2,
+                                  window_batch_size=window_batch_size)
+    generator = InfoganGeneratorImpl(data_shape=(data_dim, ),
+                                     meaningful_dists=meaningful_dists,
+                                     noise_dists=noise_dists,
+                                     data_q_dist=data_dist,
+                                     network=gen_net,
+                                     recurrent_dim=recurrent_dim)
+
+    shared_net = RNNSharedNet(recurrent_dim=recurrent_dim, data_shape=(data_dim, ),
+                              window_batch_size=window_batch_size)
+    discriminator = InfoganDiscriminatorImpl(
+        network=RNNDiscriminatorNetwork(recurrent_dim=recurrent_dim, shared_out_shape=(32, )))
+    encoder = InfoganEncoderImpl(
+        batch_size=batch_size,
+        meaningful_dists=meaningful_dists,
+        supervised_dist=None,
+        network=RNNEncoderNetwork(recurrent_dim=recurrent_dim, shared_out_shape=(32, )),
+        recurrent_dim=recurrent_dim)
+
+    return InfoGAN2(batch_size=batch_size,
+                    data_shape=(data_dim, ),
+                    prior=prior,
+                    generator=generator,
+                    shared_net=shared_net,
+                    discriminator=discriminator,
+                    encoder=encoder,
+                    recurrent_dim=recurrent_dim,
+                    windows_per_sequence=windows_per_sequence)
+
+
+def run(configuration):
+    timings = OrderedDict()
+
+    start = time.time()
+    import numpy as np
+    import learn.models.infogan  # noqa: F401
+    timings['import learn.models.infogan'] = time.time() - start
+
+    start = time.time()
+    if configuration.startswith("mnist"):
+        import main_mnist
+        main_mnist.joint_shared_pass = configuration == "mnist_joint"
+        model = main_mnist.build_infogan(batch_size=BATCH_SIZE)
+        samples = np.random.uniform(size=(BATCH_SIZE, 28, 28, 1)).astype(np.float32)
+    else:
+        model = build_recurrent_infogan()
+        samples = np.random.normal(size=(BATCH_SIZE, RECURRENT_DIM, SKELETON_DIM)) \
+            .astype(np.float32)
+    build_seconds = time.time() - start
+
+    timings['build: networks and prior'] = build_seconds - sum(model.build_timings.values())
+    for stage, seconds in model.build_timings.items():
+        timings['build: {}'.format(stage)] = seconds
+
+    # the first step also creates the keras train functions
+    for step in ["first", "second"]:
+        start = time.time()
+        model.train_on_minibatch(samples)
+        timings['{} training step'.format(step)] = time.time() - start
+
+    start = time.time()
+    model.encode(samples[:BATCH_SIZE - 1])
+    timings['encode {} samples'.format(BATCH_SIZE - 1)] = time.time() - start
+
+    print("== {}".format(configuration))
+    for name, seconds in timings.items():
+        print("{:<40}{:>10.3f} s".format(name, seconds))
+
+
+def main():
+    if len(sys.argv) > 1:
+        run(sys.argv[1])
+        return
+
+    for configuration in CONFIGURATIONS:
+        subprocess.check_call([sys.executable, "-m", "benchmarks.startup", configuration])
+
+
+if __name__ == "__main__":
+    main()
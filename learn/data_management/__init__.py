@@ -1 +1,5 @@
+# the providers import keras' dataset utilities only when they load their data
 from .mnist_semi_supervised import SemiSupervisedMNISTProvider
+from .skeleton_unsupervised import UnsupervisedSkeletonProvider
+from .sharded import ShardedProvider
+from .augmentation import AugmentedProvider, ImageAffineAugmentation, SkeletonAugmentation
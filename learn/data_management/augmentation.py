@@ -0,0 +1,220 @@
+"""
+Random batch augmentations, vectorized over the whole batch. The outputs are written to
+buffers preallocated for the largest batch seen, so a returned batch is only valid until the
+augmentation is called again (the trainers consume each minibatch before asking for the next).
+"""
+import numpy as np
+
+from learn.data_management.interfaces import DataProvider
+
+
+class _Buffers(object):
+    # reusable arrays, grown to the largest requested size
+    def __init__(self):
+        self.arrays = {}
+
+    def get(self, name, shape, dtype):
+        array = self.arrays.get(name)
+        if array is None or array.shape[0] < shape[0] or array.shape[1:] != shape[1:] or \
+                array.dtype != dtype:
+            array = np.empty(shape, dtype=dtype)
+            self.arrays[name] = array
+        return array[:shape[0]]
+
+
+class ImageAffineAugmentation(object):
+    """
+    ImageAffineAugmentation applies a random affine transform (rotation, shear, zoom and
+    shift) to each image of a batch, with bilinear interpolation and zero fill.
+
+    Usage:
+        >>> augment = ImageAffineAugmentation(rotation_range=10, shift_range=0.1)
+        >>> augmented = augment(images)  # images of shape (N, height, width, n_channels)
+    """
+
+    def __init__(self, rotation_range=0., shear_range=0., zoom_range=0., shift_range=0.,
+                 seed=None):
+        """__init__
+
+        :param rotation_range - maximal rotation, in degrees
+        :param shear_range - maximal shear angle, in degrees
+        :param zoom_range - the zoom is drawn from [1 - zoom_range, 1 + zoom_range]
+        :param shift_range - maximal shift, as a fraction of the height and width
+        :param seed - seed of the random transforms
+        """
+        self.rotation_range = np.radians(rotation_range)
+        self.shear_range = np.radians(shear_range)
+        self.zoom_range = zoom_range
+        self.shift_range = shift_range
+        self.random = np.random.RandomState(seed)
+        self.buffers = _Buffers()
+
+    def _transforms(self, n):
+        theta = self.random.uniform(-self.rotation_range, self.rotation_range, n)
+        shear = self.random.uniform(-self.shear_range, self.shear_range, n)
+        zoom = self.random.uniform(1 - self.zoom_range, 1 + self.zoom_range, (n, 2))
+
+        cos, sin = np.cos(theta), np.sin(theta)
+        # rotation @ shear @ zoom, acting on (row, column) coordinates
+        matrices = np.empty((n, 2, 2))
+        matrices[:, 0, 0] = cos * zoom[:, 0]
+        matrices[:, 0, 1] = (cos * np.tan(shear) - sin) * zoom[:, 1]
+        matrices[:, 1, 0] = sin * zoom[:, 0]
+        matrices[:, 1, 1] = (sin * np.tan(shear) + cos) * zoom[:, 1]
+        return matrices
+
+    def __call__(self, images):
+        n, height, width, n_channels = images.shape
+        flat_images = np.ascontiguousarray(images).reshape((-1, n_channels))
+
+        # output pixel coordinates relative to the image center, (height * width, 2)
+        rows, columns = np.mgrid[:height, :width]
+        center = np.array([(height - 1) / 2., (width - 1) / 2.])
+        grid = np.stack([rows.ravel(), columns.ravel()], axis=1) - center
+
+        shifts = self.random.uniform(-self.shift_range, self.shift_range, (n, 1, 2)) * \
+            np.array([height, width])
+        # source coordinates of every output pixel, (n, height * width, 2), given by the
+        # inverses of the drawn transforms
+        inverse_transforms = np.linalg.inv(self._transforms(n))
+        source = np.matmul(grid[None], inverse_transforms.transpose((0, 2, 1)))
+        source += center + shifts
+
+        out = self.buffers.get("out", (n, height, width, n_channels), np.float32)
+        flat_out = out.reshape((n, height * width, n_channels))
+        flat_out[...] = 0
+
+        floor = np.floor(source)
+        fraction = source - floor
+        floor = floor.astype(np.int64)
+        sample_offsets = (np.arange(n) * height * width)[:, None]
+
+        # bilinear interpolation, one gather per corner
+        for d_row in (0, 1):
+            for d_column in (0, 1):
+                corner_rows = floor[..., 0] + d_row
+                corner_columns = floor[..., 1] + d_column
+                weights = (fraction[..., 0] if d_row else 1 - fraction[..., 0]) * \
+                    (fraction[..., 1] if d_column else 1 - fraction[..., 1])
+                valid = (corner_rows >= 0) & (corner_rows < height) & \
+                    (corner_columns >= 0) & (corner_columns < width)
+
+                index = sample_offsets + np.clip(corner_rows, 0, height - 1) * width + \
+                    np.clip(corner_columns, 0, width - 1)
+                flat_out += flat_images[index] * (weights * valid)[..., None]
+
+        return out
+
+
+def _rotation_matrices(angles):
+    """
+    rotation matrices Rz @ Ry @ Rx for a batch of (x, y, z) euler angles, shape (n, 3)
+    """
+    cos, sin = np.cos(angles), np.sin(angles)
+    n = len(angles)
+    ones, zeros = np.ones(n), np.zeros(n)
+
+    rx = np.stack([ones, zeros, zeros,
+                   zeros, cos[:, 0], -sin[:, 0],
+                   zeros, sin[:, 0], cos[:, 0]], axis=1).reshape((n, 3, 3))
+    ry = np.stack([cos[:, 1], zeros, sin[:, 1],
+                   zeros, ones, zeros,
+                   -sin[:, 1], zeros, cos[:, 1]], axis=1).reshape((n, 3, 3))
+    rz = np.stack([cos[:, 2], -sin[:, 2], zeros,
+                   sin[:, 2], cos[:, 2], zeros,
+                   zeros, zeros, ones], axis=1).reshape((n, 3, 3))
+    return np.matmul(rz, np.matmul(ry, rx))
+
+
+class SkeletonAugmentation(object):
+    """
+    SkeletonAugmentation applies a random temporal crop, 3D rotation and scale to each
+    sequence of a batch. The coordinates are the last axis, in groups of 3 (e.g. a batch of
+    shape (N, n_frames, n_bodies, n_joints, 3) or the flattened (N, n_frames, features)).
+    Zero padding stays zero.
+
+    Usage:
+        >>> augment = SkeletonAugmentation(rotation_range=(0, 30, 0), crop_length=64)
+        >>> augmented = augment(sequences)
+    """
+
+    def __init__(self, rotation_range=(0., 0., 0.), scale_range=0., crop_length=None,
+                 seed=None):
+        """__init__
+
+        :param rotation_range - maximal rotation around the x, y and z axes, in degrees
+        :param scale_range - the scale is drawn from [1 - scale_range, 1 + scale_range]
+        :param crop_length - if set, a random window of crop_length frames is taken from
+            the (non padded) frames of each sequence
+        :param seed - seed of the random transforms
+        """
+        self.rotation_range = np.radians(rotation_range)
+        self.scale_range = scale_range
+        self.crop_length = crop_length
+        self.random = np.random.RandomState(seed)
+        self.buffers = _Buffers()
+
+    def _crop(self, sequences):
+        n, n_frames = sequences.shape[:2]
+        assert self.crop_length <= n_frames, "the crop is longer than the sequences"
+        # number of frames before the padding
+        lengths = np.max(np.where(np.any(sequences.reshape((n, n_frames, -1)) != 0, axis=2),
+                                  np.arange(1, n_frames + 1), 0), axis=1)
+        starts = self.random.randint(0, np.maximum(lengths - self.crop_length, 0) + 1)
+        frames = starts[:, None] + np.arange(self.crop_length)
+        return sequences[np.arange(n)[:, None], frames]
+
+    def __call__(self, sequences):
+        if self.crop_length:
+            sequences = self._crop(sequences)
+
+        n = len(sequences)
+        angles = self.random.uniform(-self.rotation_range, self.rotation_range, (n, 3))
+        scales = self.random.uniform(1 - self.scale_range, 1 + self.scale_range, n)
+        transforms = _rotation_matrices(angles) * scales[:, None, None]
+
+        out = self.buffers.get("out", sequences.shape, np.float32)
+        points = np.ascontiguousarray(sequences).reshape((n, -1, 3))
+        # row vectors, so the points are multiplied with the transposed matrices
+        np.matmul(points, transforms.transpose((0, 2, 1)).astype(np.float32),
+                  out=out.reshape((n, -1, 3)))
+        return out
+
+
+class AugmentedProvider(DataProvider):
+    """
+    AugmentedProvider wraps any DataProvider and augments the samples of its training
+    minibatches, the labels and the held out data are passed through unchanged.
+
+    Usage:
+        >>> provider = AugmentedProvider(SemiSupervisedMNISTProvider(batch_size),
+        ...                              ImageAffineAugmentation(rotation_range=10))
+    """
+
+    def __init__(self, provider, augmentation):
+        """__init__
+
+        :param provider - the wrapped DataProvider
+        :param augmentation - callable mapping a batch of samples to augmented samples
+        """
+        self.provider = provider
+        self.augmentation = augmentation
+
+    def iterate_minibatches(self):
+        for samples, labels in self.provider.iterate_minibatches():
+            yield self.augmentation(samples), labels
+
+    def training_data(self):
+        return self.provider.training_data()
+
+    def validation_data(self):
+        return self.provider.validation_data()
+
+    def test_data(self):
+        return self.provider.test_data()
+
+    def __getattr__(self, name):
+        # e.g. batch_size or n_iter of the wrapped provider
+        if name == "provider":
+            raise AttributeError(name)
+        return getattr(self.provider, name)
@@ -1,45 +1,135 @@
-from keras.datasets import mnist
-from keras.preprocessing.image import ImageDataGenerator
-from keras.utils.np_utils import to_categorical
+import numpy as np
 
 from learn.data_management.interfaces import DataProvider
 
 
 class SemiSupervisedMNISTProvider(DataProvider):
 
-    def __init__(self, batch_size, supervision=0.05):
+    def __init__(self, batch_size, supervision=0.05, shuffle=True, labeled_per_batch=None,
+                 seed=0):
+        """__init__
+
+        :param batch_size: training batch size
+        :param supervision: fraction of the training samples that are labeled, the labeled
+            set is fixed for the whole training
+        :param shuffle: shuffle the samples in every epoch
+        :param labeled_per_batch: (optional) number of labeled samples mixed into every
+            batch, the labels of the other samples are all zero (missing). If not set,
+            every 1 / supervision-th batch is a fully labeled batch and the others have no labels
+        :param seed: seed of the labeled set and the shuffling
+        """
         self.batch_size = batch_size
         self.supervision_frequency = int(1 / supervision)
+        self.shuffle = shuffle
+        self.labeled_per_batch = labeled_per_batch
+        self.random = np.random.RandomState(seed)
 
-        (x_train, y_train), (x_test, y_test) = mnist.load_data()
-        x_train = x_train.reshape((-1, 28, 28, 1)) / 255
-        self.x_test = x_test.reshape((-1, 28, 28, 1)) / 255
-        self.y_test = to_categorical(y_test)
+        (x_train, y_train), (x_test, y_test) = self._load_mnist()
+        # float32 right away, so that the batches do not need to be converted at every step
+        x_train = x_train.reshape((-1, 28, 28, 1)).astype(np.float32) / 255
+        self.x_test = x_test.reshape((-1, 28, 28, 1)).astype(np.float32) / 255
+        # one-hot labels
+        self.y_test = np.eye(10)[y_test]
         self.x_train = x_train[1000:]
-        self.y_train = to_categorical(y_train[1000:])
+        self.y_train = np.eye(10, dtype=np.float32)[y_train[1000:]]
         self.x_val = x_train[:1000]
-        self.y_val = to_categorical(y_train[:1000])
+        self.y_val = np.eye(10)[y_train[:1000]]
+
+        n_train = self.x_train.shape[0]
+        n_labeled = int(n_train * supervision)
+        self.labeled_indices = np.sort(self.random.permutation(n_train)[:n_labeled])
+        # an epoch is about a pass over the unlabeled samples, n_iter is rounded down, the
+        # samples left over at the end of an epoch are the first ones of the next epoch
+        self.unlabeled_indices = np.setdiff1d(np.arange(n_train), self.labeled_indices)
+        assert labeled_per_batch is None or 0 < labeled_per_batch <= min(
+            batch_size, len(self.labeled_indices)), "invalid labeled_per_batch"
+
+        if labeled_per_batch:
+            n_unlabeled = batch_size - labeled_per_batch
+            self._unlabeled = self._unlabeled_stream(n_unlabeled)
+            self.n_iter = len(self.unlabeled_indices) // n_unlabeled if n_unlabeled \
+                else n_train // batch_size
+        else:
+            self._unlabeled = self._unlabeled_stream(batch_size)
+            # a labeled batch before every supervision_frequency - 1 unlabeled batches
+            n_unlabeled_batches = len(self.unlabeled_indices) // batch_size
+            if self.supervision_frequency > 1:
+                n_labeled_batches = -(-n_unlabeled_batches // (self.supervision_frequency - 1))
+            else:
+                n_labeled_batches = n_train // batch_size
+            self.n_iter = n_unlabeled_batches + n_labeled_batches
+
+        # the batches are gathered into these buffers, no per batch allocations
+        self.x_buffer = np.empty((batch_size,) + self.x_train.shape[1:], dtype=np.float32)
+        self.y_buffer = np.zeros((batch_size,) + self.y_train.shape[1:], dtype=np.float32)
 
-        self.datagen = ImageDataGenerator(data_format='channels_last')
-        self.datagen.fit(x_train)
+    @staticmethod
+    def _load_mnist():
+        from keras.datasets import mnist
+        return mnist.load_data()
 
-        self.n_iter = self.x_train.shape[0] // self.batch_size
+    def _epoch_order(self, indices):
+        return self.random.permutation(indices) if self.shuffle else indices
 
-        # disable shuffling so that we know that the same samples are used for supervision
-        self.iterator = self.datagen.flow(self.x_train, self.y_train,
-                                          batch_size=self.batch_size,
-                                          shuffle=False)
+    def _labeled_stream(self, n):
+        # cycles through the labeled set, reshuffled on every pass
+        order = self._epoch_order(self.labeled_indices)
+        position = 0
+        while True:
+            if position + n > len(order):
+                order = self._epoch_order(self.labeled_indices)
+                position = 0
+            yield order[position:position + n]
+            position += n
+
+    def _unlabeled_stream(self, n):
+        # passes over the unlabeled samples without a break, a pass is reshuffled when it starts,
+        # the batches that span two passes end the first one and start the next
+        order = self._epoch_order(self.unlabeled_indices)
+        position = 0
+        while True:
+            while position + n > len(order):
+                order = np.concatenate([order[position:],
+                                        self._epoch_order(self.unlabeled_indices)])
+                position = 0
+            yield order[position:position + n]
+            position += n
 
     def iterate_minibatches(self):
-        for i in range(self.n_iter):
-            x_train, y_train = next(self.iterator)
-            minibatch = (x_train, y_train) if i % self.supervision_frequency == 0 \
-                else (x_train, None)
+        # the yielded arrays are reused for the next batch, the indices are always valid,
+        # mode='clip' lets np.take write into the buffers without an intermediate copy
+        if self.labeled_per_batch:
+            n_labeled = self.labeled_per_batch
+            n_unlabeled = self.batch_size - n_labeled
+            labeled = self._labeled_stream(n_labeled)
+
+            for i in range(self.n_iter):
+                labeled_batch = next(labeled)
+                np.take(self.x_train, labeled_batch, axis=0, out=self.x_buffer[:n_labeled],
+                        mode='clip')
+                np.take(self.y_train, labeled_batch, axis=0, out=self.y_buffer[:n_labeled],
+                        mode='clip')
+
+                unlabeled_batch = next(self._unlabeled)
+                np.take(self.x_train, unlabeled_batch, axis=0, out=self.x_buffer[n_labeled:],
+                        mode='clip')
+                # all zero labels mark the samples without a label
+                self.y_buffer[n_labeled:] = 0
 
-            if i == self.n_iter - 1:
-                self.iterator.reset()
+                yield self.x_buffer, self.y_buffer
+        else:
+            labeled = self._labeled_stream(self.batch_size)
 
-            yield minibatch
+            for i in range(self.n_iter):
+                if i % self.supervision_frequency == 0:
+                    batch = next(labeled)
+                    np.take(self.x_train, batch, axis=0, out=self.x_buffer, mode='clip')
+                    np.take(self.y_train, batch, axis=0, out=self.y_buffer, mode='clip')
+                    yield self.x_buffer, self.y_buffer
+                else:
+                    batch = next(self._unlabeled)
+                    np.take(self.x_train, batch, axis=0, out=self.x_buffer, mode='clip')
+                    yield self.x_buffer, None
 
     def training_data(self):
         return self.x_train, self.y_train
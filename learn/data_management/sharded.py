@@ -0,0 +1,292 @@
+"""
+Datasets stored as a directory of fixed-size .npy shards with an index file, for data that
+does not fit into memory. The shards are memory mapped, so only the samples of the current
+batches are read from disk.
+
+Layout of a dataset directory:
+    index.json - number of samples, shard size, sample and label shape/dtype, shard files
+    shard_00000.samples.npy, shard_00000.labels.npy (optional), ...
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from learn.data_management.interfaces import DataProvider
+
+INDEX_FILE = "index.json"
+
+
+class ShardWriter(object):
+    """
+    ShardWriter writes samples (and optionally labels) chunk by chunk into shards of
+    shard_size samples, so the data never needs to be in memory as a whole.
+
+    Usage:
+        >>> with ShardWriter("mnist_shards", shard_size=4096) as writer:
+        ...     for x, y in chunks:
+        ...         writer.write(x, y)
+    """
+
+    def __init__(self, out_dir, shard_size=4096):
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        self.shards = []
+        self.n_samples = 0
+        self.sample_info = None
+        self.label_info = None
+        self._pending = []
+
+        if not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+
+    def write(self, samples, labels=None):
+        """
+        write appends a chunk of samples, the labels are either given for all chunks or none
+        """
+        if self.sample_info is None:
+            self.sample_info = (samples.shape[1:], samples.dtype)
+            self.label_info = None if labels is None else (labels.shape[1:], labels.dtype)
+        assert (labels is None) == (self.label_info is None), \
+            "labels must be given for all chunks or for none"
+
+        self._pending.append((samples, labels))
+        self.n_samples += len(samples)
+        while sum(len(s) for s, _ in self._pending) >= self.shard_size:
+            self._write_shard(self.shard_size)
+
+    def close(self):
+        if self._pending:
+            self._write_shard(sum(len(s) for s, _ in self._pending))
+
+        index = {
+            "n_samples": self.n_samples,
+            "shard_size": self.shard_size,
+            "sample_shape": list(self.sample_info[0]),
+            "sample_dtype": np.dtype(self.sample_info[1]).str,
+            "label_shape": None if self.label_info is None else list(self.label_info[0]),
+            "label_dtype": None if self.label_info is None else np.dtype(self.label_info[1]).str,
+            "shards": self.shards,
+        }
+        with open(os.path.join(self.out_dir, INDEX_FILE), "w") as f:
+            json.dump(index, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+    def _take_pending(self, n):
+        # removes the first n pending samples (and labels), concatenated
+        samples, labels = [], []
+        while n > 0:
+            chunk_samples, chunk_labels = self._pending[0]
+            taken = min(n, len(chunk_samples))
+            samples.append(chunk_samples[:taken])
+            if chunk_labels is not None:
+                labels.append(chunk_labels[:taken])
+
+            if taken == len(chunk_samples):
+                self._pending.pop(0)
+            else:
+                self._pending[0] = (chunk_samples[taken:],
+                                    None if chunk_labels is None else chunk_labels[taken:])
+            n -= taken
+
+        return np.concatenate(samples), np.concatenate(labels) if labels else None
+
+    def _write_shard(self, n):
+        samples, labels = self._take_pending(n)
+        name = "shard_{:05d}".format(len(self.shards))
+
+        shard = {"n": len(samples), "samples": name + ".samples.npy"}
+        np.save(os.path.join(self.out_dir, shard["samples"]), samples)
+        if labels is not None:
+            shard["labels"] = name + ".labels.npy"
+            np.save(os.path.join(self.out_dir, shard["labels"]), labels)
+        self.shards.append(shard)
+
+
+def write_shards(out_dir, samples, labels=None, shard_size=4096):
+    """
+    write_shards converts numpy arrays (or memory mapped arrays) into a sharded dataset
+
+    :param out_dir - directory of the dataset
+    :param samples - array of shape (N, ...)
+    :param labels - (optional) array of shape (N, ...)
+    :param shard_size - number of samples per shard
+    """
+    with ShardWriter(out_dir, shard_size) as writer:
+        for start in range(0, len(samples), shard_size):
+            writer.write(np.asarray(samples[start:start + shard_size]),
+                         None if labels is None else
+                         np.asarray(labels[start:start + shard_size]))
+
+
+class ShardedArray(object):
+    """
+    ShardedArray is a read-only, array-like view of the samples (or labels) of a sharded
+    dataset. Integer arrays and slices gather only the requested rows from the memory
+    mapped shards.
+    """
+
+    def __init__(self, data_dir, field="samples"):
+        with open(os.path.join(data_dir, INDEX_FILE)) as f:
+            index = json.load(f)
+
+        self.index = index
+        self.shards = [np.load(os.path.join(data_dir, shard[field]), mmap_mode='r')
+                       for shard in index["shards"]]
+        self.offsets = np.concatenate([[0], np.cumsum([shard["n"]
+                                                       for shard in index["shards"]])])
+        self.shape = (index["n_samples"],) + tuple(index[field[:-1] + "_shape"])
+        self.dtype = np.dtype(index[field[:-1] + "_dtype"])
+
+    def __len__(self):
+        return self.shape[0]
+
+    def gather(self, indices, out=None):
+        """
+        gather reads the rows of the (global) indices, one np.take per touched shard
+
+        :param indices - integer array
+        :param out - (optional) array of shape (len(indices),) + row shape
+        """
+        indices = np.asarray(indices)
+        if out is None:
+            out = np.empty((len(indices),) + self.shape[1:], dtype=self.dtype)
+
+        shard_ids = np.searchsorted(self.offsets, indices, side='right') - 1
+        for shard_id in np.unique(shard_ids):
+            positions = np.flatnonzero(shard_ids == shard_id)
+            out[positions] = np.take(self.shards[shard_id],
+                                     indices[positions] - self.offsets[shard_id], axis=0)
+        return out
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.gather(np.arange(*item.indices(len(self))))
+        # negative indices count from the end, as for numpy arrays
+        indices = np.asarray(item)
+        if np.any((indices < -len(self)) | (indices >= len(self))):
+            raise IndexError("index out of bounds for {} samples".format(len(self)))
+        indices = np.where(indices < 0, indices + len(self), indices)
+        if indices.ndim == 0:
+            return self.gather(indices[None])[0]
+        return self.gather(indices)
+
+
+class ShardedProvider(DataProvider):
+    """
+    ShardedProvider iterates over minibatches of a sharded dataset (see write_shards()).
+    Each epoch visits the shards in a random order and the samples of a shard in a random
+    order, so reads stay within few shards at a time. Batches are read ahead by worker
+    threads (numpy releases the GIL while gathering from the memory maps).
+
+    Usage:
+        >>> provider = ShardedProvider("mnist_shards/train", batch_size=128,
+        ...                            validation_dir="mnist_shards/val")
+    """
+
+    def __init__(self, data_dir, batch_size, shuffle=True, labels=True, n_workers=2,
+                 prefetch=4, validation_dir=None, test_dir=None, seed=None):
+        """__init__
+
+        :param data_dir - directory of the training shards
+        :param batch_size - training batch size
+        :param shuffle - shuffle the shard order and the samples within the shards
+        :param labels - yield the labels with the samples, if the dataset has labels
+        :param n_workers - number of reader threads, 0 reads in the training thread
+        :param prefetch - maximal number of batches read ahead
+        :param validation_dir, test_dir - (optional) directories of the held out shards
+        :param seed - seed of the shuffling
+        """
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.n_workers = n_workers
+        self.prefetch = prefetch
+        self.random = np.random.RandomState(seed)
+
+        self.x_train = ShardedArray(data_dir, "samples")
+        has_labels = self.x_train.index["label_shape"] is not None
+        self.y_train = ShardedArray(data_dir, "labels") if has_labels else None
+        self.yield_labels = labels and has_labels
+
+        self.validation_dir = validation_dir
+        self.test_dir = test_dir
+        self.n_iter = len(self.x_train) // self.batch_size
+
+    def _epoch_order(self):
+        offsets = self.x_train.offsets
+        shard_order = np.arange(len(self.x_train.shards))
+        if self.shuffle:
+            shard_order = self.random.permutation(shard_order)
+
+        order = []
+        for shard_id in shard_order:
+            local = np.arange(offsets[shard_id], offsets[shard_id + 1])
+            order.append(self.random.permutation(local) if self.shuffle else local)
+        return np.concatenate(order)
+
+    def _read_batch(self, indices):
+        samples = self.x_train.gather(indices)
+        labels = self.y_train.gather(indices) if self.yield_labels else None
+        return samples, labels
+
+    def iterate_minibatches(self):
+        order = self._epoch_order()
+        batches = (order[i * self.batch_size:(i + 1) * self.batch_size]
+                   for i in range(self.n_iter))
+
+        if not self.n_workers:
+            for indices in batches:
+                yield self._read_batch(indices)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.n_workers) as executor:
+            pending = []
+            for indices in batches:
+                pending.append(executor.submit(self._read_batch, indices))
+                if len(pending) >= self.prefetch:
+                    yield pending.pop(0).result()
+            for future in pending:
+                yield future.result()
+
+    def _held_out(self, data_dir):
+        if data_dir is None:
+            return None, None
+        samples = ShardedArray(data_dir, "samples")
+        labels = ShardedArray(data_dir, "labels") \
+            if samples.index["label_shape"] is not None else None
+        return samples, labels
+
+    def training_data(self):
+        return self.x_train, self.y_train
+
+    def validation_data(self):
+        return self._held_out(self.validation_dir)
+
+    def test_data(self):
+        return self._held_out(self.test_dir)
+
+
+if __name__ == "__main__":
+    # converts MNIST into train / val / test shards, with the splits of
+    # SemiSupervisedMNISTProvider
+    import sys
+    from keras.datasets import mnist
+    from keras.utils.np_utils import to_categorical
+
+    out_dir = sys.argv[1]
+    (x_train, y_train), (x_test, y_test) = mnist.load_data()
+    x_train = x_train.reshape((-1, 28, 28, 1)).astype(np.float32) / 255
+    x_test = x_test.reshape((-1, 28, 28, 1)).astype(np.float32) / 255
+    y_train = to_categorical(y_train).astype(np.float32)
+    y_test = to_categorical(y_test).astype(np.float32)
+
+    write_shards(os.path.join(out_dir, "train"), x_train[1000:], y_train[1000:])
+    write_shards(os.path.join(out_dir, "val"), x_train[:1000], y_train[:1000])
+    write_shards(os.path.join(out_dir, "test"), x_test, y_test)
@@ -0,0 +1,124 @@
+"""
+Single pass statistics of a SkeletonStore field and the normalization based on them. The
+statistics are computed over the ragged rows of the store (no padding is ever formed) and
+cached next to the store.
+"""
+import os
+
+import numpy as np
+
+
+def _combine(count_a, mean_a, m2_a, count_b, mean_b, m2_b):
+    # Chan et al. parallel update of the mean and the sum of squared deviations
+    count = count_a + count_b
+    delta = mean_b - mean_a
+    mean = mean_a + delta * (count_b / count)
+    m2 = m2_a + m2_b + delta ** 2 * (count_a * count_b / count)
+    return count, mean, m2
+
+
+def compute_statistics(store, field="xyz", sequence_range=None, chunk_rows=65536):
+    """
+    compute_statistics streams over the rows of a field once, in chunks of chunk_rows bodies.
+    Bodies whose joints are all zero (untracked bodies) are skipped.
+
+    :param store - SkeletonStore
+    :param field - joint field, e.g. 'xyz'
+    :param sequence_range - (start, stop), only these sequences are used, e.g. the training
+        split, defaults to all sequences
+    :param chunk_rows - number of bodies processed at once, bounds the memory use
+    :return: dict with
+        'count' - number of bodies used
+        'mean', 'var', 'std' - per joint and axis, shape (n_joints, n_axes)
+        'axis_mean', 'axis_var', 'axis_std' - per axis, pooled over the joints, shape (n_axes,)
+        'min', 'max' - bounding box per joint and axis, shape (n_joints, n_axes)
+        'frame_count_hist' - histogram of the sequence lengths, index is the number of frames
+        'body_count_hist' - histogram of the bodies per frame, index is the number of bodies
+    """
+    start, stop = sequence_range or (0, len(store))
+    first_frame, last_frame = store.sequence_offsets[start], store.sequence_offsets[stop]
+    first_row, last_row = store.frame_offsets[first_frame], store.frame_offsets[last_frame]
+
+    column = store[field]
+    row_shape = column.shape[1:]
+
+    count = 0
+    mean = np.zeros(row_shape)
+    m2 = np.zeros(row_shape)
+    minimum = np.full(row_shape, np.inf)
+    maximum = np.full(row_shape, -np.inf)
+
+    for chunk_start in range(first_row, last_row, chunk_rows):
+        chunk = np.asarray(column[chunk_start:min(chunk_start + chunk_rows, last_row)],
+                           dtype=np.float64)
+        chunk = chunk[np.any(chunk.reshape((len(chunk), -1)) != 0, axis=1)]
+        if not len(chunk):
+            continue
+
+        chunk_mean = chunk.mean(axis=0)
+        chunk_m2 = np.sum((chunk - chunk_mean) ** 2, axis=0)
+        count, mean, m2 = _combine(count, mean, m2, len(chunk), chunk_mean, chunk_m2)
+
+        np.minimum(minimum, chunk.min(axis=0), out=minimum)
+        np.maximum(maximum, chunk.max(axis=0), out=maximum)
+
+    assert count > 1, "not enough tracked bodies for statistics"
+    var = m2 / count
+
+    # the joints all have the same count, so pooling over them is a plain average
+    axis_mean = mean.mean(axis=0)
+    axis_var = np.mean(var + (mean - axis_mean) ** 2, axis=0)
+
+    frame_counts = np.diff(store.sequence_offsets[start:stop + 1])
+    body_counts = np.diff(store.frame_offsets[first_frame:last_frame + 1])
+
+    return {
+        'count': np.array(count),
+        'mean': mean,
+        'var': var,
+        'std': np.sqrt(var),
+        'axis_mean': axis_mean,
+        'axis_var': axis_var,
+        'axis_std': np.sqrt(axis_var),
+        'min': minimum,
+        'max': maximum,
+        'frame_count_hist': np.bincount(frame_counts),
+        'body_count_hist': np.bincount(body_counts),
+    }
+
+
+def load_or_compute_statistics(store, field="xyz", sequence_range=None):
+    """
+    load_or_compute_statistics returns the statistics cached in the store directory,
+    computing and caching them first if needed, see compute_statistics()
+    """
+    start, stop = sequence_range or (0, len(store))
+    file_path = os.path.join(store.store_dir, "stats_{}_{}_{}.npz".format(field, start, stop))
+
+    if os.path.exists(file_path):
+        with np.load(file_path) as cached:
+            return {name: cached[name] for name in cached.files}
+
+    stats = compute_statistics(store, field, (start, stop))
+    tmp_path = file_path + ".tmp.npz"
+    np.savez(tmp_path, **stats)
+    os.rename(tmp_path, file_path)
+    return stats
+
+
+def normalize_batch(batch, mean, std, eps=1e-6):
+    """
+    normalize_batch standardizes a batch of padded skeleton data in place, the padding
+    (bodies with all joints zero) stays zero
+
+    :param batch - float array of shape (..., n_joints, n_axes), modified in place
+    :param mean, std - arrays broadcastable to (n_joints, n_axes), e.g. the 'mean' and 'std'
+        or 'axis_mean' and 'axis_std' statistics
+    :return: batch
+    """
+    tracked = np.any(batch != 0, axis=(-2, -1))
+
+    np.subtract(batch, mean.astype(batch.dtype), out=batch)
+    np.multiply(batch, (1. / (std + eps)).astype(batch.dtype), out=batch)
+    np.multiply(batch, tracked[..., None, None], out=batch)
+    return batch
@@ -0,0 +1,271 @@
+"""
+Columnar store of NTU RGB+D skeleton files. Every file is parsed once, all the per body and
+per joint information is kept, one contiguous .npy array per field. The arrays are memory
+mapped when the store is opened, so selecting fields and sequences costs no copies.
+
+Layout of the rows:
+    body fields - one row per body (skeleton) of every frame of every sequence
+    joint fields - the same rows, with an extra (n_joints, ...) dimension
+    sequence_offsets - frames of sequence i are frames sequence_offsets[i]:sequence_offsets[i + 1]
+    frame_offsets - bodies of frame f are rows frame_offsets[f]:frame_offsets[f + 1]
+"""
+import json
+import os
+import shutil
+from collections import OrderedDict
+
+import numpy as np
+
+# field name -> (dtype, columns of the body info line after the body id)
+BODY_FIELDS = OrderedDict([
+    ("clipped_edges", (np.uint8, 0)),
+    ("hand_left_confidence", (np.uint8, 1)),
+    ("hand_left_state", (np.uint8, 2)),
+    ("hand_right_confidence", (np.uint8, 3)),
+    ("hand_right_state", (np.uint8, 4)),
+    ("is_restricted", (np.uint8, 5)),
+    ("lean", (np.float32, slice(6, 8))),
+    ("tracking_state", (np.uint8, 8)),
+])
+
+# field name -> (dtype, columns of the joint line), in the order of the joint line
+JOINT_FIELDS = OrderedDict([
+    ("xyz", (np.float32, slice(0, 3))),
+    ("depth_xy", (np.float32, slice(3, 5))),
+    ("color_xy", (np.float32, slice(5, 7))),
+    ("orientation", (np.float32, slice(7, 11))),
+    ("joint_tracking_state", (np.uint8, 11)),
+])
+
+INDEX_FILE = "index.json"
+
+
+def parse_skeleton_file(file_path):
+    """
+    parse_skeleton_file reads all information of a .skeleton file, see
+    https://github.com/shahroudy/NTURGB-D/blob/master/Matlab/read_skeleton_file.m
+
+    :return: (bodies_per_frame, body_ids, body_rows, joint_rows)
+        bodies_per_frame - list with the number of bodies of each frame
+        body_ids - int64 array of shape (n_bodies,)
+        body_rows - float64 array of shape (n_bodies, 9), the rest of the body info lines
+        joint_rows - float64 array of shape (n_bodies, n_joints, 12), the joint lines
+    """
+    with open(file_path) as f:
+        lines = f.read().splitlines()
+
+    bodies_per_frame = []
+    body_ids = []
+    body_rows = []
+    joint_rows = []
+
+    line = 0
+    frames_count = int(lines[line].split()[0])
+    line += 1
+    for _ in range(frames_count):
+        body_count = int(lines[line].split()[0])
+        line += 1
+        bodies_per_frame.append(body_count)
+
+        for _ in range(body_count):
+            # the body id exceeds the float64 precision, it is parsed separately
+            body_line = lines[line].split()
+            body_ids.append(int(body_line[0]))
+            body_rows.append([float(x) for x in body_line[1:]])
+            joints_count = int(lines[line + 1].split()[0])
+            line += 2
+
+            joints = " ".join(lines[line:line + joints_count]).split()
+            joint_rows.append(np.array(joints, dtype=np.float64).reshape((joints_count, -1)))
+            line += joints_count
+
+    if not body_ids:
+        return bodies_per_frame, np.zeros((0,), np.int64), np.zeros((0, 9)), None
+    return (bodies_per_frame, np.array(body_ids, dtype=np.int64),
+            np.array(body_rows, dtype=np.float64), np.stack(joint_rows))
+
+
+def skeleton_file_names(dir_path, file_limit=None):
+    """
+    skeleton_file_names lists the .skeleton files of dir_path that a store is built from,
+    sorted and limited to the first file_limit files
+    """
+    file_names = sorted(name for name in os.listdir(dir_path) if name.endswith("skeleton"))
+    if not file_names:
+        raise ValueError("no .skeleton files in {}".format(dir_path))
+    return file_names[:file_limit]
+
+
+def build_store(dir_path, store_dir, file_limit=None):
+    """
+    build_store parses the .skeleton files in dir_path into a store at store_dir
+
+    :param dir_path - directory with the .skeleton files
+    :param store_dir - directory of the store, must not exist yet
+    :param file_limit - only the first file_limit files are parsed
+    """
+    file_names = skeleton_file_names(dir_path, file_limit)
+
+    frame_counts = []
+    bodies_per_frame = []
+    id_blocks = []
+    body_blocks = []
+    joint_blocks = []
+    for file_name in file_names:
+        frame_bodies, body_ids, body_rows, joint_rows = parse_skeleton_file(
+            os.path.join(dir_path, file_name))
+        frame_counts.append(len(frame_bodies))
+        bodies_per_frame += frame_bodies
+        if len(body_ids):
+            id_blocks.append(body_ids)
+            body_blocks.append(body_rows)
+            joint_blocks.append(joint_rows)
+
+    if not joint_blocks:
+        raise ValueError("no skeletons in the .skeleton files of {}".format(dir_path))
+    joint_counts = set(block.shape[1] for block in joint_blocks)
+    assert len(joint_counts) == 1, "Joint count must be fixed."
+
+    body_ids = np.concatenate(id_blocks)
+    body_rows = np.concatenate(body_blocks)
+    joint_rows = np.concatenate(joint_blocks)
+
+    # write everything to a temporary directory, an interrupted build must not look complete
+    tmp_dir = store_dir.rstrip(os.sep) + ".tmp"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    np.save(os.path.join(tmp_dir, "body_id.npy"), body_ids)
+    for name, (dtype, columns) in BODY_FIELDS.items():
+        np.save(os.path.join(tmp_dir, name + ".npy"),
+                np.ascontiguousarray(body_rows[:, columns], dtype=dtype))
+
+    for name, (dtype, columns) in JOINT_FIELDS.items():
+        np.save(os.path.join(tmp_dir, name + ".npy"),
+                np.ascontiguousarray(joint_rows[:, :, columns], dtype=dtype))
+
+    np.save(os.path.join(tmp_dir, "sequence_offsets.npy"),
+            np.concatenate([[0], np.cumsum(frame_counts)]).astype(np.int64))
+    np.save(os.path.join(tmp_dir, "frame_offsets.npy"),
+            np.concatenate([[0], np.cumsum(bodies_per_frame)]).astype(np.int64))
+
+    index = {"sequences": file_names,
+             "source_dir": os.path.abspath(dir_path),
+             "file_limit": file_limit,
+             "n_joints": joint_counts.pop(),
+             "fields": ["body_id"] + list(BODY_FIELDS.keys()) + list(JOINT_FIELDS.keys())}
+    with open(os.path.join(tmp_dir, INDEX_FILE), "w") as f:
+        json.dump(index, f)
+
+    os.rename(tmp_dir, store_dir)
+
+
+class SkeletonStore(object):
+    """
+    SkeletonStore gives memory mapped access to a store written by build_store().
+
+    Usage:
+        >>> store = SkeletonStore.build_or_open("skeletons_data", "skeletons_store")
+        >>> xyz = store["xyz"]  # (n_bodies, 25, 3), memory mapped
+        >>> sequence = store.sequence(0, ["xyz", "body_id"])
+        >>> data = store.padded("xyz")  # (n_sequences, max_frames, max_bodies, 25, 3)
+    """
+
+    def __init__(self, store_dir, mmap_mode='r'):
+        self.store_dir = store_dir
+        self.mmap_mode = mmap_mode
+        with open(os.path.join(store_dir, INDEX_FILE)) as f:
+            index = json.load(f)
+
+        self.sequence_names = index["sequences"]
+        self.source_dir = index.get("source_dir")
+        self.file_limit = index.get("file_limit")
+        self.n_joints = index["n_joints"]
+        self.fields = index["fields"]
+        self.sequence_offsets = np.load(os.path.join(store_dir, "sequence_offsets.npy"))
+        self.frame_offsets = np.load(os.path.join(store_dir, "frame_offsets.npy"))
+        self._columns = {}
+
+    @classmethod
+    def build_or_open(cls, dir_path, store_dir, file_limit=None, mmap_mode='r'):
+        """
+        build_or_open opens the store at store_dir, building it from dir_path first
+        if it does not exist. A store built from another directory, with another file_limit
+        or from other files is rebuilt, together with the statistics cached in it.
+        """
+        if os.path.exists(os.path.join(store_dir, INDEX_FILE)):
+            store = cls(store_dir, mmap_mode)
+            if store.source_dir == os.path.abspath(dir_path) and \
+                    store.file_limit == file_limit and \
+                    store.sequence_names == skeleton_file_names(dir_path, file_limit):
+                return store
+            shutil.rmtree(store_dir)
+
+        build_store(dir_path, store_dir, file_limit)
+        return cls(store_dir, mmap_mode)
+
+    def __len__(self):
+        return len(self.sequence_names)
+
+    def __getitem__(self, field):
+        if field not in self._columns:
+            assert field in self.fields, "unknown field {}".format(field)
+            self._columns[field] = np.load(os.path.join(self.store_dir, field + ".npy"),
+                                           mmap_mode=self.mmap_mode)
+        return self._columns[field]
+
+    def body_range(self, sequence_index):
+        """
+        body_range is the slice of the rows of all bodies of a sequence
+        """
+        first_frame = self.sequence_offsets[sequence_index]
+        last_frame = self.sequence_offsets[sequence_index + 1]
+        return slice(self.frame_offsets[first_frame], self.frame_offsets[last_frame])
+
+    def sequence(self, sequence_index, fields):
+        """
+        sequence returns views of the rows of a sequence
+
+        :param sequence_index - index of the sequence
+        :param fields - names of the fields
+        :return: (fields, frame_offsets), fields - dict, name -> rows of the sequence,
+            frame_offsets - the bodies of frame t are rows frame_offsets[t]:frame_offsets[t + 1]
+        """
+        rows = self.body_range(sequence_index)
+        frames = slice(self.sequence_offsets[sequence_index],
+                       self.sequence_offsets[sequence_index + 1] + 1)
+        frame_offsets = self.frame_offsets[frames] - rows.start
+        return {field: self[field][rows] for field in fields}, frame_offsets
+
+    def padded(self, field, max_frames=None, max_bodies=None, dtype=np.float32):
+        """
+        padded forms a dense array of a field of all sequences, missing frames and bodies
+        are zero (post padding)
+
+        :param field - name of the field
+        :param max_frames - number of frames, longer sequences are truncated at the end,
+            defaults to the longest sequence
+        :param max_bodies - number of bodies per frame, further bodies are dropped,
+            defaults to the maximal count
+        :return: array of shape (n_sequences, max_frames, max_bodies) + row shape of the field
+        """
+        column = self[field]
+        frame_counts = np.diff(self.sequence_offsets)
+        body_counts = np.diff(self.frame_offsets)
+        max_frames = max_frames or int(frame_counts.max())
+        max_bodies = max_bodies or int(body_counts.max())
+
+        # sequence, time step and body slot of every row
+        frame_of_row = np.repeat(np.arange(len(body_counts)), body_counts)
+        sequence_of_frame = np.repeat(np.arange(len(frame_counts)), frame_counts)
+        step_of_frame = np.arange(len(body_counts)) - self.sequence_offsets[sequence_of_frame]
+        slot = np.arange(len(column)) - self.frame_offsets[frame_of_row]
+
+        keep = (step_of_frame[frame_of_row] < max_frames) & (slot < max_bodies)
+        out = np.zeros((len(frame_counts), max_frames, max_bodies) + column.shape[1:],
+                       dtype=dtype)
+        out[sequence_of_frame[frame_of_row][keep],
+            step_of_frame[frame_of_row][keep],
+            slot[keep]] = column[np.flatnonzero(keep)]
+        return out
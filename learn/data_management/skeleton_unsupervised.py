@@ -1,25 +1,56 @@
 import os
 
 import numpy as np
-from keras.preprocessing.sequence import pad_sequences
 
 from learn.data_management.interfaces import DataProvider
+from learn.data_management.skeleton_stats import load_or_compute_statistics, normalize_batch
+from learn.data_management.skeleton_store import SkeletonStore, skeleton_file_names
 
 
 class UnsupervisedSkeletonProvider(DataProvider):
 
-    def __init__(self, data_path, batch_size, file_limit=100):
+    NORMALIZATIONS = (None, "per_joint", "per_axis")
+
+    def __init__(self, data_path, batch_size, file_limit=100, store_dir=None,
+                 normalization=None, window_length=None):
         """__init__
 
         :param data_path: path to the directory containing all skeleton files
         :param batch_size: training batch size
+        :param store_dir: (optional) directory of a SkeletonStore of the files, built on first
+            use, later runs read the joint coordinates from it instead of parsing the text files
+        :param normalization: (optional) standardize the coordinates with the training split
+            statistics, "per_joint" or "per_axis", needs store_dir (the statistics are cached
+            in the store)
+        :param window_length: (optional) for truncated BPTT training, every batch of sequences is
+            yielded as consecutive windows of window_length frames (the sequences are zero padded
+            to a multiple of it), windows_per_sequence minibatches per batch of sequences. The
+            training, validation and test data are then returned as independent windows too,
+            of shape (n_sequences * windows_per_sequence, window_length, ...), which fit the
+            windowed model
         """
+        assert normalization in self.NORMALIZATIONS, \
+            "normalization must be one of {}".format(self.NORMALIZATIONS)
+        assert normalization is None or store_dir, "normalization needs a store_dir"
         self.data_path = data_path
         self.batch_size = batch_size
 
-        data = self._form_data(data_path, file_limit)
+        if store_dir:
+            store = SkeletonStore.build_or_open(data_path, store_dir, file_limit)
+            data = store.padded("xyz")
+        else:
+            data = self._form_data(data_path, file_limit)
         N = data.shape[0]
 
+        self.window_length = window_length
+        self.windows_per_sequence = 1
+        if window_length:
+            self.windows_per_sequence = -(-data.shape[1] // window_length)
+            missing_frames = self.windows_per_sequence * window_length - data.shape[1]
+            if missing_frames:
+                data = np.concatenate([data, np.zeros((N, missing_frames) + data.shape[2:],
+                                                      dtype=data.dtype)], axis=1)
+
         train_size = int(N * 0.7)
         testval_size = N - train_size
         test_size = testval_size // 2
@@ -30,31 +61,56 @@ class UnsupervisedSkeletonProvider(DataProvider):
 
         self.n_iter = train_size // self.batch_size
 
+        self.mean, self.std = None, None
+        if normalization:
+            stats = load_or_compute_statistics(store, "xyz", (0, train_size))
+            prefix = "" if normalization == "per_joint" else "axis_"
+            self.mean, self.std = stats[prefix + "mean"], stats[prefix + "std"]
+
+            # the held out splits are small, they are normalized once
+            normalize_batch(self.x_test, self.mean, self.std)
+            normalize_batch(self.x_val, self.mean, self.std)
+            # the training batches are copied into this buffer and normalized there,
+            # x_train itself stays raw
+            self.batch_buffer = np.empty((self.batch_size,) + self.x_train.shape[1:],
+                                         dtype=self.x_train.dtype)
+
     def iterate_minibatches(self):
         for i in range(self.n_iter):
             samples = self.x_train[i * self.batch_size:(i + 1) * self.batch_size]
+            if self.mean is not None:
+                np.copyto(self.batch_buffer, samples)
+                samples = normalize_batch(self.batch_buffer, self.mean, self.std)
             samples = samples.reshape((samples.shape[0], samples.shape[1], -1))
-            minibatch = (samples, None)
-            yield minibatch
+
+            if self.window_length:
+                # the recurrent states carry over between the windows of these sequences
+                for w in range(self.windows_per_sequence):
+                    yield samples[:, w * self.window_length:(w + 1) * self.window_length], None
+            else:
+                minibatch = (samples, None)
+                yield minibatch
+
+    def _windows(self, data):
+        if not self.window_length:
+            return data
+        # consecutive windows of a sequence are consecutive rows, a view of data
+        return data.reshape((-1, self.window_length) + data.shape[2:])
 
     def training_data(self):
-        return self.x_train, None
+        return self._windows(self.x_train), None
 
     def validation_data(self):
-        return self.x_val, None
+        return self._windows(self.x_val), None
 
     def test_data(self):
-        return self.x_test, None
+        return self._windows(self.x_test), None
 
     def _form_data(self, dir_path, file_limit):
+        # the same files as a SkeletonStore built with the same file_limit
         sequences = []
-        for file_name in os.listdir(dir_path)[:file_limit]:
-            file_path = os.path.join(dir_path, file_name)
-
-            if not file_path.endswith("skeleton"):
-                continue
-
-            frames = self._load_skeleton_file(file_path)
+        for file_name in skeleton_file_names(dir_path, file_limit):
+            frames = self._load_skeleton_file(os.path.join(dir_path, file_name))
             sequences.append(frames)
 
         print("Sequences: {}".format(len(sequences)))
@@ -70,6 +126,8 @@ class UnsupervisedSkeletonProvider(DataProvider):
         for sequence in sequences:
             for frame in sequence:
                 joint_counts += [len(skeleton) for skeleton in frame]
+        if not joint_counts:
+            raise ValueError("no skeletons in the .skeleton files of {}".format(dir_path))
         print("Min / Max joints: {} - {}".format(min(joint_counts), max(joint_counts)))
 
         assert min(joint_counts) == max(joint_counts), "Joint count must be fixed."
@@ -88,7 +146,12 @@ class UnsupervisedSkeletonProvider(DataProvider):
 
             numpy_sequences.append(np.stack(numpy_frames))
 
-        data = pad_sequences(numpy_sequences, dtype="float32", padding="post")
+        # zero padding at the end of the shorter sequences
+        max_frames = max(len(sequence) for sequence in numpy_sequences)
+        data = np.zeros((len(numpy_sequences), max_frames) + numpy_sequences[0].shape[1:],
+                        dtype="float32")
+        for i, sequence in enumerate(numpy_sequences):
+            data[i, :len(sequence)] = sequence
 
         return data
 
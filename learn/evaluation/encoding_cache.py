@@ -0,0 +1,105 @@
+"""
+On-disk cache of the encodings of a dataset, keyed by the checkpoint that produced them
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+def checkpoint_key(checkpoint_paths, block_size=1 << 20):
+    """
+    checkpoint_key hashes the contents of the checkpoint (weight) files
+
+    :param checkpoint_paths - list of paths to the weight files of a checkpoint
+    :param block_size - the files are read in blocks of this many bytes
+    """
+    digest = hashlib.sha1()
+    for path in sorted(checkpoint_paths):
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class EncodingCache(object):
+    """
+    EncodingCache stores the encodings of each data split (e.g. 'train', 'test') of a checkpoint
+    as one (N, encoding_dim) .npy file, written chunk by chunk while the data is encoded.
+
+    Usage:
+        >>> cache = EncodingCache("cache_dir", ["gen_train_model.hdf5", "disc_train_model.hdf5"])
+        >>> test_encodings = cache.get_or_encode("test", model, x_test)
+    """
+
+    INDEX_FILE = "encodings.json"
+
+    def __init__(self, cache_dir, checkpoint_paths):
+        self.cache_dir = os.path.join(cache_dir, checkpoint_key(checkpoint_paths))
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def path(self, split):
+        return os.path.join(self.cache_dir, "{}_encodings.npy".format(split))
+
+    def has(self, split):
+        return os.path.exists(self.path(split))
+
+    def load(self, split, mmap_mode='r'):
+        return np.load(self.path(split), mmap_mode=mmap_mode)
+
+    def dist_slices(self):
+        """
+        dist_slices returns the columns of each meaningful dist in the stored encodings
+
+        :return: dict, dist name -> slice
+        """
+        with open(os.path.join(self.cache_dir, self.INDEX_FILE)) as f:
+            index = json.load(f)
+
+        slices = {}
+        start = 0
+        for name, dim in zip(index['names'], index['dims']):
+            slices[name] = slice(start, start + dim)
+            start += dim
+        return slices
+
+    def get_or_encode(self, split, model, samples, chunk_size=None):
+        """
+        get_or_encode returns the (memory mapped) encodings of samples, encoding them with
+        the model only if they are not cached yet
+
+        :param split - name of the data split, e.g. 'test'
+        :param model - InfoGAN2 model with loaded weights
+        :param samples - the samples of the split
+        :param chunk_size - number of samples encoded at once
+        """
+        if not self.has(split):
+            self._store(split, model, samples, chunk_size)
+        return self.load(split)
+
+    def _store(self, split, model, samples, chunk_size):
+        # write to a temporary file first, an interrupted run must not leave a partial cache entry
+        tmp_path = self.path(split) + ".tmp.npy"
+        encodings = None
+        offset = 0
+        for dist_chunks in model.iterate_encodings(samples, chunk_size):
+            chunk = np.concatenate(dist_chunks, axis=-1)
+            if encodings is None:
+                encodings = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32,
+                                                      shape=(len(samples), chunk.shape[-1]))
+                self._store_index(model, [c.shape[-1] for c in dist_chunks])
+
+            encodings[offset:offset + len(chunk)] = chunk
+            offset += len(chunk)
+
+        encodings.flush()
+        del encodings
+        os.rename(tmp_path, self.path(split))
+
+    def _store_index(self, model, dims):
+        index = {'names': list(model.encoder.meaningful_dists.keys()),
+                 'dims': dims}
+        with open(os.path.join(self.cache_dir, self.INDEX_FILE), "w") as f:
+            json.dump(index, f)
@@ -0,0 +1,227 @@
+"""
+Evaluation of a trained InfoGAN on a labeled dataset. The data is encoded once per checkpoint
+(see EncodingCache) and the independent evaluations run in parallel processes.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from learn.evaluation.encoding_cache import EncodingCache
+
+# number of labeled training samples the classifiers get, simulating a semi-supervised scenario
+N_SUPERVISED = 2500
+# number of test samples the InfoGAN latent classifier is evaluated on
+N_ENCODING_TEST = 2500
+
+EVALUATIONS = ("svm", "pca_svm", "infogan_svm", "c1", "clustering")
+ENCODING_EVALUATIONS = ("infogan_svm", "c1", "clustering")
+
+
+def _load(array):
+    # the workers get the encodings as paths to .npy files, which are memory mapped
+    # instead of pickled into every process
+    if isinstance(array, str):
+        return np.load(array, mmap_mode='r')
+    return array
+
+
+def _flatten(x):
+    return np.reshape(x, (len(x), -1))
+
+
+def _classification_results(y_test, test_preds, n_classes):
+    from sklearn.metrics import auc
+    from learn.utils.visualization import micro_macro_roc
+
+    onehot = np.eye(n_classes)
+    roc = micro_macro_roc(n_classes, y_expected=onehot[y_test], y_predicted=onehot[test_preds])
+    return {
+        'accuracy': float(np.mean(y_test == test_preds)),
+        'micro_auc': float(auc(*roc['micro'])),
+        'macro_auc': float(auc(*roc['macro'])),
+        'roc': roc
+    }
+
+
+def svm_evaluation(x_train, y_train, x_test, y_test, n_classes):
+    """
+    SVM on the original representation of the samples
+    """
+    from sklearn import svm
+
+    classifier = svm.SVC()
+    classifier.fit(_flatten(_load(x_train)), y_train)
+    test_preds = classifier.predict(_flatten(_load(x_test)))
+    return _classification_results(y_test, test_preds, n_classes)
+
+
+def pca_svm_evaluation(x_train, y_train, x_test, y_test, n_classes, n_pca=12):
+    """
+    SVM on n_pca PCA features of the samples
+    """
+    from sklearn import svm
+    from sklearn.decomposition import PCA
+
+    x_train = _flatten(_load(x_train))
+    pca = PCA(n_components=n_pca)
+    pca.fit(x_train)
+
+    classifier = svm.SVC()
+    classifier.fit(pca.transform(x_train), y_train)
+    test_preds = classifier.predict(pca.transform(_flatten(_load(x_test))))
+    return _classification_results(y_test, test_preds, n_classes)
+
+
+def c1_evaluation(test_encodings, y_test, categorical_slice, n_classes):
+    """
+    classification based only on the categorical latent, the latent categories are mapped
+    to the classes with the optimal one to one assignment
+    """
+    from learn.evaluation.metrics import clustering_metrics
+
+    c1_params = _load(test_encodings)[:, categorical_slice]
+    c1 = np.argmax(c1_params, axis=1)
+
+    metrics = clustering_metrics(y_test, c1, n_true=n_classes, n_pred=c1_params.shape[1])
+    results = _classification_results(y_test, metrics['mapping'][c1], n_classes)
+    results.update(nmi=metrics['nmi'], ari=metrics['ari'])
+    return results
+
+
+def clustering_evaluation(test_encodings, y_test, plot_path=None, n_samples=None):
+    """
+    silhouette score of the classes in the space of the encodings
+
+    :param n_samples - if set, the score is estimated from this many samples,
+        with a 95% confidence interval (no plot is made then)
+    """
+    from learn.evaluation.silhouette import silhouette_samples, sampled_silhouette_score
+
+    test_encodings = _load(test_encodings)
+
+    if n_samples:
+        score, (ci_low, ci_high) = sampled_silhouette_score(test_encodings, y_test, n_samples)
+        return {'silhouette_score': score,
+                'silhouette_ci_low': ci_low,
+                'silhouette_ci_high': ci_high}
+
+    score_per_sample = silhouette_samples(test_encodings, y_test)
+    if plot_path:
+        from learn.utils.visualization import cluster_silhouette_view
+        cluster_silhouette_view(test_encodings, y_test, plot_path,
+                                n_clusters=len(np.unique(y_test)),
+                                score_per_sample=score_per_sample)
+
+    return {'silhouette_score': float(np.mean(score_per_sample))}
+
+
+def run_evaluations(tasks, n_workers=None):
+    """
+    run_evaluations runs independent evaluations in parallel processes
+
+    :param tasks - dict, evaluation name -> (function, kwargs)
+    :param n_workers - number of processes, defaults to the number of CPUs
+    :return: dict, evaluation name -> results dict
+    """
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = {name: executor.submit(function, **kwargs)
+                   for name, (function, kwargs) in tasks.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def evaluate_checkpoint(load_model, checkpoint_paths, x_train, y_train, x_test, y_test,
+                        n_classes, cache_dir,
+                        evaluations=EVALUATIONS,
+                        categorical_dist="c1",
+                        plot_dir=None,
+                        silhouette_samples=None,
+                        n_workers=None,
+                        chunk_size=None):
+    """
+    evaluate_checkpoint encodes the data with a checkpoint (or reuses the cached encodings)
+    and runs the evaluations on it in parallel.
+
+    :param load_model - function returning the InfoGAN2 model with the checkpoint loaded,
+        only called if some of the encodings are not cached yet
+    :param checkpoint_paths - the weight files of the checkpoint, they key the encoding cache
+    :param x_train, y_train, x_test, y_test - the data, labels as integer class indices
+    :param n_classes - number of classes
+    :param cache_dir - directory of the encoding cache
+    :param evaluations - names of the evaluations to run, see EVALUATIONS
+    :param categorical_dist - name of the categorical latent used by the "c1" evaluation
+    :param plot_dir - if set, plots (e.g. the silhouette view) are stored there
+    :param silhouette_samples - if set, the silhouette score is estimated from this many samples
+    :param n_workers - number of evaluation processes
+    :param chunk_size - number of samples encoded at once
+    :return: dict, evaluation name -> results dict
+    """
+    cache = EncodingCache(cache_dir, checkpoint_paths)
+
+    encodings = {}
+    needed_splits = set()
+    if "infogan_svm" in evaluations:
+        needed_splits.update(["train", "test"])
+    if "c1" in evaluations or "clustering" in evaluations:
+        needed_splits.add("test")
+
+    model = None
+    for split, samples in [("train", x_train), ("test", x_test)]:
+        if split not in needed_splits:
+            continue
+        if not cache.has(split) and model is None:
+            model = load_model()
+        cache.get_or_encode(split, model, samples, chunk_size)
+        encodings[split] = cache.path(split)
+
+    tasks = {}
+    if "svm" in evaluations:
+        tasks["svm"] = (svm_evaluation, dict(x_train=x_train[:N_SUPERVISED],
+                                             y_train=y_train[:N_SUPERVISED],
+                                             x_test=x_test, y_test=y_test,
+                                             n_classes=n_classes))
+    if "pca_svm" in evaluations:
+        tasks["pca_svm"] = (pca_svm_evaluation, dict(x_train=x_train[:N_SUPERVISED],
+                                                     y_train=y_train[:N_SUPERVISED],
+                                                     x_test=x_test, y_test=y_test,
+                                                     n_classes=n_classes))
+    if "infogan_svm" in evaluations:
+        test_encodings = cache.load("test")[:N_ENCODING_TEST]
+        tasks["infogan_svm"] = (svm_evaluation, dict(x_train=encodings["train"], y_train=y_train,
+                                                     x_test=np.array(test_encodings),
+                                                     y_test=y_test[:N_ENCODING_TEST],
+                                                     n_classes=n_classes))
+    if "c1" in evaluations:
+        tasks["c1"] = (c1_evaluation, dict(test_encodings=encodings["test"], y_test=y_test,
+                                           categorical_slice=cache.dist_slices()[categorical_dist],
+                                           n_classes=n_classes))
+    if "clustering" in evaluations:
+        plot_path = os.path.join(plot_dir, "silhouette_score.png") if plot_dir else None
+        tasks["clustering"] = (clustering_evaluation, dict(test_encodings=encodings["test"],
+                                                           y_test=y_test,
+                                                           plot_path=plot_path,
+                                                           n_samples=silhouette_samples))
+
+    return run_evaluations(tasks, n_workers)
+
+
+def write_results(file_path, results):
+    """
+    write_results merges the scalar results into the JSON file at file_path, the stored
+    results of other evaluations are kept
+
+    :param file_path - path to the results file
+    :param results - dict, evaluation name -> results dict
+    """
+    stored = {}
+    if os.path.exists(file_path):
+        with open(file_path) as f:
+            stored = json.load(f)
+
+    for name, evaluation_results in results.items():
+        stored[name] = {key: value for key, value in evaluation_results.items()
+                        if isinstance(value, (int, float, str))}
+
+    with open(file_path, "w") as f:
+        json.dump(stored, f, indent=2, sort_keys=True)
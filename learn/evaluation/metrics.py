@@ -0,0 +1,129 @@
+"""
+Clustering metrics comparing predicted clusters (e.g. the categorical latent of the encoder)
+with the true classes. Everything is derived from one contingency matrix, computed with a
+single bincount pass over the labels.
+"""
+import numpy as np
+
+
+def contingency_matrix(labels_true, labels_pred, n_true=None, n_pred=None):
+    """
+    contingency_matrix counts the samples of each (true class, predicted cluster) pair
+
+    :param labels_true - integer array of shape (N,), values in [0, n_true)
+    :param labels_pred - integer array of shape (N,), values in [0, n_pred)
+    :param n_true - number of true classes, defaults to max(labels_true) + 1
+    :param n_pred - number of predicted clusters, defaults to max(labels_pred) + 1
+    :return: integer array of shape (n_true, n_pred)
+    """
+    labels_true = np.asarray(labels_true, dtype=np.int64)
+    labels_pred = np.asarray(labels_pred, dtype=np.int64)
+    n_true = n_true or int(labels_true.max()) + 1
+    n_pred = n_pred or int(labels_pred.max()) + 1
+
+    counts = np.bincount(labels_true * n_pred + labels_pred, minlength=n_true * n_pred)
+    return counts.reshape((n_true, n_pred))
+
+
+def optimal_assignment(contingency):
+    """
+    optimal_assignment maps each predicted cluster to a true class, such that the number of
+    correctly mapped samples is maximal and no two clusters share a class (Hungarian method).
+    If there are more clusters than classes, the remaining clusters are mapped to their
+    most frequent class.
+
+    :param contingency - array of shape (n_true, n_pred), see contingency_matrix()
+    :return: integer array of shape (n_pred,), the class of each cluster
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    mapping = np.argmax(contingency, axis=0)
+    true_idx, pred_idx = linear_sum_assignment(-contingency)
+    mapping[pred_idx] = true_idx
+    return mapping
+
+
+def _entropy(counts, n):
+    p = counts[counts > 0] / n
+    return -np.sum(p * np.log(p))
+
+
+def _comb2(x):
+    # exact for integer counts
+    return x * (x - 1) // 2
+
+
+def normalized_mutual_info(contingency):
+    """
+    normalized_mutual_info is the mutual information of the true and predicted labels,
+    normalized by the arithmetic mean of their entropies
+
+    :param contingency - array of shape (n_true, n_pred), see contingency_matrix()
+    """
+    contingency = np.asarray(contingency, dtype=np.float64)
+    n = contingency.sum()
+    true_counts = contingency.sum(axis=1)
+    pred_counts = contingency.sum(axis=0)
+
+    nonzero = contingency > 0
+    joint = contingency[nonzero] / n
+    outer = np.outer(true_counts, pred_counts)[nonzero] / (n * n)
+    mutual_info = np.sum(joint * (np.log(joint) - np.log(outer)))
+
+    normalizer = (_entropy(true_counts, n) + _entropy(pred_counts, n)) / 2
+    if normalizer == 0:
+        # both labelings are a single cluster, which trivially agree
+        return 1.0
+    return float(mutual_info / normalizer)
+
+
+def adjusted_rand_index(contingency):
+    """
+    adjusted_rand_index is the rand index of the true and predicted labels,
+    corrected for chance
+
+    :param contingency - array of shape (n_true, n_pred), see contingency_matrix()
+    """
+    # integer pair counts, so that the degenerate cases are detected exactly
+    contingency = np.asarray(contingency, dtype=np.int64)
+    n = int(contingency.sum())
+
+    sum_pairs = int(np.sum(_comb2(contingency)))
+    sum_true_pairs = int(np.sum(_comb2(contingency.sum(axis=1))))
+    sum_pred_pairs = int(np.sum(_comb2(contingency.sum(axis=0))))
+    n_pairs = _comb2(n)
+
+    # both labelings are a single cluster, or both put every sample in its own cluster
+    # (including n <= 1, without any pairs): they trivially agree, as in sklearn
+    if sum_true_pairs == sum_pred_pairs == n_pairs or sum_true_pairs == sum_pred_pairs == 0:
+        return 1.0
+
+    expected = sum_true_pairs * sum_pred_pairs / float(n_pairs)
+    max_index = (sum_true_pairs + sum_pred_pairs) / 2.
+    return float((sum_pairs - expected) / (max_index - expected))
+
+
+def clustering_metrics(labels_true, labels_pred, n_true=None, n_pred=None):
+    """
+    clustering_metrics computes the metrics of a clustering against the true classes
+
+    :param labels_true - integer array of shape (N,), see contingency_matrix()
+    :param labels_pred - integer array of shape (N,), see contingency_matrix()
+    :param n_true - number of true classes
+    :param n_pred - number of predicted clusters
+    :return: dict with
+        'accuracy' - classification accuracy with the optimal cluster to class mapping
+        'nmi' - normalized mutual information
+        'ari' - adjusted rand index
+        'mapping' - integer array, the class of each cluster
+    """
+    contingency = contingency_matrix(labels_true, labels_pred, n_true, n_pred)
+    mapping = optimal_assignment(contingency)
+
+    correct = contingency[mapping, np.arange(contingency.shape[1])].sum()
+    return {
+        'accuracy': float(correct / contingency.sum()),
+        'nmi': normalized_mutual_info(contingency),
+        'ari': adjusted_rand_index(contingency),
+        'mapping': mapping
+    }
@@ -0,0 +1,131 @@
+"""
+Memory bounded silhouette scores. The pairwise distances are computed for a chunk of rows at a
+time and immediately reduced to per cluster sums, so the memory use does not grow with N^2.
+"""
+import numpy as np
+
+# upper bound of the memory used by a chunk of pairwise distances, in bytes
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+def _prepare(X, labels):
+    X = np.asarray(X, dtype=np.float64)
+    X = X.reshape((len(X), -1))
+    _, label_idx = np.unique(labels, return_inverse=True)
+    counts = np.bincount(label_idx)
+    onehot = np.zeros((len(X), len(counts)), dtype=np.float64)
+    onehot[np.arange(len(X)), label_idx] = 1
+    return X, label_idx, counts, onehot
+
+
+def _silhouette_rows(X, sq_norms, label_idx, counts, onehot, rows, chunk_bytes):
+    """
+    silhouette scores of the samples X[rows], measured against all samples of X
+    """
+    # the distances are the only (chunk, N) array, computed in place in a reused buffer
+    n_rows_per_chunk = max(1, min(len(rows), chunk_bytes // (8 * len(X))))
+    buffer = np.empty((n_rows_per_chunk, len(X)), dtype=np.float64)
+    scores = np.empty(len(rows), dtype=np.float64)
+
+    for start in range(0, len(rows), n_rows_per_chunk):
+        chunk = rows[start:start + n_rows_per_chunk]
+
+        # |x - y|^2 = |x|^2 - 2 x.y + |y|^2, clipped against negative rounding errors
+        distances = buffer[:len(chunk)]
+        np.dot(X[chunk], X.T, out=distances)
+        distances *= -2
+        distances += sq_norms[chunk, None]
+        distances += sq_norms[None, :]
+        np.sqrt(np.maximum(distances, 0, out=distances), out=distances)
+
+        # (chunk, n_clusters) sums of the distances to the samples of each cluster
+        cluster_sums = np.dot(distances, onehot)
+
+        own = label_idx[chunk]
+        chunk_idx = np.arange(len(chunk))
+        own_counts = counts[own]
+
+        # the distance of a sample to itself is 0, so only the count needs correcting
+        with np.errstate(divide='ignore', invalid='ignore'):
+            a = cluster_sums[chunk_idx, own] / (own_counts - 1)
+            mean_distances = cluster_sums / counts[None, :]
+        mean_distances[chunk_idx, own] = np.inf
+        b = np.min(mean_distances, axis=1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s = (b - a) / np.maximum(a, b)
+        # samples of single sample clusters have a silhouette of 0 by definition
+        s[own_counts == 1] = 0
+        scores[start:start + len(chunk)] = np.nan_to_num(s)
+
+    return scores
+
+
+def silhouette_samples(X, labels, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    silhouette_samples computes the silhouette score of each sample, as
+    sklearn.metrics.silhouette_samples with the euclidean metric
+
+    :param X - array of shape (N, ...), e.g. the encodings
+    :param labels - array of shape (N,), the cluster labels
+    :param chunk_bytes - upper bound of the memory of the pairwise distances
+        computed at once, in bytes
+    :return: array of shape (N,)
+    """
+    X, label_idx, counts, onehot = _prepare(X, labels)
+    if len(counts) < 2:
+        raise ValueError("the silhouette score needs at least 2 clusters")
+
+    sq_norms = np.sum(X ** 2, axis=1)
+    return _silhouette_rows(X, sq_norms, label_idx, counts, onehot,
+                            np.arange(len(X)), chunk_bytes)
+
+
+def silhouette_score(X, labels, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    silhouette_score is the mean silhouette score of all samples, see silhouette_samples()
+    """
+    return float(np.mean(silhouette_samples(X, labels, chunk_bytes)))
+
+
+def sampled_silhouette_score(X, labels, n_samples=10000, confidence=0.95,
+                             random_state=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    sampled_silhouette_score estimates the mean silhouette score from the exact scores of
+    n_samples randomly chosen samples. Each of them is measured against the full data,
+    so the cost is O(n_samples * N) instead of O(N^2).
+
+    :param X - array of shape (N, ...), e.g. the encodings
+    :param labels - array of shape (N,), the cluster labels
+    :param n_samples - number of samples whose scores are computed
+    :param confidence - confidence level of the returned interval
+    :param random_state - seed or np.random.RandomState of the sample selection
+    :param chunk_bytes - see silhouette_samples()
+    :return: (estimate, (lower, upper)), the estimated mean and its confidence interval
+    """
+    from scipy.stats import norm
+
+    X, label_idx, counts, onehot = _prepare(X, labels)
+    if len(counts) < 2:
+        raise ValueError("the silhouette score needs at least 2 clusters")
+
+    if not isinstance(random_state, np.random.RandomState):
+        random_state = np.random.RandomState(random_state)
+    if n_samples >= len(X):
+        rows = np.arange(len(X))
+    else:
+        rows = np.sort(random_state.choice(len(X), size=n_samples, replace=False))
+
+    sq_norms = np.sum(X ** 2, axis=1)
+    scores = _silhouette_rows(X, sq_norms, label_idx, counts, onehot, rows, chunk_bytes)
+
+    estimate = float(np.mean(scores))
+    if len(rows) == len(X):
+        return estimate, (estimate, estimate)
+
+    # normal approximation of the mean, with the finite population correction
+    # as the samples are drawn without replacement
+    fpc = np.sqrt((len(X) - len(rows)) / (len(X) - 1))
+    std_error = np.std(scores, ddof=1) / np.sqrt(len(rows)) * fpc
+    half_width = float(norm.ppf(0.5 + confidence / 2) * std_error)
+    return estimate, (estimate - half_width, estimate + half_width)
@@ -1,3 +1,6 @@
+import time
+from collections import OrderedDict
+
 import numpy as np
 import keras.backend as K
 from keras.activations import linear
@@ -7,6 +10,7 @@ from keras.optimizers import Adam
 from keras.layers.core import Lambda
 from keras.layers.merge import Concatenate
 
+from learn.models.optimizers import LossScaledAdam
 from learn.models.interfaces import Model, InfoganPrior, InfoganGenerator, InfoganDiscriminator, \
     InfoganEncoder
 
@@ -26,7 +30,10 @@ class InfoGAN2(Model):
                  shared_net,
                  discriminator,
                  encoder,
-                 recurrent_dim):
+                 recurrent_dim,
+                 loss_scale=None,
+                 joint_shared_pass=False,
+                 windows_per_sequence=None):
         """__init__
         :param batch_size - number of real samples passed at each iteration
         :param data_shape - e.g. (img_height, img_width, n_chan), shape of generated images
@@ -36,6 +43,19 @@ class InfoGAN2(Model):
         :param discriminator - D model
         :param encoder - E model
         :param recurrent_dim - set to None if data is not recurrent
+        :param loss_scale - static loss scale for mixed precision training, i.e. when the networks
+            are built with a low precision compute_dtype (e.g. 128 for 'float16', while 'bfloat16'
+            has the range of float32 and needs none). None disables loss scaling
+        :param joint_shared_pass - in the disc_train_model, pass the generated and the real samples
+            through the shared net as one concatenated batch instead of two separate passes.
+            The shared net must then normalize them separately, i.e. be built with
+            bn_group_size=batch_size
+        :param windows_per_sequence - for truncated BPTT training of recurrent networks built with
+            window_batch_size (see WindowedGRU): the minibatches are consecutive windows of
+            recurrent_dim timesteps, and the recurrent states are reset every
+            windows_per_sequence minibatches, when a new batch of sequences starts. The disc and
+            the gen pass each have their own state chains, the inference functions run the
+            windows independently from zero states, with any batch size
         """
 
         self.batch_size = batch_size
@@ -46,12 +66,25 @@ class InfoGAN2(Model):
         self.discriminator = discriminator
         self.encoder = encoder
         self.recurrent_dim = recurrent_dim
+        self.loss_scale = loss_scale
+        self.joint_shared_pass = joint_shared_pass
+        self.windows_per_sequence = windows_per_sequence
+        self.n_windows_trained = 0
+
+        assert self.generator.from_logits == self.discriminator.from_logits, \
+            "The generator and the discriminator must agree on whether D outputs logits."
+        assert not (windows_per_sequence and joint_shared_pass), \
+            "The windowed recurrent states need the separate shared net passes."
 
         if self.recurrent_dim:
             self.shape_prefix = (self.recurrent_dim, )
         else:
             self.shape_prefix = ()
 
+        # seconds spent in each stage of building the model
+        self.build_timings = OrderedDict()
+        start = time.time()
+
         # PUTTING IT TOGETHER
         self.sampled_latents, self.prior_param_inputs = self.prior.sample()
         self.generated = self.generator.generate(self.sampled_latents)
@@ -60,8 +93,7 @@ class InfoGAN2(Model):
                                 name="real_data_input")
         self.real_labels = encoder.get_labels_input()
 
-        shared_gen = self.shared_net.apply(self.generated)
-        shared_real = self.shared_net.apply(self.real_input)
+        shared_gen, shared_real = self._apply_shared_net()
 
         self.gen_encodings = self.encoder.encode(shared_gen)
         mi_losses, E_gen_loss_outputs = self.encoder.get_mi_loss(self.sampled_latents,
@@ -79,6 +111,9 @@ class InfoGAN2(Model):
         disc_losses, D_loss_outputs = self.discriminator.get_loss(
             self.disc_real, self.disc_gen)
 
+        self.build_timings['graph'] = time.time() - start
+        start = time.time()
+
         # DISCRIMINATOR TRAINING MODEL
         self.generator.freeze()
 
@@ -94,30 +129,149 @@ class InfoGAN2(Model):
                                         name="disc_train_model")
 
         disc_train_losses = merge_dicts(disc_losses, enc_losses)
-        self.disc_train_model.compile(optimizer=Adam(lr=2e-4, beta_1=0.2),
+        self.disc_train_model.compile(optimizer=self._make_optimizer(lr=2e-4, beta_1=0.2),
                                       loss=disc_train_losses)
 
+        self.build_timings['disc_train_model'] = time.time() - start
+        start = time.time()
+
         # GENERATOR TRAINING MODEL
         self.generator.unfreeze()
         self.shared_net.freeze()
         self.discriminator.freeze()
         self.encoder.freeze()
 
+        if self.joint_shared_pass or self.windows_per_sequence:
+            # the joint pass depends on the real samples, G needs its own pass over the generated
+            # ones. With windows, the own calls keep their own states, which advance once per
+            # window, the states of the disc pass calls are not touched
+            generated = self.generated
+            if self.windows_per_sequence:
+                generated = self.generator.generate(self.sampled_latents)
+            shared_gen = self.shared_net.apply(generated)
+            self.disc_gen = self.discriminator.discriminate(shared_gen)
+            mi_losses, E_gen_loss_outputs = self.encoder.get_mi_loss(
+                self.sampled_latents, self.encoder.encode(shared_gen))
+
         gen_losses, G_loss_outputs = self.generator.get_loss(self.disc_gen)
         gen_losses = merge_dicts(gen_losses, mi_losses)
         self.gen_train_model = K_Model(inputs=self.prior_param_inputs,
                                        outputs=G_loss_outputs + E_gen_loss_outputs,
                                        name="gen_train_model")
-        self.gen_train_model.compile(optimizer=Adam(lr=1e-3, beta_1=0.2),
+        self.gen_train_model.compile(optimizer=self._make_optimizer(lr=1e-3, beta_1=0.2),
                                      loss=gen_losses)
 
-        # FOR DEBUGGING
-        self.sample_debug = K.function(inputs=[K.learning_phase()] + self.prior_param_inputs,
-                                       outputs=[self.sampled_latents['c1']])
-        self.gen_and_predict = K.function(inputs=[K.learning_phase()] + self.prior_param_inputs,
-                                          outputs=[G_loss_outputs[0], self.generated])
-        self.disc_predict = K.function(inputs=[K.learning_phase(), self.real_input],
-                                       outputs=[D_loss_outputs[0]])
+        self.build_timings['gen_train_model'] = time.time() - start
+
+        # FOR DEBUGGING AND INFERENCE - the functions are only built on first use
+        # in the joint pass, D(real) is part of a graph that also takes the prior params
+        disc_predict_inputs = [K.learning_phase(), self.real_input]
+        if self.joint_shared_pass:
+            disc_predict_inputs += self.prior_param_inputs
+
+        self._function_specs = {
+            'sample_debug': ([K.learning_phase()] + self.prior_param_inputs,
+                             lambda: [self.sampled_latents['c1']]),
+            'gen_and_predict': ([K.learning_phase()] + self.prior_param_inputs,
+                                lambda: [G_loss_outputs[0], self.generated]),
+            'disc_predict': (disc_predict_inputs,
+                             lambda: [D_loss_outputs[0]]),
+            'encode': ([K.learning_phase(), self.real_input],
+                       self._encoding_outputs),
+        }
+        if self.windows_per_sequence:
+            # the training calls hold fixed size states, inference gets its own stateless calls
+            self._function_specs['gen_and_predict'] = (
+                [K.learning_phase()] + self.prior_param_inputs, self._stateless_gen_and_predict)
+            self._function_specs['disc_predict'] = (
+                [K.learning_phase(), self.real_input], self._stateless_disc_predict)
+        self._functions = {}
+
+    def _lazy_function(self, name):
+        if name not in self._functions:
+            inputs, make_outputs = self._function_specs[name]
+            self._functions[name] = K.function(inputs=inputs, outputs=make_outputs())
+        return self._functions[name]
+
+    @property
+    def sample_debug(self):
+        return self._lazy_function('sample_debug')
+
+    @property
+    def gen_and_predict(self):
+        return self._lazy_function('gen_and_predict')
+
+    @property
+    def disc_predict(self):
+        return self._lazy_function('disc_predict')
+
+    def _stateless_gen_and_predict(self):
+        generated = self.generator.generate(self.sampled_latents, stateless=True)
+        return [self.discriminator.discriminate(self.shared_net.apply_stateless(generated)),
+                generated]
+
+    def _stateless_disc_predict(self):
+        return [self.discriminator.discriminate(self.shared_net.apply_stateless(self.real_input))]
+
+    def _encoding_outputs(self):
+        real_encodings = self.real_encodings
+        if self.joint_shared_pass or self.windows_per_sequence:
+            # the joint pass needs a full batch of generated samples and the windowed training
+            # calls fixed size states, inference gets its own pass
+            real_encodings = self.encoder.encode(self.shared_net.apply_stateless(self.real_input))
+
+        outputs = []
+        for dist_name in self.encoder.meaningful_dists:
+            params = [real_encodings[dist_name][param_name]
+                      for param_name, _ in self.encoder.orderings[dist_name]]
+            outputs.append(K.concatenate(params, axis=-1) if len(params) > 1 else params[0])
+        return outputs
+
+    def iterate_encodings(self, samples, chunk_size=None):
+        """
+        iterate_encodings encodes samples chunk by chunk, see encode()
+
+        :param samples - real samples, any array-like that supports slicing (e.g. a memmap)
+        :param chunk_size - number of samples encoded at once, defaults to the batch size
+        """
+        chunk_size = chunk_size or self.batch_size
+        encode_fn = self._lazy_function('encode')
+        for start in range(0, len(samples), chunk_size):
+            yield encode_fn([0, samples[start:start + chunk_size]])
+
+    def encode(self, samples, chunk_size=None):
+        """
+        encode computes the encodings of real samples
+
+        :param samples - real samples, any array-like that supports slicing (e.g. a memmap)
+        :param chunk_size - number of samples encoded at once, defaults to the batch size
+        :return: list with an array per meaningful dist (in the order of the encoder's
+            meaningful_dists), holding its posterior params concatenated in the order
+            of the encoder's orderings
+        """
+        chunks = list(self.iterate_encodings(samples, chunk_size))
+        return [np.concatenate(dist_chunks, axis=0) for dist_chunks in zip(*chunks)]
+
+    def _apply_shared_net(self):
+        if not self.joint_shared_pass:
+            return self.shared_net.apply(self.generated), self.shared_net.apply(self.real_input)
+
+        # a single pass over the [generated, real] batch
+        joint_input = Lambda(function=lambda inputs: K.concatenate(inputs, axis=0),
+                             output_shape=lambda input_shapes: input_shapes[0],
+                             name="d_joint_input")([self.generated, self.real_input])
+        joint_shared = self.shared_net.apply(joint_input)
+
+        shared_gen = Lambda(function=lambda joint: joint[:self.batch_size],
+                            name="d_joint_gen")(joint_shared)
+        shared_real = Lambda(function=lambda joint: joint[self.batch_size:],
+                             name="d_joint_real")(joint_shared)
+        return shared_gen, shared_real
+
+    def _make_optimizer(self, **kwargs):
+        if self.loss_scale:
+            return LossScaledAdam(loss_scale=self.loss_scale, **kwargs)
+        return Adam(**kwargs)
 
     def sanity_check(self):
         """_sanity_check
@@ -129,7 +283,10 @@ class InfoGAN2(Model):
         prior_params = self.prior.assemble_prior_params()
         gen_score, samples = self.gen_and_predict([0] + prior_params)
         # disc_score1 = self.disc_model.predict(samples)
-        disc_score2 = self.disc_predict([0, samples])
+        disc_inputs = [0, samples]
+        if self.joint_shared_pass:
+            disc_inputs += prior_params
+        disc_score2 = self.disc_predict(disc_inputs)
 
         # assert np.all(np.isclose(gen_score, disc_score1, atol=1.e-2))
         assert np.all(np.equal(gen_score, disc_score2))
@@ -141,8 +298,9 @@ class InfoGAN2(Model):
         inputs = [samples_batch]
 
         if labels_batch is None and self.encoder.supervised_dist:
-            dim = self.meaningful_dists[self.supervised_dist_name].sample_size()
-            labels_batch = np.zeros((self.batch_size,) + self.shape_prefix + (dim, ))
+            dim = self.encoder.meaningful_dists[self.encoder.supervised_dist].sample_size()
+            labels_batch = np.zeros((self.batch_size,) + self.shape_prefix + (dim, ),
+                                    dtype=np.float32)
 
         if self.encoder.supervised_dist:
             inputs += [labels_batch]
@@ -158,7 +316,19 @@ class InfoGAN2(Model):
         return self.gen_train_model.train_on_batch(prior_params,
                                                    dummy_targets)
 
+    def reset_states(self):
+        """
+        reset_states zeroes the states of the stateful (windowed) recurrent layers
+        """
+        self.disc_train_model.reset_states()
+        self.gen_train_model.reset_states()
+
     def train_on_minibatch(self, samples, labels=None):
+        if self.windows_per_sequence:
+            if self.n_windows_trained % self.windows_per_sequence == 0:
+                self.reset_states()
+            self.n_windows_trained += 1
+
         disc_losses = self._train_disc_pass(samples, labels)
         gen_losses = self._train_gen_pass()
 
@@ -260,26 +430,36 @@ class InfoganGeneratorImpl(InfoganGenerator):
                  noise_dists,
                  data_q_dist,
                  network,
-                 recurrent_dim):
+                 recurrent_dim,
+                 from_logits=False):
+        """__init__
+
+        :param from_logits - set if the discriminator outputs logits, see InfoganDiscriminatorImpl
+        """
         super(InfoganGeneratorImpl, self).__init__(data_shape,
                                                    meaningful_dists, noise_dists, data_q_dist,
-                                                   network, recurrent_dim)
+                                                   network, recurrent_dim, from_logits)
         if self.recurrent_dim:
             self.shape_prefix = (self.recurrent_dim, )
         else:
             self.shape_prefix = ()
 
-    def generate(self, prior_samples):
+    def generate(self, prior_samples, stateless=False):
         """
         generate - applies the generator to a dictionary of samples from the different
         salient and noise distributions to generate a sample from p_G(x)
 
         :param prior_samples: dict, keys are dist. names, values are sampled keras tensors
+        :param stateless: apply the network without the states of its windowed recurrent
+            layers, see Network.apply_stateless
         """
         sampled_latents_flat = list(prior_samples.values())
         merged_samples = Concatenate(axis=-1, name="g_concat_prior_samples")(sampled_latents_flat)
 
-        generation_params = self.network.apply(inputs=merged_samples)
+        if stateless:
+            generation_params = self.network.apply_stateless(inputs=merged_samples)
+        else:
+            generation_params = self.network.apply(inputs=merged_samples)
 
         generated = Lambda(function=self._sample_data,
                            output_shape=self.shape_prefix + self.data_shape,
@@ -298,6 +478,7 @@ class InfoganGeneratorImpl(InfoganGenerator):
                 param = params[:, i:i + param_dim]
 
             params_dict[param_name] = param_activ(param)
+            i += param_dim
 
         sampled_data = self.data_q_dist.sample(params_dict)
 
@@ -317,6 +498,13 @@ class InfoganGeneratorImpl(InfoganGenerator):
             # NOTE: targets are ignored, cause it's clear those are generated samples
             return -K.log(preds + K.epsilon())
 
+        def gen_loss_from_logits(targets, logits):
+            # -log(sigmoid(logits)), without clipping the gradients through the epsilon
+            return K.softplus(-logits)
+
+        if self.from_logits:
+            gen_loss = gen_loss_from_logits
+
         return {loss_layer_name: gen_loss}, [gen_output]
 
     def freeze(self):
@@ -329,11 +517,21 @@ class InfoganGeneratorImpl(InfoganGenerator):
 class InfoganDiscriminatorImpl(InfoganDiscriminator):
 
     def __init__(self,
-                 network):
-        super(InfoganDiscriminatorImpl, self).__init__(network)
+                 network,
+                 from_logits=False):
+        """__init__
+
+        :param network - D network, outputs the pre-activations of the real/fake classifier
+        :param from_logits - if set, D outputs logits and the losses use a fused softplus
+            instead of log(sigmoid(...) + epsilon)
+        """
+        super(InfoganDiscriminatorImpl, self).__init__(network, from_logits)
 
     def discriminate(self, samples):
         preactiv = self.network.apply(samples)
+        if self.from_logits:
+            return preactiv
+
         output = Activation(activation=K.sigmoid)(preactiv)
         return output
 
@@ -352,6 +550,14 @@ class InfoganDiscriminatorImpl(InfoganDiscriminator):
             # NOTE: targets are ignored, cause it's clear those are real samples
             return -K.log(1 - gen_preds + K.epsilon()) / 2.0
 
+        if self.from_logits:
+            # -log(sigmoid(x)) = softplus(-x) and -log(1 - sigmoid(x)) = softplus(x)
+            def disc_real_loss(targets, real_logits):
+                return K.softplus(-real_logits) / 2.0
+
+            def disc_gen_loss(targets, gen_logits):
+                return K.softplus(gen_logits) / 2.0
+
         return {loss_real_name: disc_real_loss, loss_gen_name: disc_gen_loss}, \
             [real_output, gen_output]
 
@@ -481,7 +687,8 @@ class InfoganEncoderImpl(InfoganEncoder):
         # since some real instances might not have a label, I assume that
         # this is indicated by all labels in the batch being set to 0 everywhere
         # (which is never the case for discrete labels, and almost impossible for
-        # continuous labels)
+        # continuous labels). Within a batch, all zero rows of discrete labels add no loss,
+        # as the categorical nll is a dot product with the one-hot labels
         def wrapped_loss(targets, preds):
             labels_missing = K.all(K.equal(self.real_labels,
                                            K.zeros_like(self.real_labels)))
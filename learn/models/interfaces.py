@@ -42,16 +42,18 @@ class InfoganGenerator:
                  noise_dists,
                  data_q_dist,
                  network,
-                 recurrent_dim):
+                 recurrent_dim,
+                 from_logits=False):
         self.data_shape = data_shape
         self.meaningful_dists = meaningful_dists
         self.noise_dists = noise_dists
         self.data_q_dist = data_q_dist
         self.network = network
         self.recurrent_dim = recurrent_dim
+        self.from_logits = from_logits
 
     @abc.abstractmethod
-    def generate(self, prior_samples):
+    def generate(self, prior_samples, stateless=False):
         raise NotImplementedError
 
     @abc.abstractmethod
@@ -71,8 +73,10 @@ class InfoganGenerator:
 class InfoganDiscriminator:
 
     def __init__(self,
-                 network):
+                 network,
+                 from_logits=False):
         self.network = network
+        self.from_logits = from_logits
 
     @abc.abstractmethod
     def discriminate(self, samples):
@@ -0,0 +1,34 @@
+"""
+Optimizers used to train the InfoGAN models
+"""
+import keras.backend as K
+from keras.optimizers import Adam, clip_norm
+
+
+class LossScaledAdam(Adam):
+    """
+    Adam with a static loss scale for mixed precision training. The loss is multiplied by
+    loss_scale before differentiation, so that the small gradients of low precision activations
+    do not underflow, and the gradients are unscaled again before the full precision update.
+    """
+
+    def __init__(self, loss_scale=128.0, **kwargs):
+        super(LossScaledAdam, self).__init__(**kwargs)
+        self.loss_scale = loss_scale
+
+    def get_gradients(self, loss, params):
+        grads = K.gradients(loss * self.loss_scale, params)
+        grads = [grad / self.loss_scale for grad in grads]
+
+        # clipping is applied to the unscaled gradients, as in keras.optimizers.Optimizer
+        if hasattr(self, 'clipnorm') and self.clipnorm > 0:
+            norm = K.sqrt(sum([K.sum(K.square(g)) for g in grads]))
+            grads = [clip_norm(g, self.clipnorm, norm) for g in grads]
+        if hasattr(self, 'clipvalue') and self.clipvalue > 0:
+            grads = [K.clip(g, -self.clipvalue, self.clipvalue) for g in grads]
+        return grads
+
+    def get_config(self):
+        config = {'loss_scale': self.loss_scale}
+        base_config = super(LossScaledAdam, self).get_config()
+        return dict(list(base_config.items()) + list(config.items()))
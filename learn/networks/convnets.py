@@ -3,52 +3,87 @@ Some network structures used by the InfoGAN
 """
 
 import keras.backend as K
-from keras.layers import Conv2D, BatchNormalization, Activation, Dense, Conv2DTranspose, Flatten, \
-    Reshape, Input
+from keras.layers import Conv2D, SeparableConv2D, BatchNormalization, Activation, Dense, \
+    Conv2DTranspose, Flatten, Reshape, Input
 from keras.layers.advanced_activations import LeakyReLU
 from keras.models import Model
 
 from learn.networks.interfaces import Network
+from learn.networks.layers import Cast, GroupBatchNormalization, low_precision, full_precision
+from learn.networks.registry import register_network
 
 
-class SharedNet(Network):
+def _scaled(units, width_multiplier):
+    return max(1, int(round(units * width_multiplier)))
+
+
+def _batch_norm(name, group_size):
+    if group_size:
+        return GroupBatchNormalization(group_size=group_size, name=name, axis=-1)
+    return BatchNormalization(name=name, axis=-1)
 
-    def __init__(self, data_shape):
+
+@register_network("shared_net")
+@register_network("shared_net_strided", strides=(1, 2, 1, 2))
+@register_network("shared_net_separable", separable=True)
+@register_network("shared_net_mobile", strides=(2, 1, 2, 1), separable=True, width_multiplier=0.5)
+class SharedNet(Network):
+    """
+    SharedNet - a stack of 3x3 convolutions followed by a dense layer. The defaults are
+    four 64-filter convolutions at full resolution; the cheaper variants downsample with
+    strides, use depthwise separable convolutions and / or fewer filters.
+    """
+
+    def __init__(self, data_shape,
+                 filters=(64, 64, 64, 64),
+                 strides=(1, 1, 1, 1),
+                 separable=False,
+                 width_multiplier=1.0,
+                 dense_units=128,
+                 bn_group_size=None,
+                 compute_dtype=None):
+        """__init__
+
+        :param data_shape - shape of a single image
+        :param filters - number of filters of each convolution
+        :param strides - stride of each convolution, e.g. 2 to halve the resolution
+        :param separable - use depthwise separable convolutions (except for the first one,
+            which sees only the input channels)
+        :param width_multiplier - scales the number of filters of all convolutions
+        :param dense_units - size of the output, i.e. shared_out_shape of the E and D heads
+        :param bn_group_size - normalize groups of this many samples separately, needed when
+            the generated and real samples are passed as one batch (joint_shared_pass of InfoGAN2)
+        :param compute_dtype - e.g. 'float16' or 'bfloat16' to run the convolutions and matmuls
+            in low precision (mixed precision training), None for full precision
+        """
+        assert len(filters) == len(strides), "Each convolution needs a stride."
         self.layers = []
 
-        self.layers.append(Conv2D(filters=64,
-                                  kernel_size=(3, 3),
-                                  padding="same",
-                                  name="d_conv_1"))
-        self.layers.append(LeakyReLU(name="d_conv_activ_1"))
-
-        self.layers.append(Conv2D(filters=64,
-                                  kernel_size=(3, 3),
-                                  padding="same",
-                                  name="d_conv_2"))
-        self.layers.append(BatchNormalization(name="d_conv_bn_2", axis=-1))
-        self.layers.append(LeakyReLU(name="d_conv_activ_2"))
-
-        self.layers.append(Conv2D(filters=64,
-                                  kernel_size=(3, 3),
-                                  padding="same",
-                                  name="d_conv_3"))
-        self.layers.append(BatchNormalization(name="d_conv_bn_3", axis=-1))
-        self.layers.append(LeakyReLU(name="d_conv_activ_3"))
-
-        self.layers.append(Conv2D(filters=64,
-                                  kernel_size=(3, 3),
-                                  padding="same",
-                                  name="d_conv_4"))
-        self.layers.append(BatchNormalization(name="d_conv_bn_4", axis=-1))
-        self.layers.append(LeakyReLU(name="d_conv_activ_4"))
+        for i, (n_filters, stride) in enumerate(zip(filters, strides)):
+            index = i + 1
+            conv_class = SeparableConv2D if separable and i > 0 else Conv2D
+            self.layers.append(low_precision(conv_class(filters=_scaled(n_filters, width_multiplier),
+                                                        kernel_size=(3, 3),
+                                                        strides=(stride, stride),
+                                                        padding="same",
+                                                        name="d_conv_{}".format(index)),
+                                             compute_dtype))
+            # the raw inputs are not normalized
+            if i > 0:
+                self.layers.append(full_precision(
+                    _batch_norm("d_conv_bn_{}".format(index), bn_group_size), compute_dtype))
+            self.layers.append(LeakyReLU(name="d_conv_activ_{}".format(index)))
 
         self.layers.append(Flatten(name="d_flatten"))
-        self.layers.append(Dense(units=128, name="d_dense_1"))
-        self.layers.append(BatchNormalization(name="d_dense_bn_1", axis=-1))
+        self.layers.append(low_precision(Dense(units=dense_units, name="d_dense_1"), compute_dtype))
+        self.layers.append(full_precision(_batch_norm("d_dense_bn_1", bn_group_size),
+                                          compute_dtype))
 
         self.layers.append(LeakyReLU(name="d_dense_1_activ"))
 
+        if compute_dtype:
+            self.layers.append(Cast(K.floatx(), name="d_output_cast"))
+
         inputs = Input(shape=data_shape)
         network = inputs
         for layer in self.layers:
@@ -60,43 +95,63 @@ class SharedNet(Network):
         return self.model(inputs)
 
 
+@register_network("generator")
+@register_network("generator_slim", width_multiplier=0.5)
 class BinaryImgGeneratorNetwork(Network):
 
-    def __init__(self, latent_dim, image_shape):
+    def __init__(self, latent_dim, image_shape, width_multiplier=1.0, compute_dtype=None):
+        """__init__
+
+        :param latent_dim - dimensionality of the concatenated latents
+        :param image_shape - shape of a single generated image
+        :param width_multiplier - scales the number of units / filters of the hidden layers
+        :param compute_dtype - e.g. 'float16' or 'bfloat16' to run the convolutions and matmuls
+            in low precision (mixed precision training), None for full precision
+        """
         self.layers = []
+        n_filters = _scaled(64, width_multiplier)
 
         # a fully connected is needed to bring the inputs to a shape suitable for convolutions
-        self.layers.append(Dense(units=128, name="g_dense_1"))
-        self.layers.append(BatchNormalization(name="g_dense_bn_1", axis=-1))
+        self.layers.append(low_precision(Dense(units=_scaled(128, width_multiplier),
+                                               name="g_dense_1"), compute_dtype))
+        self.layers.append(full_precision(BatchNormalization(name="g_dense_bn_1", axis=-1),
+                                          compute_dtype))
         self.layers.append(Activation(activation=K.relu, name="g_dense_activ_1"))
 
-        self.layers.append(Dense(units=image_shape[0] // 4 * image_shape[1] // 4 * 64,
-                                 name="g_dense_2"))
-        self.layers.append(BatchNormalization(name="g_dense_bn_2", axis=-1))
+        self.layers.append(low_precision(Dense(units=image_shape[0] // 4 * image_shape[1] // 4 *
+                                               n_filters,
+                                               name="g_dense_2"), compute_dtype))
+        self.layers.append(full_precision(BatchNormalization(name="g_dense_bn_2", axis=-1),
+                                          compute_dtype))
         self.layers.append(Activation(activation=K.relu, name="g_dense_activ_2"))
 
         # # # I use the `th` orientation of theano
-        self.layers.append(Reshape(target_shape=(image_shape[0] // 4, image_shape[1] // 4, 64),
+        self.layers.append(Reshape(target_shape=(image_shape[0] // 4, image_shape[1] // 4,
+                                                 n_filters),
                                    name="g_reshape"))
 
         # # start applying the deconv layers
-        self.layers.append(Conv2DTranspose(filters=64, kernel_size=(3, 3),
-                                           strides=(2, 2),
-                                           padding='same',
-                                           data_format='channels_last',
-                                           name="g_deconv_1"))
-        self.layers.append(BatchNormalization(name="g_deconv_bn_1", axis=-1))
+        self.layers.append(low_precision(Conv2DTranspose(filters=n_filters, kernel_size=(3, 3),
+                                                         strides=(2, 2),
+                                                         padding='same',
+                                                         data_format='channels_last',
+                                                         name="g_deconv_1"), compute_dtype))
+        self.layers.append(full_precision(BatchNormalization(name="g_deconv_bn_1", axis=-1),
+                                          compute_dtype))
         self.layers.append(Activation(activation=K.relu, name="g_deconv_activ_1"))
 
         # # TODO: if we'll be generating color images, this needs to produce
         # # a 1024 * image_shape[2] number of channels
-        self.layers.append(Conv2DTranspose(filters=image_shape[2], kernel_size=(3, 3),
-                                           strides=(2, 2),
-                                           padding='same',
-                                           data_format='channels_last',
-                                           name="g_deconv_3"))
+        self.layers.append(low_precision(Conv2DTranspose(filters=image_shape[2], kernel_size=(3, 3),
+                                                         strides=(2, 2),
+                                                         padding='same',
+                                                         data_format='channels_last',
+                                                         name="g_deconv_3"), compute_dtype))
         self.layers.append(Reshape(target_shape=(1,) + image_shape, name="g_param_reshape"))
 
+        if compute_dtype:
+            self.layers.append(Cast(K.floatx(), name="g_output_cast"))
+
         inputs = Input(shape=(latent_dim, ))
         network = inputs
         for layer in self.layers:
@@ -108,14 +163,19 @@ class BinaryImgGeneratorNetwork(Network):
         return self.model(inputs)
 
 
+@register_network("encoder")
 class EncoderNetwork(Network):
 
-    def __init__(self, shared_out_shape):
+    def __init__(self, shared_out_shape, compute_dtype=None):
         self.layers = []
-        self.layers.append(Dense(128, name="e_dense_1"))
-        self.layers.append(BatchNormalization(name="e_dense_bn_1", axis=-1, scale=False))
+        self.layers.append(low_precision(Dense(128, name="e_dense_1"), compute_dtype))
+        self.layers.append(full_precision(BatchNormalization(name="e_dense_bn_1", axis=-1,
+                                                             scale=False), compute_dtype))
         self.layers.append(LeakyReLU(name="e_dense_activ_1"))
 
+        if compute_dtype:
+            self.layers.append(Cast(K.floatx(), name="e_output_cast"))
+
         inputs = Input(shape=shared_out_shape)
         network = inputs
         for layer in self.layers:
@@ -127,11 +187,15 @@ class EncoderNetwork(Network):
         return self.model(inputs)
 
 
+@register_network("discriminator")
 class DiscriminatorNetwork(Network):
 
-    def __init__(self, shared_out_shape):
+    def __init__(self, shared_out_shape, compute_dtype=None):
         self.layers = []
-        self.layers.append(Dense(1, name="d_classif_layer"))
+        self.layers.append(low_precision(Dense(1, name="d_classif_layer"), compute_dtype))
+
+        if compute_dtype:
+            self.layers.append(Cast(K.floatx(), name="d_classif_output_cast"))
 
         inputs = Input(shape=shared_out_shape)
         network = inputs
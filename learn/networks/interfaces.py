@@ -12,6 +12,13 @@ class Network(object):
     def apply(self, inputs):
         raise NotImplementedError
 
+    def apply_stateless(self, inputs):
+        """
+        apply_stateless applies the network without the states that its windowed recurrent
+        layers carry from call to call (see WindowedGRU), it is apply() for the other networks
+        """
+        return self.apply(inputs)
+
     def freeze(self):
         for layer in self.layers:
             layer.trainable = False
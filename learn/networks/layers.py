@@ -0,0 +1,397 @@
+"""
+Custom keras layers used by the networks
+"""
+import numpy as np
+import keras.backend as K
+from keras.engine.topology import Layer
+from keras.layers import BatchNormalization, GRU, deserialize as deserialize_layer
+from keras.layers.recurrent import Recurrent
+from keras.layers.wrappers import Wrapper
+
+# weight attributes of the keras layers, which are cast to the compute dtype on the fly
+WEIGHT_ATTRIBUTES = ("kernel", "bias", "depthwise_kernel", "pointwise_kernel", "gamma", "beta")
+
+
+def _keep_learning_phase(source, target):
+    # casting creates a new tensor, which would lose keras' learning phase flag
+    if getattr(source, '_uses_learning_phase', False):
+        target._uses_learning_phase = True
+    return target
+
+
+class MixedPrecision(Wrapper):
+    """
+    MixedPrecision runs the wrapped layer in compute_dtype (e.g. 'float16' or 'bfloat16'),
+    while its weights stay in K.floatx() and are updated in full precision. The inputs and the
+    weights are cast on the fly and the outputs are cast to output_dtype.
+    """
+
+    def __init__(self, layer, compute_dtype, output_dtype=None, **kwargs):
+        """__init__
+
+        :param layer - the wrapped layer
+        :param compute_dtype - dtype the inputs and weights are cast to before calling the layer
+        :param output_dtype - dtype of the outputs, defaults to compute_dtype
+        """
+        self.compute_dtype = compute_dtype
+        self.output_dtype = output_dtype or compute_dtype
+        kwargs.setdefault('name', "{}_mixed".format(layer.name))
+        super(MixedPrecision, self).__init__(layer, **kwargs)
+
+    def build(self, input_shape):
+        if not self.layer.built:
+            self.layer.build(input_shape)
+            self.layer.built = True
+        super(MixedPrecision, self).build()
+
+    def compute_output_shape(self, input_shape):
+        return self.layer.compute_output_shape(input_shape)
+
+    @property
+    def trainable_weights(self):
+        # the wrapper is the layer that gets frozen / unfrozen
+        if not self.trainable:
+            return []
+        return self.layer.trainable_weights
+
+    @property
+    def non_trainable_weights(self):
+        if not self.trainable:
+            return self.layer.weights
+        return self.layer.non_trainable_weights
+
+    def call(self, inputs, training=None):
+        cast_inputs = K.cast(inputs, self.compute_dtype)
+
+        master_weights = {}
+        for attr in WEIGHT_ATTRIBUTES:
+            weight = getattr(self.layer, attr, None)
+            if weight is not None and K.dtype(weight) != self.compute_dtype:
+                master_weights[attr] = weight
+                setattr(self.layer, attr, K.cast(weight, self.compute_dtype))
+
+        kwargs = {'training': training} if training is not None else {}
+        try:
+            outputs = self.layer.call(cast_inputs, **kwargs)
+        finally:
+            for attr, weight in master_weights.items():
+                setattr(self.layer, attr, weight)
+
+        # the wrapped layer registered its updates (e.g. moving averages) for the cast inputs
+        self.add_update(self.layer.get_updates_for(cast_inputs), inputs)
+
+        return _keep_learning_phase(outputs, K.cast(outputs, self.output_dtype))
+
+    def get_config(self):
+        config = {'compute_dtype': self.compute_dtype,
+                  'output_dtype': self.output_dtype}
+        base_config = super(MixedPrecision, self).get_config()
+        return dict(list(base_config.items()) + list(config.items()))
+
+
+class Cast(Layer):
+    """
+    Cast casts its inputs to target_dtype, e.g. the low precision outputs of a network
+    back to K.floatx()
+    """
+
+    def __init__(self, target_dtype, **kwargs):
+        self.target_dtype = target_dtype
+        super(Cast, self).__init__(**kwargs)
+
+    def call(self, inputs):
+        return _keep_learning_phase(inputs, K.cast(inputs, self.target_dtype))
+
+    def get_config(self):
+        config = {'target_dtype': self.target_dtype}
+        base_config = super(Cast, self).get_config()
+        return dict(list(base_config.items()) + list(config.items()))
+
+
+def low_precision(layer, compute_dtype):
+    """
+    low_precision runs layer in compute_dtype, or returns it unchanged if compute_dtype is None
+    """
+    if compute_dtype is None:
+        return layer
+    return MixedPrecision(layer, compute_dtype)
+
+
+def full_precision(layer, compute_dtype):
+    """
+    full_precision runs layer (e.g. BatchNormalization, whose statistics need the range)
+    in K.floatx() inside of a low precision network, and casts its outputs back to compute_dtype
+    """
+    if compute_dtype is None:
+        return layer
+    return MixedPrecision(layer, K.floatx(), output_dtype=compute_dtype)
+
+
+class GroupBatchNormalization(BatchNormalization):
+    """
+    GroupBatchNormalization normalizes consecutive groups of group_size samples in a batch
+    with their own statistics, e.g. the generated and the real half of a concatenated
+    [generated, real] batch, which then behave as if they went through BatchNormalization
+    separately. The moving averages are updated with the mean statistics of the groups.
+    """
+
+    def __init__(self, group_size, **kwargs):
+        """__init__
+
+        :param group_size - number of samples per group, the batch size must be a multiple of it
+        :param kwargs - arguments of keras' BatchNormalization
+        """
+        self.group_size = group_size
+        super(GroupBatchNormalization, self).__init__(**kwargs)
+
+    def _group_moments(self, inputs):
+        # (n_groups, group_size, ...), the feature axis moves by one
+        input_shape = K.int_shape(inputs)
+        axis = self.axis % len(input_shape)
+        grouped = K.reshape(inputs, (-1, self.group_size) + tuple(input_shape[1:]))
+        reduction_axes = [1] + [i + 1 for i in range(1, len(input_shape)) if i != axis]
+
+        mean = K.mean(grouped, axis=reduction_axes, keepdims=True)
+        variance = K.mean(K.square(grouped - mean), axis=reduction_axes, keepdims=True)
+        return grouped, mean, variance
+
+    def call(self, inputs, training=None):
+        input_shape = K.int_shape(inputs)
+        ndim = len(input_shape)
+        axis = self.axis % ndim
+
+        grouped_broadcast = [1] * (ndim + 1)
+        grouped_broadcast[axis + 1] = input_shape[axis]
+        broadcast_shape = [1] * ndim
+        broadcast_shape[axis] = input_shape[axis]
+
+        gamma = self.gamma if self.scale else None
+        beta = self.beta if self.center else None
+
+        # the grouping is only built inside of the training branch, at inference the batch
+        # size need not be a multiple of group_size
+        def normalize_training():
+            grouped, mean, variance = self._group_moments(inputs)
+            normed_grouped = (grouped - mean) / K.sqrt(variance + self.epsilon)
+            if gamma is not None:
+                normed_grouped = normed_grouped * K.reshape(gamma, grouped_broadcast)
+            if beta is not None:
+                normed_grouped = normed_grouped + K.reshape(beta, grouped_broadcast)
+            return K.reshape(normed_grouped, K.shape(inputs))
+
+        # the updates only run in the training functions, where the batch is grouped
+        _, mean, variance = self._group_moments(inputs)
+        self.add_update([K.moving_average_update(self.moving_mean,
+                                                 K.flatten(K.mean(mean, axis=0)),
+                                                 self.momentum),
+                         K.moving_average_update(self.moving_variance,
+                                                 K.flatten(K.mean(variance, axis=0)),
+                                                 self.momentum)],
+                        inputs)
+
+        def normalize_inference():
+            return K.batch_normalization(
+                inputs,
+                K.reshape(self.moving_mean, broadcast_shape),
+                K.reshape(self.moving_variance, broadcast_shape),
+                K.reshape(beta, broadcast_shape) if beta is not None else None,
+                K.reshape(gamma, broadcast_shape) if gamma is not None else None,
+                epsilon=self.epsilon)
+
+        return K.in_train_phase(normalize_training, normalize_inference, training=training)
+
+    def get_config(self):
+        config = {'group_size': self.group_size}
+        base_config = super(GroupBatchNormalization, self).get_config()
+        return dict(list(base_config.items()) + list(config.items()))
+
+
+class WindowedGRU(GRU):
+    """
+    WindowedGRU is a stateful GRU for truncated backpropagation through time: a long sequence
+    is fed as consecutive windows, the last state of a window is the initial state of the next
+    one, and the gradients stop at the window boundaries (the states are variables).
+
+    Unlike keras' stateful GRU, every call of the layer gets its own state variables, so a
+    layer shared between streams (e.g. the real and the generated samples in the shared net)
+    continues each stream separately. reset_states() zeroes the states of all calls,
+    at the start of new sequences.
+
+    Calls with stateless=True are plain GRU calls instead (zero initial states, any batch size),
+    e.g. for inference on independent windows. keras keeps the call arguments in the graph,
+    a model built from such a call stays stateless wherever it is applied.
+    """
+
+    def __init__(self, units, batch_size, **kwargs):
+        """__init__
+
+        :param units - number of GRU units
+        :param batch_size - fixed number of sequences per batch
+        :param kwargs - arguments of keras' GRU
+        """
+        self.batch_size = batch_size
+        self.call_states = []
+        super(WindowedGRU, self).__init__(units, **kwargs)
+
+    def call(self, inputs, mask=None, training=None, initial_state=None, stateless=False):
+        if stateless:
+            # only for the duration of this call, the flag stays set for keras' reset_states()
+            # and update collection
+            self.stateful = False
+            try:
+                return super(WindowedGRU, self).call(inputs, mask=mask, training=training)
+            finally:
+                self.stateful = True
+
+        # keras' stateful code path, with fresh state variables for this call
+        self.states = [K.zeros((self.batch_size, self.units))]
+        self.call_states.append(self.states)
+        self.stateful = True
+        return super(WindowedGRU, self).call(inputs, mask=mask, training=training)
+
+    def reset_states(self, states=None):
+        for call_states in self.call_states:
+            for state in call_states:
+                K.set_value(state, np.zeros(K.int_shape(state)))
+
+    def get_config(self):
+        config = {'batch_size': self.batch_size}
+        base_config = super(WindowedGRU, self).get_config()
+        config = dict(list(base_config.items()) + list(config.items()))
+        config['stateful'] = False
+        return config
+
+
+class CheckpointedSequence(Layer):
+    """
+    CheckpointedSequence applies a stack of layers to sequences with gradient checkpointing:
+    the timesteps are processed in segments of segment_length, and for the backward pass only
+    the segment inputs and the recurrent states at the segment boundaries are kept. The
+    activations inside of a segment are recomputed while its gradients are computed, so the
+    memory of the intermediate activations is that of one segment instead of the whole
+    sequence, at the cost of a second forward pass.
+
+    The first layer may be a recurrent layer with a single state whose output is the state
+    (GRU, SimpleRNN), it carries its state from segment to segment. The other layers must
+    work on each timestep independently (Dense, TimeDistributed, activations). The layers
+    must be deterministic (no dropout), the recomputation has to give the same activations.
+    Needs tf.custom_gradient (tensorflow >= 1.7).
+    """
+
+    def __init__(self, layers, segment_length, **kwargs):
+        """__init__
+
+        :param layers - the stacked layers, not yet called on any inputs
+        :param segment_length - number of timesteps per segment
+        """
+        self.layers = layers
+        self.segment_length = segment_length
+        super(CheckpointedSequence, self).__init__(**kwargs)
+
+    def build(self, input_shape):
+        shape = input_shape
+        for layer in self.layers:
+            if not layer.built:
+                with K.name_scope(layer.name):
+                    layer.build(shape)
+                layer.built = True
+            shape = layer.compute_output_shape(shape)
+
+        if isinstance(self.layers[0], Recurrent):
+            assert len(self.layers[0].states) == 1 and self.layers[0].return_sequences, \
+                "The recurrent layer must have a single state and return sequences."
+        super(CheckpointedSequence, self).build(input_shape)
+
+    def compute_output_shape(self, input_shape):
+        for layer in self.layers:
+            input_shape = layer.compute_output_shape(input_shape)
+        return input_shape
+
+    def _layer_weights(self):
+        return [weight for layer in self.layers for weight in layer.trainable_weights]
+
+    @property
+    def trainable_weights(self):
+        if not self.trainable:
+            return []
+        return self._layer_weights()
+
+    @property
+    def non_trainable_weights(self):
+        weights = [weight for layer in self.layers for weight in layer.non_trainable_weights]
+        if not self.trainable:
+            return self._layer_weights() + weights
+        return weights
+
+    def _forward(self, inputs, initial_state):
+        # the outputs of the stack and the last state of the recurrent layer
+        outputs = inputs
+        last_state = K.identity(initial_state)
+        for index, layer in enumerate(self.layers):
+            if index == 0 and isinstance(layer, Recurrent):
+                outputs = layer.call(outputs, initial_state=[initial_state])
+                last_state = outputs[:, -1]
+            else:
+                outputs = layer.call(outputs)
+        return outputs, last_state
+
+    def _checkpointed_segment(self, inputs, initial_state):
+        import tensorflow as tf
+
+        # the weights are passed as explicit inputs, their gradients are returned together
+        # with the gradients of the segment inputs
+        weights = self._layer_weights()
+
+        @tf.custom_gradient
+        def segment(segment_inputs, segment_state, *segment_weights):
+            outputs, last_state = self._forward(segment_inputs, segment_state)
+
+            def grad(outputs_grad, last_state_grad):
+                if last_state_grad is None:
+                    last_state_grad = K.zeros_like(last_state)
+                # depending on the incoming gradients moves the recomputation into the
+                # backward pass and keeps it from being merged with the forward pass
+                with tf.control_dependencies([outputs_grad, last_state_grad]):
+                    recomputed_inputs = K.identity(segment_inputs)
+                    recomputed_state = K.identity(segment_state)
+                recomputed_outputs, recomputed_last_state = self._forward(recomputed_inputs,
+                                                                          recomputed_state)
+
+                sources = [recomputed_inputs, recomputed_state] + weights
+                grads = tf.gradients([recomputed_outputs, recomputed_last_state], sources,
+                                     grad_ys=[outputs_grad, last_state_grad])
+                return [K.zeros_like(source) if g is None else g
+                        for source, g in zip(sources, grads)]
+
+            return (outputs, last_state), grad
+
+        return segment(inputs, initial_state, *weights)
+
+    def call(self, inputs):
+        n_timesteps = K.int_shape(inputs)[1]
+        assert n_timesteps is not None, "The number of timesteps must be known."
+
+        # zero initial state of shape (batch_size, units), a dummy one without recurrent layer
+        state_dim = self.layers[0].units if isinstance(self.layers[0], Recurrent) else 1
+        state = K.repeat_elements(K.zeros_like(inputs[:, 0, :1]), state_dim, axis=1)
+
+        segments = []
+        for start in range(0, n_timesteps, self.segment_length):
+            outputs, state = self._checkpointed_segment(
+                inputs[:, start:start + self.segment_length], state)
+            segments.append(outputs)
+
+        return K.concatenate(segments, axis=1)
+
+    def get_config(self):
+        config = {'layers': [{'class_name': layer.__class__.__name__,
+                              'config': layer.get_config()} for layer in self.layers],
+                  'segment_length': self.segment_length}
+        base_config = super(CheckpointedSequence, self).get_config()
+        return dict(list(base_config.items()) + list(config.items()))
+
+    @classmethod
+    def from_config(cls, config, custom_objects=None):
+        layers = [deserialize_layer(layer_config, custom_objects=custom_objects)
+                  for layer_config in config.pop('layers')]
+        return cls(layers, **config)
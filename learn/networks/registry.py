@@ -0,0 +1,53 @@
+"""
+Registry of the network structures, so that they can be selected by name (e.g. from a config)
+"""
+import importlib
+
+NETWORKS = {}
+
+# modules that register networks when imported
+NETWORK_MODULES = ["learn.networks.convnets", "learn.networks.rnns", "learn.networks.tcns"]
+
+
+def register_network(name, **defaults):
+    """
+    register_network is a class decorator, which registers a Network under name.
+    A class can be registered several times, with different default constructor arguments.
+
+    :param name - name of the network (variant)
+    :param defaults - default keyword arguments of the variant
+    """
+
+    def decorator(network_class):
+        assert name not in NETWORKS, "Network {} is already registered.".format(name)
+        NETWORKS[name] = (network_class, defaults)
+        return network_class
+
+    return decorator
+
+
+def build_network(name, **kwargs):
+    """
+    build_network creates the network registered under name
+
+    :param name - name of the network (variant), see available_networks()
+    :param kwargs - constructor arguments, override the defaults of the variant
+    """
+    _load_network_modules()
+    assert name in NETWORKS, \
+        "Unknown network {}, use one of {}".format(name, available_networks())
+
+    network_class, defaults = NETWORKS[name]
+    config = defaults.copy()
+    config.update(kwargs)
+    return network_class(**config)
+
+
+def available_networks():
+    _load_network_modules()
+    return sorted(NETWORKS.keys())
+
+
+def _load_network_modules():
+    for module in NETWORK_MODULES:
+        importlib.import_module(module)
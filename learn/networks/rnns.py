@@ -7,43 +7,118 @@ from keras.layers.advanced_activations import LeakyReLU
 from keras.models import Model
 
 from learn.networks.interfaces import Network
+from learn.networks.layers import CheckpointedSequence, WindowedGRU
+from learn.networks.registry import register_network
 
 
+def _recurrent_layer(units, implementation, unroll, window_batch_size=None):
+    kwargs = dict(activation="relu", return_sequences=True,
+                  implementation=implementation,
+                  unroll=unroll)
+    if window_batch_size:
+        return WindowedGRU(units, window_batch_size, **kwargs)
+    return GRU(units, **kwargs)
+
+
+def _checkpointed(layers, segment_length):
+    # the stack becomes a single layer, which keeps only the segment boundaries for backprop
+    if not segment_length:
+        return layers
+    return [CheckpointedSequence(layers, segment_length)]
+
+
+def _stateless_model(inputs, layers, name):
+    # the same layers, the windowed GRU as a plain GRU, for inference on independent windows
+    network = inputs
+    for layer in layers:
+        if isinstance(layer, WindowedGRU):
+            network = layer(network, stateless=True)
+        else:
+            network = layer(network)
+    return Model(inputs=[inputs], outputs=[network], name=name)
+
+
+def _per_timestep(layer, fused):
+    # keras' Dense works on the last axis of (batch, time, dim) inputs, the TimeDistributed
+    # wrapper only adds reshapes around every layer
+    return layer if fused else TimeDistributed(layer)
+
+
+@register_network("rnn_generator")
+@register_network("rnn_generator_fused", fused=True)
 class RNNGeneratorNetwork(Network):
 
-    def __init__(self, recurrent_dim, latent_dim, data_dim, q_data_params_dim):
+    def __init__(self, recurrent_dim, latent_dim, data_dim, q_data_params_dim,
+                 fused=False, gru_implementation=0, unroll=False, window_batch_size=None,
+                 checkpoint_segment_length=None):
+        """__init__
+
+        :param recurrent_dim - number of timesteps
+        :param latent_dim - dimensionality of the concatenated latents at each timestep
+        :param data_dim - dimensionality of the generated data at each timestep
+        :param q_data_params_dim - number of parameters of the data distribution
+        :param fused - apply the dense stack directly to the (batch, time, dim) tensors instead
+            of through TimeDistributed wrappers, which saves the reshapes around every layer
+        :param gru_implementation - implementation mode of keras' GRU: 0 uses fewer, larger
+            matrix products (keras' choice for CPU), 2 combines the gates into single matrix
+            products (meant for GPU), see benchmarks.recurrent_nets for the step times
+        :param unroll - unroll the GRU over the timesteps (faster for short sequences,
+            but the graph grows with recurrent_dim)
+        :param window_batch_size - for truncated BPTT training: recurrent_dim is then the window
+            length and the GRU carries its state across the windows of batches of this size,
+            see WindowedGRU
+        :param checkpoint_segment_length - if set, the GRU and the dense stack are applied in
+            segments of this many timesteps and their activations are recomputed in the
+            backward pass, see CheckpointedSequence (less memory for long sequences, at the
+            cost of a second forward pass). The weights are then saved as a single layer, the
+            checkpoints of both variants are not interchangeable
+        """
+        assert not (window_batch_size and checkpoint_segment_length), \
+            "The windowed GRU can not be checkpointed."
         self.layers = []
 
-        self.layers.append(GRU(64, activation="relu", return_sequences=True))
+        self.layers.append(_recurrent_layer(64, gru_implementation, unroll,
+                                            window_batch_size))
 
-        self.layers.append(TimeDistributed(Dense(units=64, name="g_dense_1")))
-        self.layers.append(TimeDistributed(Activation(activation=K.relu, name="g_dense_activ_1")))
+        self.layers.append(_per_timestep(Dense(units=64, name="g_dense_1"), fused))
+        self.layers.append(_per_timestep(Activation(activation=K.relu, name="g_dense_activ_1"),
+                                         fused))
 
-        self.layers.append(TimeDistributed(Dense(units=64,
-                                                 name="g_dense_2")))
-        self.layers.append(TimeDistributed(Activation(activation=K.relu, name="g_dense_activ_2")))
+        self.layers.append(_per_timestep(Dense(units=64,
+                                               name="g_dense_2"), fused))
+        self.layers.append(_per_timestep(Activation(activation=K.relu, name="g_dense_activ_2"),
+                                         fused))
 
-        self.layers.append(TimeDistributed(Dense(units=128,
-                                                 name="g_dense_3")))
-        self.layers.append(TimeDistributed(Activation(activation=K.relu, name="g_dense_activ_3")))
+        self.layers.append(_per_timestep(Dense(units=128,
+                                               name="g_dense_3"), fused))
+        self.layers.append(_per_timestep(Activation(activation=K.relu, name="g_dense_activ_3"),
+                                         fused))
 
-        self.layers.append(TimeDistributed(Dense(units=data_dim * q_data_params_dim,
-                                                 name="g_dense_3")))
+        self.layers.append(_per_timestep(Dense(units=data_dim * q_data_params_dim,
+                                               name="g_dense_4"), fused))
 
         self.layers.append(Reshape(target_shape=(recurrent_dim, q_data_params_dim, data_dim),
                                    name="g_param_reshape"))
 
         inputs = Input(shape=(recurrent_dim, latent_dim))
         network = inputs
-        for layer in self.layers:
+        for layer in _checkpointed(self.layers[:-1], checkpoint_segment_length) + \
+                self.layers[-1:]:
             network = layer(network)
 
         self.model = Model(inputs=[inputs], outputs=[network], name="G")
+        self.stateless_model = _stateless_model(inputs, self.layers, "G_stateless") \
+            if window_batch_size else self.model
 
     def apply(self, inputs):
         return self.model(inputs)
 
+    def apply_stateless(self, inputs):
+        return self.stateless_model(inputs)
 
+
+@register_network("rnn_shared_net")
+@register_network("rnn_shared_net_fused", fused=True)
 class RNNSharedNet(Network):
     """
     RNNSharedNet
@@ -51,37 +126,67 @@ class RNNSharedNet(Network):
     The convolutional structure is applied to the last output of the RNN.
     """
 
-    def __init__(self, recurrent_dim, data_shape):
+    def __init__(self, recurrent_dim, data_shape, fused=False, gru_implementation=0,
+                 unroll=False, window_batch_size=None, checkpoint_segment_length=None):
+        """__init__
+
+        :param recurrent_dim - number of timesteps
+        :param data_shape - shape of the data at a single timestep
+        :param fused - apply the dense stack directly to the (batch, time, dim) tensors instead
+            of through TimeDistributed wrappers, which saves the reshapes around every layer
+        :param gru_implementation - implementation mode of keras' GRU: 0 uses fewer, larger
+            matrix products (keras' choice for CPU), 2 combines the gates into single matrix
+            products (meant for GPU), see benchmarks.recurrent_nets for the step times
+        :param unroll - unroll the GRU over the timesteps (faster for short sequences,
+            but the graph grows with recurrent_dim)
+        :param window_batch_size - for truncated BPTT training: recurrent_dim is then the window
+            length and the GRU carries its state across the windows of batches of this size,
+            see WindowedGRU
+        :param checkpoint_segment_length - if set, the GRU and the dense stack are applied in
+            segments of this many timesteps and their activations are recomputed in the
+            backward pass, see CheckpointedSequence (less memory for long sequences, at the
+            cost of a second forward pass). The weights are then saved as a single layer, the
+            checkpoints of both variants are not interchangeable
+        """
+        assert not (window_batch_size and checkpoint_segment_length), \
+            "The windowed GRU can not be checkpointed."
         self.layers = []
 
-        self.layers.append(GRU(64, activation="relu", return_sequences=True))
+        self.layers.append(_recurrent_layer(64, gru_implementation, unroll,
+                                            window_batch_size))
 
-        self.layers.append(TimeDistributed(Dense(256)))
-        self.layers.append(TimeDistributed(LeakyReLU(name="d_conv_activ_1")))
+        self.layers.append(_per_timestep(Dense(256), fused))
+        self.layers.append(_per_timestep(LeakyReLU(name="d_conv_activ_1"), fused))
 
-        self.layers.append(TimeDistributed(Dense(128)))
-        self.layers.append(TimeDistributed(LeakyReLU(name="d_conv_activ_2")))
+        self.layers.append(_per_timestep(Dense(128), fused))
+        self.layers.append(_per_timestep(LeakyReLU(name="d_conv_activ_2"), fused))
 
-        self.layers.append(TimeDistributed(Dense(128)))
-        self.layers.append(TimeDistributed(LeakyReLU(name="d_conv_activ_3")))
+        self.layers.append(_per_timestep(Dense(128), fused))
+        self.layers.append(_per_timestep(LeakyReLU(name="d_conv_activ_3"), fused))
 
-        self.layers.append(TimeDistributed(Dense(64)))
-        self.layers.append(TimeDistributed(LeakyReLU(name="d_conv_activ_4")))
+        self.layers.append(_per_timestep(Dense(64), fused))
+        self.layers.append(_per_timestep(LeakyReLU(name="d_conv_activ_4"), fused))
 
-        self.layers.append(TimeDistributed(Dense(32, activation="relu")))
-        self.layers.append(TimeDistributed(LeakyReLU(name="d_dense_1_activ")))
+        self.layers.append(_per_timestep(Dense(32, activation="relu"), fused))
+        self.layers.append(_per_timestep(LeakyReLU(name="d_dense_1_activ"), fused))
 
         inputs = Input(shape=(recurrent_dim,) + data_shape)
         network = inputs
-        for layer in self.layers:
+        for layer in _checkpointed(self.layers, checkpoint_segment_length):
             network = layer(network)
 
         self.model = Model(inputs=[inputs], outputs=[network], name="SHARED")
+        self.stateless_model = _stateless_model(inputs, self.layers, "SHARED_stateless") \
+            if window_batch_size else self.model
 
     def apply(self, inputs):
         return self.model(inputs)
 
+    def apply_stateless(self, inputs):
+        return self.stateless_model(inputs)
+
 
+@register_network("rnn_encoder")
 class RNNEncoderNetwork(Network):
 
     def __init__(self, recurrent_dim, shared_out_shape):
@@ -100,6 +205,7 @@ class RNNEncoderNetwork(Network):
         return self.model(inputs)
 
 
+@register_network("rnn_discriminator")
 class RNNDiscriminatorNetwork(Network):
 
     def __init__(self, recurrent_dim, shared_out_shape):
@@ -0,0 +1,138 @@
+"""
+Temporal convolutional network structures used by the InfoGAN, drop-in replacements for
+the recurrent networks in learn.networks.rnns (same input and output shapes).
+
+Dilated causal convolutions see only the current and past timesteps, like the GRUs,
+but all timesteps are computed in parallel.
+"""
+from keras.layers import Activation, Conv1D, Dense, Reshape, Input
+from keras.layers.advanced_activations import LeakyReLU
+from keras.models import Model
+import keras.backend as K
+
+from learn.networks.interfaces import Network
+from learn.networks.registry import register_network
+
+# receptive field of 1 + (kernel_size - 1) * sum(dilations) = 63 frames with the defaults
+DILATIONS = (1, 2, 4, 8, 16)
+
+
+def _causal_conv(filters, kernel_size, dilation_rate, name):
+    return Conv1D(filters=filters,
+                  kernel_size=kernel_size,
+                  dilation_rate=dilation_rate,
+                  padding="causal",
+                  name=name)
+
+
+@register_network("tcn_generator")
+class TCNGeneratorNetwork(Network):
+
+    def __init__(self, recurrent_dim, latent_dim, data_dim, q_data_params_dim,
+                 filters=64, kernel_size=3, dilations=DILATIONS):
+        """__init__
+
+        :param recurrent_dim - number of timesteps
+        :param latent_dim - dimensionality of the concatenated latents at each timestep
+        :param data_dim - dimensionality of the generated data at each timestep
+        :param q_data_params_dim - number of parameters of the data distribution
+        :param filters - number of filters of the temporal convolutions
+        :param kernel_size - temporal extent of the convolution kernels
+        :param dilations - dilation rate of each temporal convolution
+        """
+        self.layers = []
+
+        for i, dilation_rate in enumerate(dilations):
+            self.layers.append(_causal_conv(filters, kernel_size, dilation_rate,
+                                            name="g_tconv_{}".format(i + 1)))
+            self.layers.append(Activation(activation=K.relu,
+                                          name="g_tconv_activ_{}".format(i + 1)))
+
+        self.layers.append(Dense(units=128, name="g_dense_1"))
+        self.layers.append(Activation(activation=K.relu, name="g_dense_activ_1"))
+
+        self.layers.append(Dense(units=data_dim * q_data_params_dim, name="g_dense_2"))
+
+        self.layers.append(Reshape(target_shape=(recurrent_dim, q_data_params_dim, data_dim),
+                                   name="g_param_reshape"))
+
+        inputs = Input(shape=(recurrent_dim, latent_dim))
+        network = inputs
+        for layer in self.layers:
+            network = layer(network)
+
+        self.model = Model(inputs=[inputs], outputs=[network], name="G")
+
+    def apply(self, inputs):
+        return self.model(inputs)
+
+
+@register_network("tcn_shared_net")
+class TCNSharedNet(Network):
+
+    def __init__(self, recurrent_dim, data_shape,
+                 filters=64, kernel_size=3, dilations=DILATIONS):
+        """__init__
+
+        :param recurrent_dim - number of timesteps
+        :param data_shape - shape of the data at a single timestep
+        :param filters - number of filters of the temporal convolutions
+        :param kernel_size - temporal extent of the convolution kernels
+        :param dilations - dilation rate of each temporal convolution
+        """
+        self.layers = []
+
+        for i, dilation_rate in enumerate(dilations):
+            self.layers.append(_causal_conv(filters, kernel_size, dilation_rate,
+                                            name="d_tconv_{}".format(i + 1)))
+            self.layers.append(LeakyReLU(name="d_tconv_activ_{}".format(i + 1)))
+
+        self.layers.append(Dense(32, name="d_dense_1"))
+        self.layers.append(LeakyReLU(name="d_dense_1_activ"))
+
+        inputs = Input(shape=(recurrent_dim,) + data_shape)
+        network = inputs
+        for layer in self.layers:
+            network = layer(network)
+
+        self.model = Model(inputs=[inputs], outputs=[network], name="SHARED")
+
+    def apply(self, inputs):
+        return self.model(inputs)
+
+
+@register_network("tcn_encoder")
+class TCNEncoderNetwork(Network):
+
+    def __init__(self, recurrent_dim, shared_out_shape, kernel_size=3):
+        self.layers = []
+        self.layers.append(_causal_conv(32, kernel_size, 1, name="e_tconv_1"))
+        self.layers.append(LeakyReLU(name="e_tconv_activ_1"))
+
+        inputs = Input(shape=(recurrent_dim,) + shared_out_shape)
+        network = inputs
+        for layer in self.layers:
+            network = layer(network)
+
+        self.model = Model(inputs=[inputs], outputs=[network], name="E_top")
+
+    def apply(self, inputs):
+        return self.model(inputs)
+
+
+@register_network("tcn_discriminator")
+class TCNDiscriminatorNetwork(Network):
+
+    def __init__(self, recurrent_dim, shared_out_shape, kernel_size=3):
+        self.layers = []
+        self.layers.append(_causal_conv(1, kernel_size, 1, name="d_classif_layer"))
+
+        inputs = Input(shape=(recurrent_dim,) + shared_out_shape)
+        network = inputs
+        for layer in self.layers:
+            network = layer(network)
+
+        self.model = Model(inputs=[inputs], outputs=[network], name="D_top")
+
+    def apply(self, inputs):
+        return self.model(inputs)
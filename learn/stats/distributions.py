@@ -27,6 +27,26 @@ def cholesky(square_mat):
         return L
 
 
+def lower_triangular_solve(lower_mat, rhs):
+    """
+    lower_triangular_solve solves lower_mat @ x = rhs for x with forward substitution, O(d^2)
+    per system instead of the O(d^3) of a general solve
+
+    :param lower_mat - batch of lower triangular matrices, shape (N, d, d)
+    :param rhs - batch of right hand sides, shape (N, d)
+    """
+
+    if K.backend() == 'tensorflow':
+        import tensorflow as tf
+        x = tf.matrix_triangular_solve(lower_mat, K.expand_dims(rhs, -1), lower=True)
+        return x[:, :, 0]
+    else:
+        import theano
+        import theano.tensor.slinalg as alg
+        x, _ = theano.map(fn=alg.solve_lower_triangular, sequences=[lower_mat, rhs])
+        return x
+
+
 class Distribution(object):
     """
     Abstract distribution class
@@ -101,19 +121,116 @@ class IsotropicGaussian2(IsotropicGaussian):
         return sample
 
 
+class MultivariateGaussian(Distribution):
+    """
+    Gaussian with a full covariance matrix, parametrized by its lower triangular Cholesky
+    factor L (cov = L @ L.T), flattened row-major into a vector of dim * dim values.
+    Everything (sampling, log-determinant, whitening) is O(dim^2) per sample.
+    """
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.strictly_lower_mask = np.tril(np.ones((dim, dim), dtype=np.float32), k=-1)
+        self.diag_mask = np.eye(dim, dtype=np.float32)
+
+    def sample(self, param_dict):
+        mean = param_dict['mean']
+        chol = self._cholesky_factor(param_dict)
+
+        flat_mean = K.reshape(mean, (-1, self.dim))
+        eps = K.random_normal(shape=K.shape(flat_mean), mean=0, stddev=1.)
+        sample = flat_mean + K.batch_dot(chol, eps, axes=[2, 1])
+        return K.reshape(sample, K.shape(mean))
+
+    def nll(self, samples, param_dict):
+        mean = param_dict['mean']
+        chol = self._cholesky_factor(param_dict)
+
+        # keep the leading (batch, [time]) axes for the result
+        out_shape = K.shape(mean)[:-1]
+        diff = K.reshape(samples - mean, (-1, self.dim))
+
+        # whitened residuals: L^-1 (x - mean)
+        whitened = lower_triangular_solve(chol, diff)
+        # log|cov| / 2 = sum(log(diag(L)))
+        half_log_det = K.sum(K.log(K.sum(chol * self.diag_mask, axis=-1) + K.epsilon()), axis=-1)
+
+        nll = 0.5 * self.dim * np.log(2 * np.pi) + half_log_det + \
+            0.5 * K.sum(K.square(whitened), axis=-1)
+        return K.reshape(nll, out_shape)
+
+    def _cholesky_factor(self, param_dict):
+        """
+        returns the Cholesky factors as a (N, dim, dim) tensor. A 'cov' entry in param_dict
+        (e.g. a fixed prior covariance) is decomposed with cholesky(), which is O(dim^3),
+        so the 'chol' entry should be preferred.
+        """
+        if 'chol' not in param_dict:
+            cov = K.reshape(param_dict['cov'], (-1, self.dim, self.dim))
+            return cholesky(cov)
+
+        return K.reshape(param_dict['chol'], (-1, self.dim, self.dim))
+
+    def _tril_activation(self, x):
+        # masks out the upper triangle and keeps the diagonal positive, so that the
+        # (flattened) output is always a valid Cholesky factor
+        square = K.reshape(x, (-1, self.dim, self.dim))
+        diag = K.sum(square * self.diag_mask, axis=-1, keepdims=True)
+        chol = square * self.strictly_lower_mask + softplus(diag) * self.diag_mask
+        return K.reshape(chol, K.shape(x))
+
+    def sample_size(self):
+        return self.dim
+
+    def param_info(self):
+        return {
+            'mean': (self.dim, linear),
+            'chol': (self.dim * self.dim, self._tril_activation)
+        }
+
+
 class Categorical(Distribution):
 
-    def __init__(self, n_classes):
+    SAMPLING_MODES = ("multinomial", "gumbel_max", "gumbel_softmax")
+
+    def __init__(self, n_classes, sampling="multinomial", temperature=1.0, straight_through=True,
+                 from_logits=False):
+        """__init__
+
+        :param n_classes - number of categories
+        :param sampling - one of "multinomial", "gumbel_max" or "gumbel_softmax".
+            "gumbel_max" draws exact one-hot samples with fused elementwise ops (no gradients),
+            "gumbel_softmax" draws relaxed samples that are differentiable w.r.t. the p_vals
+        :param temperature - temperature of the "gumbel_softmax" relaxation
+        :param straight_through - if set, "gumbel_softmax" outputs one-hot samples in the forward
+            pass, while the gradients flow through the relaxed samples
+        :param from_logits - if set, 'p_vals' holds unnormalized log-probabilities (the encoder
+            outputs no softmax) and the nll is computed with a fused log-softmax
+        """
+        assert sampling in self.SAMPLING_MODES, \
+            "Unknown sampling mode {}, use one of {}".format(sampling, self.SAMPLING_MODES)
+
         self.n_classes = n_classes
+        self.sampling = sampling
+        self.temperature = temperature
+        self.straight_through = straight_through
+        self.from_logits = from_logits
 
     def sample(self, param_dict):
         p_vals = param_dict['p_vals']
+        logits = p_vals if self.from_logits else K.log(p_vals + K.epsilon())
+        if self.sampling == "multinomial":
+            return self._sample_multinomial(logits)
+
+        return self._sample_gumbel(logits)
+
+    def _sample_multinomial(self, logits):
         if K.backend() == 'tensorflow':
             import tensorflow as tf
 
-            shape = K.shape(p_vals)
-            reshaped_params = K.reshape(p_vals, (-1, self.n_classes))
-            samples = tf.multinomial(logits=tf.log(reshaped_params), num_samples=1)[:, 0]
+            shape = K.shape(logits)
+            reshaped_logits = K.reshape(logits, (-1, self.n_classes))
+            samples = tf.multinomial(logits=reshaped_logits, num_samples=1)[:, 0]
             # a hack to turn it into one-hot
             onehot = tf.constant(np.eye(self.n_classes, dtype=np.float32))
             result = tf.nn.embedding_lookup(onehot, samples)
@@ -122,15 +239,33 @@ class Categorical(Distribution):
         else:
             from theano.tensor.shared_randomstreams import RandomStreams
             random = RandomStreams()
-            return random.multinomial(size=K.shape(p_vals)[:-1], n=1, pvals=p_vals,
+            return random.multinomial(size=K.shape(logits)[:-1], n=1, pvals=_softmax(logits),
                                       dtype='float32')
 
+    def _sample_gumbel(self, logits):
+        # Gumbel(0, 1) noise, the lower bound keeps both logarithms finite
+        uniform = K.random_uniform(shape=K.shape(logits), minval=K.epsilon(), maxval=1.0)
+        perturbed = logits - K.log(-K.log(uniform))
+
+        if self.sampling == "gumbel_max":
+            return _one_hot_max(perturbed)
+
+        relaxed = _softmax(perturbed / self.temperature)
+
+        if not self.straight_through:
+            return relaxed
+
+        # one-hot values in the forward pass, gradients of the relaxed samples in the backward pass
+        return relaxed + K.stop_gradient(_one_hot_max(relaxed) - relaxed)
+
     def nll(self, samples, param_dict):
         """log_pdf
 
         :param param_dict - { 'p_vals': ...}
         """
         p_vals = param_dict['p_vals']
+        if self.from_logits:
+            return -K.sum(samples * _log_softmax(p_vals), axis=-1)
 
         return -K.sum(samples * K.log(p_vals + K.epsilon()), axis=-1)
 
@@ -139,14 +274,43 @@ class Categorical(Distribution):
 
     def param_info(self):
         return {
-            'p_vals': (self.n_classes, softmax)
+            'p_vals': (self.n_classes, linear if self.from_logits else softmax)
         }
 
 
+def _one_hot_max(x):
+    """
+    turns the maximum along the last axis into a one-hot vector, without an argmax + gather
+    """
+    return K.cast(K.equal(x, K.max(x, axis=-1, keepdims=True)), K.floatx())
+
+
+def _log_softmax(x):
+    """
+    log-softmax over the last axis, written out so it works for recurrent (3D) tensors as well
+    """
+    shifted = x - K.max(x, axis=-1, keepdims=True)
+    return shifted - K.log(K.sum(K.exp(shifted), axis=-1, keepdims=True))
+
+
+def _softmax(x):
+    return K.exp(_log_softmax(x))
+
+
 class Bernoulli(Distribution):
 
+    def __init__(self, from_logits=False):
+        """__init__
+
+        :param from_logits - if set, 'p' holds logits (the generator outputs no sigmoid)
+            and the nll is computed with a fused softplus
+        """
+        self.from_logits = from_logits
+
     def sample(self, param_dict):
         p = param_dict['p']
+        if self.from_logits:
+            p = K.sigmoid(p)
         # return K.random_binomial(shape=K.shape(p), p=p)
 
         # TODO: for now, just return the mean
@@ -159,6 +323,10 @@ class Bernoulli(Distribution):
         :param param_dict - { 'p_vals': ...}
         """
         p_vals = param_dict['p']
+        if self.from_logits:
+            # -log(sigmoid(l)) * x - log(1 - sigmoid(l)) * (1 - x) = softplus(l) - x * l
+            return K.mean(K.sum(K.softplus(p_vals) - samples * p_vals, axis=1))
+
         return K.mean(-K.sum(
             samples * K.log(p_vals + K.epsilon()) + (1 - samples) * K.log(1 - p_vals + K.epsilon()),
             axis=1))
@@ -168,5 +336,5 @@ class Bernoulli(Distribution):
 
     def param_info(self):
         return {
-            'p': (1, sigmoid)
+            'p': (1, linear if self.from_logits else sigmoid)
         }
@@ -1,4 +1,6 @@
+# the observers import tensorflow and keras only when they are used
 from .infogan_checkpointer import InfoganCheckpointer
 from .infogan_tensorboard import InfoganTensorBoard
 from .tensorboard import TensorBoardLossObserver
 from .logger import Logger
+from .clustering_metrics import ClusteringMetricsObserver
@@ -0,0 +1,128 @@
+import os
+import time
+
+import numpy as np
+
+from learn.evaluation.metrics import clustering_metrics
+from learn.train.observers.interfaces import TrainingObserver
+
+
+class ClusteringMetricsObserver(TrainingObserver):
+    """
+    ClusteringMetricsObserver measures how well a categorical latent clusters the classes of
+    a fixed validation subset. The metrics are added to iteration_results['metrics'], so the
+    observers after it in the list (e.g. Logger, TensorBoardLossObserver) report them.
+
+    Metrics, prefixed with the name of the categorical dist:
+        accuracy - classification accuracy with the optimal latent to class mapping
+        nmi, ari - normalized mutual information and adjusted rand index with the classes
+        mutual_info - estimate of I(c; x) from the encoder posteriors, in nats
+        eval_overhead - share of the wall time since the start of training spent evaluating
+    """
+
+    def __init__(self, model, frequency, val_x, val_y, dist_name="c1", n_samples=1000,
+                 chunk_size=None, checkpoint_dir=None, patience=None):
+        """__init__
+
+        :param model - InfoGAN2 model being trained
+        :param frequency - evaluate every frequency iterations
+        :param val_x - validation samples
+        :param val_y - validation labels, integer or one-hot
+        :param dist_name - name of the categorical meaningful dist
+        :param n_samples - size of the fixed validation subset
+        :param chunk_size - number of samples encoded at once, defaults to the batch size
+        :param checkpoint_dir - if set, the weights are saved there whenever the accuracy
+            improves
+        :param patience - if set, training is stopped after this many evaluations
+            without improvement of the accuracy
+        """
+        val_y = np.asarray(val_y)
+        if val_y.ndim > 1:
+            val_y = np.argmax(val_y, axis=1)
+        super(ClusteringMetricsObserver, self).__init__(model, frequency,
+                                                        val_x[:n_samples], val_y[:n_samples])
+
+        self.dist_name = dist_name
+        self.dist = model.encoder.meaningful_dists[dist_name]
+        self.dist_index = list(model.encoder.meaningful_dists.keys()).index(dist_name)
+        self.n_classes = int(self.val_y.max()) + 1
+        self.chunk_size = chunk_size
+        self.checkpoint_dir = checkpoint_dir
+        self.patience = patience
+
+        self.best_accuracy = -1.
+        self.best_iteration = None
+        self.evaluations_since_best = 0
+
+        # training starts right after the observers are set up
+        self.start_time = time.time()
+        self.eval_time = 0.
+
+    def _posteriors(self, params):
+        if self.dist.from_logits:
+            params = params - np.max(params, axis=1, keepdims=True)
+            params = np.exp(params)
+        return params / np.sum(params, axis=1, keepdims=True)
+
+    def _evaluate(self):
+        n_categories = self.dist.n_classes
+        predicted = []
+        posterior_sum = np.zeros(n_categories)
+        entropy_sum = 0.
+
+        # the subset is streamed through the cached encoding function chunk by chunk
+        for dist_chunks in self.model.iterate_encodings(self.val_x, self.chunk_size):
+            posteriors = self._posteriors(dist_chunks[self.dist_index])
+            predicted.append(np.argmax(posteriors, axis=1))
+            posterior_sum += np.sum(posteriors, axis=0)
+            entropy_sum -= np.sum(posteriors * np.log(np.maximum(posteriors, 1e-12)))
+
+        metrics = clustering_metrics(self.val_y, np.concatenate(predicted),
+                                     n_true=self.n_classes, n_pred=n_categories)
+
+        # I(c; x) = H(E_x[p(c|x)]) - E_x[H(p(c|x))]
+        marginal = posterior_sum / len(self.val_x)
+        marginal_entropy = -np.sum(marginal * np.log(np.maximum(marginal, 1e-12)))
+        mutual_info = marginal_entropy - entropy_sum / len(self.val_x)
+
+        return {'accuracy': metrics['accuracy'],
+                'nmi': metrics['nmi'],
+                'ari': metrics['ari'],
+                'mutual_info': float(mutual_info)}
+
+    def _update(self, iteration, iteration_results):
+        start = time.time()
+        metrics = self._evaluate()
+
+        if metrics['accuracy'] > self.best_accuracy:
+            self.best_accuracy = metrics['accuracy']
+            self.best_iteration = iteration
+            self.evaluations_since_best = 0
+            if self.checkpoint_dir:
+                self._save_best()
+        else:
+            self.evaluations_since_best += 1
+            if self.patience is not None and self.evaluations_since_best >= self.patience:
+                self.stop_training = True
+
+        self.eval_time += time.time() - start
+        elapsed = time.time() - self.start_time
+        metrics['eval_overhead'] = self.eval_time / elapsed if elapsed > 0 else 0.
+
+        logs = iteration_results.setdefault('metrics', {})
+        for name, value in metrics.items():
+            logs["{}_{}".format(self.dist_name, name)] = value
+
+    def _save_best(self):
+        self.model.disc_train_model.save_weights(
+            os.path.join(self.checkpoint_dir, "best_disc_train_model.hdf5"),
+            overwrite=True)
+        self.model.gen_train_model.save_weights(
+            os.path.join(self.checkpoint_dir, "best_gen_train_model.hdf5"),
+            overwrite=True)
+
+    def finish(self):
+        if self.best_iteration is not None:
+            print("Best {} accuracy {} at iteration {}".format(self.dist_name,
+                                                               self.best_accuracy,
+                                                               self.best_iteration))
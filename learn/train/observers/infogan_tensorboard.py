@@ -1,19 +1,24 @@
 import numpy as np
-import tensorflow as tf
-import keras.backend as K
-from keras.utils.np_utils import to_categorical
 
-from learn.utils.visualization import image_grid
+from learn.utils.image_writer import ImageWriter
+from learn.utils.visualization import numpy_image_grid
 from learn.train.observers.interfaces import TrainingObserver
 
 
 class InfoganTensorBoard(TrainingObserver):
+    """
+    InfoganTensorBoard writes image grids of the generated and real samples, grouped by
+    the c1 values, to TensorBoard. All images are fetched in two session runs, the grids are
+    built with numpy and encoded and written in a background thread.
+    """
 
     def __init__(self, model, tb_writer, frequency, val_x=None, val_y=None):
+        import keras.backend as K
         super(InfoganTensorBoard, self).__init__(model, frequency, val_x, val_y)
 
         self.tb_writer = tb_writer
         self.sess = K.get_session()
+        self.image_writer = ImageWriter()
 
         prior_params = self.model.prior.assemble_prior_params()
 
@@ -25,130 +30,66 @@ class InfoganTensorBoard(TrainingObserver):
                                       self.model.prior_param_inputs + [K.learning_phase()],
                                       self.vis_data + [0]))
 
-        # add a generated images summary
-        self.gen_image_summaries = list()
-        self.real_enc_image_summaries = list()
-        self.gen_enc_image_summaries = list()
-        self.gen_cont_summaries_feeds = list()
-        self.gen_cont_summaries = list()
-
-        # initialize all tensorboard summaries
-        self._init_gen_summaries()
-        self._init_real_enc_summaries()
-        self._init_gen_enc_summaries()
-        self._init_gen_cont_summaries()
-
-    def _init_gen_summaries(self):
-        for dist_name, sampled_latent in self.model.sampled_latents.items():
-            if "c1" in dist_name:
-                sampled_class = K.argmax(sampled_latent, axis=1)
-                for i in range(10):
-                    which = tf.where(tf.equal(sampled_class, i))
-                    # select only the images that were produced from c1 = i
-                    selected = tf.gather(self.model.generated, which)
-                    selected = tf.reshape(selected, (-1, 28, 28, 1))
-                    grid = image_grid(input_tensor=selected,
-                                      grid_shape=(5, 5),
-                                      image_shape=(28, 28, 1))
-                    summary = tf.summary.image("generated_from_c1={}".format(i),
-                                               grid,
-                                               max_outputs=1)
-                    self.gen_image_summaries.append(summary)
-
-    def _init_real_enc_summaries(self):
-        # add Encoder results summaries
-        for dist_name, stats in self.model.real_encodings.items():
-            if "c1" == dist_name:
-                for i in range(10):
-                    output_class = K.argmax(stats["p_vals"], axis=1)
-                    which = tf.where(tf.equal(output_class, i))
-
-                    # select only the images that were encoded as c1 = i
-                    selected = tf.gather(self.model.real_input, which)
-                    selected = tf.reshape(selected, (-1, 28, 28, 1))
-
-                    grid = image_grid(input_tensor=selected,
-                                      grid_shape=(5, 5),
-                                      image_shape=(28, 28, 1))
-
-                    summary = tf.summary.image("real_encoded_as_c1={}".format(i),
-                                               grid,
-                                               max_outputs=1)
-                    self.real_enc_image_summaries.append(summary)
-
-    def _init_gen_enc_summaries(self):
-        for dist_name, stats in self.model.gen_encodings.items():
-            if "c1" == dist_name:
-                for i in range(10):
-                    output_class = K.argmax(stats["p_vals"], axis=1)
-                    which = tf.where(tf.equal(output_class, i))
-
-                    # select only the images that were encoded as c1 = i
-                    selected = tf.gather(self.model.generated, which)
-                    selected = tf.reshape(selected, (-1, 28, 28, 1))
-
-                    grid = image_grid(input_tensor=selected,
-                                      grid_shape=(5, 5),
-                                      image_shape=(28, 28, 1))
-
-                    summary = tf.summary.image("gen_encoded_as_c1={}".format(i),
-                                               grid,
-                                               max_outputs=1)
-                    self.gen_enc_image_summaries.append(summary)
-
-    def _init_gen_cont_summaries(self):
-        # summaries for the continuous variables, covering the range from -1 to 1
+        # everything the c1 grouped grids need, fetched at once
+        self.vis_fetches = [self.model.generated,
+                            self.model.real_input,
+                            self.model.sampled_latents["c1"],
+                            self.model.gen_encodings["c1"]["p_vals"],
+                            self.model.real_encodings["c1"]["p_vals"]]
+
+        self.cont_feed_dict = self._init_gen_cont_feed()
+
+    def _init_gen_cont_feed(self):
+        import keras.backend as K
+
+        # the continuous variables covering the range from -1 to 1, a 10 x 10 block
+        # for each of the c1 values, generated in a single run
+        c1 = np.repeat(np.arange(10), 100)
+        c2 = np.repeat(np.linspace(-1, 1, num=10).reshape((1, 10)), repeats=10, axis=0)
+        c3 = np.repeat(np.linspace(-1, 1, num=10).reshape((10, 1)), repeats=10, axis=1)
+        feed_values = {
+            "c1": np.eye(10, dtype=np.float32)[c1],
+            "c2": np.tile(c2.reshape((100, 1)), (10, 1)),
+            "c3": np.tile(c3.reshape((100, 1)), (10, 1)),
+            "z": np.zeros((1000, 62)),
+        }
+        feed_dict = {K.learning_phase(): 0}
+
+        for dist_name, sample_tensor in self.model.sampled_latents.items():
+            feed_dict[sample_tensor] = feed_values[dist_name]
+
+        return feed_dict
+
+    def _write_grouped(self, tag, images, classes, iteration):
+        images = images.reshape((-1, 28, 28, 1))
         for i in range(10):
-            selected = tf.reshape(self.model.generated, (-1, 28, 28, 1))
-            grid = image_grid(input_tensor=selected,
-                              grid_shape=(10, 10),
-                              image_shape=(28, 28, 1))
-            summary = tf.summary.image("gen_span_over_c2_c2_c1={}".format(i),
-                                       grid,
-                                       max_outputs=1)
-            self.gen_cont_summaries.append(summary)
-
-            feed_values = {
-                "c1": to_categorical(np.array([i] * 100), num_classes=10),
-                "c2": np.repeat(np.linspace(-1, 1, num=10).reshape((1, 10)), repeats=10, axis=0).reshape((100, 1)),
-                "c3": np.repeat(np.linspace(-1, 1, num=10).reshape((10, 1)), repeats=10, axis=1).reshape((100, 1)),
-                "z": np.zeros((100, 62)),
-            }
-            feed_dict = {K.learning_phase(): 0}
-
-            for dist_name, sample_tensor in self.model.sampled_latents.items():
-                feed_dict[sample_tensor] = feed_values[dist_name]
-
-            self.gen_cont_summaries_feeds.append(feed_dict)
+            grid = numpy_image_grid(images[classes == i], grid_shape=(5, 5))
+            self.image_writer.write_summary(self.tb_writer, "{}={}".format(tag, i),
+                                            grid, iteration)
 
     def _update(self, iteration, iteration_results):
         # visualize images, generated and real, grouped by the c1 values
+        generated, real, sampled_c1, gen_c1, real_c1 = self.sess.run(
+            self.vis_fetches, feed_dict=self.vis_feed_dict)
+
+        self._write_grouped("generated_from_c1", generated,
+                            np.argmax(sampled_c1, axis=1), iteration)
+        self._write_grouped("gen_encoded_as_c1", generated,
+                            np.argmax(gen_c1, axis=1), iteration)
+        self._write_grouped("real_encoded_as_c1", real,
+                            np.argmax(real_c1, axis=1), iteration)
+
+        span = self.sess.run(self.model.generated, feed_dict=self.cont_feed_dict)
+        span = span.reshape((10, 100, 28, 28, 1))
+        for i in range(10):
+            grid = numpy_image_grid(span[i], grid_shape=(10, 10))
+            self.image_writer.write_summary(self.tb_writer,
+                                            "gen_span_over_c2_c2_c1={}".format(i),
+                                            grid, iteration)
 
-        for summary in self.gen_image_summaries:
-            result = self.sess.run([summary],
-                                   feed_dict=self.vis_feed_dict)
-            summary_str = result[0]
-            self.tb_writer.add_summary(summary_str, iteration)
-
-        for summary in self.gen_enc_image_summaries:
-            result = self.sess.run([summary],
-                                   feed_dict=self.vis_feed_dict)
-            summary_str = result[0]
-            self.tb_writer.add_summary(summary_str, iteration)
-
-        for summary in self.real_enc_image_summaries:
-            result = self.sess.run([summary],
-                                   feed_dict=self.vis_feed_dict)
-            summary_str = result[0]
-            self.tb_writer.add_summary(summary_str, iteration)
-
-        for summary, feed_dict in zip(self.gen_cont_summaries, self.gen_cont_summaries_feeds):
-            result = self.sess.run([summary],
-                                   feed_dict=feed_dict)
-            summary_str = result[0]
-            self.tb_writer.add_summary(summary_str, iteration)
-
-        self.tb_writer.flush()
+        # the summaries are written in the background, flush them once they are done
+        self.image_writer.call(self.tb_writer.flush)
 
     def finish(self):
-        pass
+        self.image_writer.close()
+        self.tb_writer.flush()
@@ -5,6 +5,9 @@ class TrainingObserver:
 
     __metaclass__ = abc.ABCMeta
 
+    # observers set this to end the training early, e.g. when a metric stops improving
+    stop_training = False
+
     def __init__(self, model, frequency, val_x=None, val_y=None):
         """__init__
 
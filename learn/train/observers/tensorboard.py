@@ -1,5 +1,3 @@
-import tensorflow as tf
-
 from learn.train.observers.interfaces import TrainingObserver
 
 
@@ -10,11 +8,15 @@ class TensorBoardLossObserver(TrainingObserver):
         super(TensorBoardLossObserver, self).__init__(model, frequency, None, None)
 
     def _update(self, iteration, iteration_results):
+        import tensorflow as tf
+
         loss_logs = iteration_results['losses']
-        for name, value in loss_logs.items():
+        # metrics of observers earlier in the list, e.g. ClusteringMetricsObserver
+        metric_logs = iteration_results.get('metrics', {})
+        for name, value in list(loss_logs.items()) + list(metric_logs.items()):
             summary = tf.Summary()
             summary_value = summary.value.add()
-            summary_value.simple_value = value.item()
+            summary_value.simple_value = float(value)
             summary_value.tag = name
             self.tb_writer.add_summary(summary, iteration)
 
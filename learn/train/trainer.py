@@ -25,5 +25,14 @@ class ModelTrainer:
                 for observer in self.observers:
                     observer.update(self.counter, artifacts)
 
+                if self._stop_requested():
+                    break
+
+            if self._stop_requested():
+                break
+
         for observer in self.observers:
             observer.finish()
+
+    def _stop_requested(self):
+        return any(observer.stop_training for observer in self.observers)
@@ -0,0 +1,95 @@
+"""
+Writes images (e.g. numpy image grids) as PNG files or TensorBoard image summaries from a
+background thread, so that the PNG encoding does not block the training loop.
+"""
+import threading
+import traceback
+from six.moves.queue import Queue
+
+from learn.utils.visualization import encode_png
+
+
+class ImageWriter(object):
+    """
+    ImageWriter encodes and writes images in a background thread.
+
+    Usage:
+        >>> writer = ImageWriter()
+        >>> writer.write_file("grid.png", numpy_image_grid(images, (5, 5)))
+        >>> writer.write_summary(tb_writer, "generated", grid, iteration)
+        >>> writer.close()
+    """
+
+    def __init__(self, max_pending=64):
+        """__init__
+
+        :param max_pending - maximal number of images waiting to be written, the producer
+            blocks if the writer falls behind, which bounds the memory use
+        """
+        self.queue = Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self._work, name="ImageWriter")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def write_file(self, file_path, image):
+        """
+        write_file stores image, values in [0, 1], as a PNG file
+        """
+        self.queue.put((self._write_file, (file_path, image)))
+
+    def write_summary(self, tb_writer, tag, image, iteration):
+        """
+        write_summary adds image, values in [0, 1], as an image summary to tb_writer
+        (a tf.summary.FileWriter)
+        """
+        self.queue.put((self._write_summary, (tb_writer, tag, image, iteration)))
+
+    def call(self, function, *args):
+        """
+        call runs function(*args) in the writer thread, after the images submitted so far
+        are written (e.g. to flush a tf.summary.FileWriter)
+        """
+        self.queue.put((function, args))
+
+    def flush(self):
+        """
+        flush blocks until all submitted images are written
+        """
+        self.queue.join()
+
+    def close(self):
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+
+    def _work(self):
+        while True:
+            task = self.queue.get()
+            if task is None:
+                self.queue.task_done()
+                return
+
+            function, args = task
+            try:
+                function(*args)
+            except Exception:
+                # a failed image must not stop the writer, the producer would block forever
+                traceback.print_exc()
+            finally:
+                self.queue.task_done()
+
+    @staticmethod
+    def _write_file(file_path, image):
+        with open(file_path, "wb") as f:
+            f.write(encode_png(image))
+
+    @staticmethod
+    def _write_summary(tb_writer, tag, image, iteration):
+        import tensorflow as tf
+
+        summary_image = tf.Summary.Image(height=image.shape[0],
+                                         width=image.shape[1],
+                                         colorspace=image.shape[2],
+                                         encoded_image_string=encode_png(image))
+        summary = tf.Summary(value=[tf.Summary.Value(tag=tag, image=summary_image)])
+        tb_writer.add_summary(summary, iteration)
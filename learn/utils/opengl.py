@@ -2,7 +2,8 @@ from OpenGL.GL import *
 from OpenGL.GLU import *
 from OpenGL.GLUT import *
 from OpenGL.GL.framebufferobjects import *
-from PIL import Image
+from OpenGL.raw.GL.VERSION.GL_1_0 import glReadPixels as raw_glReadPixels
+import ctypes
 import numpy as np
 
 
@@ -50,11 +51,11 @@ def setup_buffer(width, height):
 
 
 def get_current_pixels(width, height):
+    glPixelStorei(GL_PACK_ALIGNMENT, 1)
     buf = glReadPixels(0, 0, width, height, GL_RGB, GL_UNSIGNED_BYTE)
-    image = Image.frombytes(mode="RGB", size=(width, height),
-                            data=buf)
-    image = image.transpose(Image.FLIP_TOP_BOTTOM)
-    return np.array(image)
+    image = np.frombuffer(buf, dtype=np.uint8).reshape((height, width, 3))
+    # OpenGL rows start at the bottom
+    return np.ascontiguousarray(image[::-1])
 
 
 def render_offscreen(verticies, edges, width, height, field_of_view=90,
@@ -77,3 +78,119 @@ def render_offscreen(verticies, edges, width, height, field_of_view=90,
 
     arr = get_current_pixels(width, height)
     return arr
+
+
+class SkeletonRenderer(object):
+    """
+    SkeletonRenderer renders whole skeleton sequences into the buffer made by setup_buffer().
+    The joints of a sequence are uploaded once as a vertex buffer, each frame is a single
+    indexed draw call over the edges, and the pixels are read back asynchronously through
+    a ring of pixel buffer objects, while the next frame is drawn.
+
+    Usage:
+        >>> setup_buffer(width, height)
+        >>> renderer = SkeletonRenderer(edges, width, height)
+        >>> for image in renderer.render_sequence(frames):
+        ...     pass
+    """
+
+    def __init__(self, edges, width, height, field_of_view=90,
+                 near_clip_dist=0.1, far_clip_dist=100.0,
+                 trans_x=0.0,
+                 trans_y=-0.5,
+                 trans_z=-5.5,
+                 n_pixel_buffers=2):
+        """__init__
+
+        :param edges - iterable of (joint index, joint index) pairs, the bones
+        :param width, height - size of the rendered images
+        :param n_pixel_buffers - number of pixel buffer objects, the frames read back
+            are n_pixel_buffers - 1 frames behind the drawn one
+        """
+        self.width = width
+        self.height = height
+        self.indices = np.asarray(list(edges), dtype=np.uint32).ravel()
+        self.frame_bytes = width * height * 3
+
+        # the projection is the same for all frames, set it once
+        glMatrixMode(GL_PROJECTION)
+        glLoadIdentity()
+        gluPerspective(field_of_view, (width / height), near_clip_dist, far_clip_dist)
+        glMatrixMode(GL_MODELVIEW)
+        glLoadIdentity()
+        glTranslatef(trans_x, trans_y, trans_z)
+
+        self.index_buffer = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices, GL_STATIC_DRAW)
+
+        self.vertex_buffer = glGenBuffers(1)
+
+        self.pixel_buffers = [glGenBuffers(1) for _ in range(n_pixel_buffers)]
+        for pixel_buffer in self.pixel_buffers:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, pixel_buffer)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.frame_bytes, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glEnableClientState(GL_VERTEX_ARRAY)
+
+    def _upload(self, frames):
+        frames = np.ascontiguousarray(frames, dtype=np.float32)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glBufferData(GL_ARRAY_BUFFER, frames.nbytes, frames, GL_STATIC_DRAW)
+        return frames.shape[1]
+
+    def _draw(self, frame_index, n_joints):
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        # point the vertex array at the joints of this frame within the sequence buffer
+        offset = frame_index * n_joints * 3 * 4
+        glVertexPointer(3, GL_FLOAT, 0, ctypes.c_void_p(offset))
+        glDrawElements(GL_LINES, len(self.indices), GL_UNSIGNED_INT, None)
+
+    def _start_read(self, pixel_buffer):
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, pixel_buffer)
+        # with a bound pack buffer the pixels are copied into it, without waiting on the cpu
+        raw_glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE,
+                         ctypes.c_void_p(0))
+
+    def _finish_read(self, pixel_buffer, out):
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, pixel_buffer)
+        pointer = glMapBuffer(GL_PIXEL_PACK_BUFFER, GL_READ_ONLY)
+        pixels = np.ctypeslib.as_array(ctypes.cast(pointer, ctypes.POINTER(ctypes.c_ubyte)),
+                                       shape=(self.height, self.width, 3))
+        # OpenGL rows start at the bottom
+        out[...] = pixels[::-1]
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+    def render_sequence(self, frames, out=None):
+        """
+        render_sequence renders all frames of a sequence
+
+        :param frames - array of shape (n_frames, n_joints, 3)
+        :param out - optional uint8 array of shape (n_frames, height, width, 3) the images are
+            written to, allocated if not given
+        :return: the images, array of shape (n_frames, height, width, 3)
+        """
+        n_frames = len(frames)
+        if out is None:
+            out = np.empty((n_frames, self.height, self.width, 3), dtype=np.uint8)
+
+        n_joints = self._upload(frames)
+        n_buffers = len(self.pixel_buffers)
+
+        for i in range(n_frames):
+            self._draw(i, n_joints)
+            self._start_read(self.pixel_buffers[i % n_buffers])
+
+            # collect the oldest pending frame, its transfer had a whole frame to finish
+            pending = i - (n_buffers - 1)
+            if pending >= 0:
+                self._finish_read(self.pixel_buffers[pending % n_buffers], out[pending])
+
+        for pending in range(max(0, n_frames - (n_buffers - 1)), n_frames):
+            self._finish_read(self.pixel_buffers[pending % n_buffers], out[pending])
+
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        return out
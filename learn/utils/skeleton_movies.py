@@ -1,47 +1,170 @@
 """
 http://zulko.github.io/blog/2014/11/29/data-animations-with-python-and-moviepy/
 """
+import logging
 import os
-import numpy as np
+import sys
 
-from moviepy.editor import VideoClip
+import numpy as np
 
-from learn.data_management.skeleton_unsupervised import UnsupervisedSkeletonProvider
-from learn.utils.opengl import setup_buffer, render_offscreen
 
 CONNECT = np.array([2, 1, 21, 3, 21, 5, 6, 7, 21, 9, 10, 11, 1, 13, 14,
                     15, 1, 17, 18, 19, 2, 8, 8, 12, 12], dtype="int32") - 1
 
 WIDTH = 300
 HEIGHT = 400
+# frame rate the skeleton sequences were recorded at
+DEFAULT_FPS = 30.0
+
+
+# "opengl" needs GLUT and a display, "numpy" runs anywhere, "auto" falls back to "numpy"
+# when PyOpenGL is missing or no OpenGL context can be created
+BACKENDS = ("auto", "opengl", "numpy")
 
+logger = logging.getLogger(__name__)
+
+
+def _opengl_renderer(edges):
+    # raises ImportError without PyOpenGL and OpenGL.error.Error when GLUT / the context
+    # can not be initialized
+    from learn.utils.opengl import setup_buffer, SkeletonRenderer
 
-def make_skeleton_movies(frame_sequences, movies_dir=".", fps=30):
     setup_buffer(WIDTH, HEIGHT)
+    return SkeletonRenderer(edges, WIDTH, HEIGHT)
+
+
+def make_renderer(backend="auto"):
+    assert backend in BACKENDS, "unknown backend {}, use one of {}".format(backend, BACKENDS)
+    edges = list(zip(range(len(CONNECT)), CONNECT))
+
+    if backend == "opengl":
+        return _opengl_renderer(edges)
+
+    if backend == "auto":
+        # freeglut exits the process when it can not open a display, instead of raising
+        if sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+            logger.info("no DISPLAY, rendering skeletons with the numpy backend")
+        else:
+            try:
+                from OpenGL.error import Error as GLError
+            except ImportError:
+                logger.info("PyOpenGL is not installed, rendering skeletons with the numpy backend")
+            else:
+                try:
+                    renderer = _opengl_renderer(edges)
+                    logger.info("rendering skeletons with the opengl backend")
+                    return renderer
+                except GLError as error:
+                    logger.info("OpenGL initialization failed (%s), rendering skeletons "
+                                "with the numpy backend", error)
+
+    from learn.utils.software_render import SoftwareSkeletonRenderer
+    return SoftwareSkeletonRenderer(edges, WIDTH, HEIGHT)
+
+
+def make_skeleton_movies(frame_sequences, movies_dir=".", fps=30, backend="auto",
+                         chunk_size=64):
+    renderer = make_renderer(backend)
 
     for i, frames in enumerate(frame_sequences):
-        make_skeleton_animation(frames, i, fps, movies_dir)
+        make_skeleton_animation(frames, i, fps, movies_dir, chunk_size, renderer=renderer)
+
 
+def _frame_indices(n_frames, fps):
+    # the sequences are recorded at DEFAULT_FPS, other frame rates resample them
+    if fps == DEFAULT_FPS:
+        return np.arange(n_frames)
+    n_video_frames = int(np.ceil(n_frames / DEFAULT_FPS * fps))
+    return np.minimum((np.arange(n_video_frames) * DEFAULT_FPS / fps).astype(np.int64),
+                      n_frames - 1)
 
-def make_skeleton_animation(frames, index, fps, movies_dir):
-    DEFAULT_FPS = 30.0
 
-    def make_frame(t):
-        verticies = frames[int(t * DEFAULT_FPS)]
-        edges = zip(range(len(CONNECT)), CONNECT)
-        arr = render_offscreen(verticies, edges, WIDTH, HEIGHT)
+def make_skeleton_animation(frames, index, fps, movies_dir, chunk_size=64, renderer=None):
+    """
+    make_skeleton_animation renders a sequence chunk by chunk and pipes the raw frames
+    straight into ffmpeg, so only chunk_size images are held in memory
 
-        return arr
+    :param renderer - renderer of the frames, see make_renderer(), defaults to the "auto"
+        backend. Pass one when making several movies, it is reused
+    :return: path of the written movie
+    """
+    from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+    renderer = renderer or make_renderer("auto")
 
-    duration = frames.shape[0] / DEFAULT_FPS
-    animation = VideoClip(make_frame, duration=duration)
     file_path = os.path.join(movies_dir, "sequence_{}.mp4".format(index))
-    animation.write_videofile(file_path, fps=fps)
+    frame_indices = _frame_indices(len(frames), fps)
+    images = np.empty((chunk_size, HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+    writer = FFMPEG_VideoWriter(file_path, size=(WIDTH, HEIGHT), fps=fps)
+    try:
+        for start in range(0, len(frame_indices), chunk_size):
+            chunk = frame_indices[start:start + chunk_size]
+            renderer.render_sequence(frames[chunk], out=images[:len(chunk)])
+            for image in images[:len(chunk)]:
+                writer.write_frame(image)
+    finally:
+        writer.close()
+
+    return file_path
+
+
+# the renderers of a worker process of export_skeleton_movies, created once per process
+# and backend
+_worker_renderers = {}
+
+
+def _export_worker(frames, index, fps, movies_dir, chunk_size, backend):
+    if backend not in _worker_renderers:
+        _worker_renderers[backend] = make_renderer(backend)
+    return index, make_skeleton_animation(frames, index, fps, movies_dir, chunk_size,
+                                          renderer=_worker_renderers[backend])
+
+
+def export_skeleton_movies(frame_sequences, movies_dir=".", fps=30, backend="numpy",
+                           n_workers=None, chunk_size=64, max_pending=None):
+    """
+    export_skeleton_movies renders and encodes many sequences concurrently in a process pool
+
+    :param frame_sequences - iterable of arrays of shape (n_frames, n_joints, 3)
+    :param movies_dir - where the movies are written, as sequence_<index>.mp4
+    :param fps - frame rate of the movies
+    :param backend - renderer of the workers, see BACKENDS
+    :param n_workers - number of processes, defaults to the number of CPUs
+    :param chunk_size - number of frames a worker renders at once
+    :param max_pending - maximal number of sequences submitted but not written yet, bounds
+        the memory use, defaults to twice the number of workers
+    :return: list of the paths of the written movies, in the order of frame_sequences
+    """
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    from multiprocessing import cpu_count
+
+    n_workers = n_workers or cpu_count()
+    max_pending = max_pending or 2 * n_workers
+
+    paths = {}
+    pending = set()
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        for index, frames in enumerate(frame_sequences):
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                paths.update(future.result() for future in done)
+
+            pending.add(executor.submit(_export_worker, np.asarray(frames), index, fps,
+                                        movies_dir, chunk_size, backend))
+
+        done, _ = wait(pending)
+        paths.update(future.result() for future in done)
+
+    return [paths[index] for index in sorted(paths)]
+
 
 if __name__ == "__main__":
+    from learn.data_management.skeleton_unsupervised import UnsupervisedSkeletonProvider
+
     provider = UnsupervisedSkeletonProvider(
         "/home/valor/workspace/infogan-keras/learn/utils", batch_size=100)
     data = provider._form_data(
         dir_path="/home/valor/workspace/infogan-keras/learn/utils", file_limit=10)
 
-    make_skeleton_movies(data[:, :, 0])
+    export_skeleton_movies(data[:, :, 0])
@@ -0,0 +1,152 @@
+"""
+NumPy software rasterizer for skeleton sequences, for nodes without OpenGL/GLUT. It uses the
+same camera as learn.utils.opengl (gluPerspective followed by a translation) and draws the
+bones as 1 pixel wide white lines on black, like the fixed function GL path.
+"""
+import numpy as np
+
+
+def project(frames, width, height, field_of_view=90,
+            near_clip_dist=0.1, far_clip_dist=100.0,
+            trans_x=0.0,
+            trans_y=-0.5,
+            trans_z=-5.5):
+    """
+    project maps the joints of all frames to image coordinates at once
+
+    :param frames - array of shape (..., 3), joint positions
+    :return: (pixels, visible), pixels - array of shape (..., 2) with (column, row) image
+        coordinates, row 0 at the top, visible - boolean array of shape (...), False for
+        the joints outside of the clip range
+    """
+    frames = np.asarray(frames, dtype=np.float32)
+
+    # eye space, the modelview matrix is only a translation
+    x = frames[..., 0] + trans_x
+    y = frames[..., 1] + trans_y
+    z = frames[..., 2] + trans_z
+
+    # gluPerspective, the camera looks down the negative z axis
+    focal = 1.0 / np.tan(np.radians(field_of_view) / 2)
+    depth = -z
+    visible = (depth >= near_clip_dist) & (depth <= far_clip_dist)
+    depth = np.where(visible, depth, 1.0)
+
+    ndc_x = focal / (width / height) * x / depth
+    ndc_y = focal * y / depth
+
+    # viewport transform, with the rows flipped to start at the top
+    column = (ndc_x + 1) / 2 * width
+    row = height - (ndc_y + 1) / 2 * height
+    return np.stack([column, row], axis=-1), visible
+
+
+def clip_segments(starts, ends, visible, width, height):
+    """
+    clip_segments clips line segments to the image rectangle (Liang-Barsky)
+
+    :param starts, ends - arrays of shape (..., 2), (column, row) endpoints
+    :param visible - boolean array of shape (...)
+    :return: (starts, ends, visible), the clipped segments, segments outside of the image
+        are not visible
+    """
+    deltas = ends - starts
+    t_start = np.zeros(visible.shape, dtype=np.float32)
+    t_end = np.ones(visible.shape, dtype=np.float32)
+
+    # p * t <= q for the left, right, top and bottom boundaries
+    for p, q in [(-deltas[..., 0], starts[..., 0]),
+                 (deltas[..., 0], width - starts[..., 0]),
+                 (-deltas[..., 1], starts[..., 1]),
+                 (deltas[..., 1], height - starts[..., 1])]:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = q / p
+        visible = visible & ((p != 0) | (q >= 0))
+        t_start = np.where(p < 0, np.maximum(t_start, t), t_start)
+        t_end = np.where(p > 0, np.minimum(t_end, t), t_end)
+
+    visible = visible & (t_start <= t_end)
+    clipped_starts = starts + deltas * t_start[..., None]
+    clipped_ends = starts + deltas * t_end[..., None]
+    return clipped_starts, clipped_ends, visible
+
+
+def rasterize_segments(starts, ends, visible, out):
+    """
+    rasterize_segments draws a batch of line segments into a batch of images
+
+    :param starts, ends - arrays of shape (n_frames, n_segments, 2), (column, row) endpoints
+    :param visible - boolean array of shape (n_frames, n_segments)
+    :param out - uint8 array of shape (n_frames, height, width, 3), drawn into in place
+    """
+    n_frames, height, width = out.shape[:3]
+
+    # after clipping, no segment is longer than the image diagonal
+    starts, ends, visible = clip_segments(starts, ends, visible, width, height)
+
+    # every segment is sampled at (at least) one point per pixel of the longest one
+    lengths = np.max(np.abs(ends - starts), axis=-1)
+    lengths = lengths[visible]
+    n_steps = int(np.ceil(lengths.max())) + 1 if lengths.size else 1
+    steps = np.linspace(0, 1, n_steps, dtype=np.float32)
+
+    # (n_frames, n_segments, n_steps, 2)
+    points = starts[:, :, None] + (ends - starts)[:, :, None] * steps[None, None, :, None]
+    columns = np.floor(points[..., 0]).astype(np.int64)
+    rows = np.floor(points[..., 1]).astype(np.int64)
+
+    inside = visible[:, :, None] & (columns >= 0) & (columns < width) & \
+        (rows >= 0) & (rows < height)
+    frame_idx = np.broadcast_to(np.arange(n_frames)[:, None, None], inside.shape)
+
+    # indexing out directly also works for non contiguous views
+    out[frame_idx[inside], rows[inside], columns[inside]] = 255
+
+
+class SoftwareSkeletonRenderer(object):
+    """
+    SoftwareSkeletonRenderer renders skeleton sequences with numpy, a drop-in replacement
+    of learn.utils.opengl.SkeletonRenderer that needs no OpenGL context.
+
+    Usage:
+        >>> renderer = SoftwareSkeletonRenderer(edges, width, height)
+        >>> images = renderer.render_sequence(frames)
+    """
+
+    def __init__(self, edges, width, height, batch_size=64, **camera):
+        """__init__
+
+        :param edges - iterable of (joint index, joint index) pairs, the bones
+        :param width, height - size of the rendered images
+        :param batch_size - number of frames rasterized at once, bounds the memory use
+        :param camera - camera parameters of project(), e.g. field_of_view or trans_z
+        """
+        self.edges = np.asarray(list(edges), dtype=np.int64)
+        self.width = width
+        self.height = height
+        self.batch_size = batch_size
+        self.camera = camera
+
+    def render_sequence(self, frames, out=None):
+        """
+        render_sequence renders all frames of a sequence
+
+        :param frames - array of shape (n_frames, n_joints, 3)
+        :param out - optional uint8 array of shape (n_frames, height, width, 3) the images are
+            written to, allocated if not given
+        :return: the images, array of shape (n_frames, height, width, 3)
+        """
+        n_frames = len(frames)
+        if out is None:
+            out = np.empty((n_frames, self.height, self.width, 3), dtype=np.uint8)
+
+        pixels, visible = project(frames, self.width, self.height, **self.camera)
+        starts, ends = pixels[:, self.edges[:, 0]], pixels[:, self.edges[:, 1]]
+        visible = visible[:, self.edges[:, 0]] & visible[:, self.edges[:, 1]]
+
+        for start in range(0, n_frames, self.batch_size):
+            batch = slice(start, start + self.batch_size)
+            out[batch] = 0
+            rasterize_segments(starts[batch], ends[batch], visible[batch], out[batch])
+
+        return out
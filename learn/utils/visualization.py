@@ -1,19 +1,67 @@
+import numpy as np
 
-import matplotlib
+colors = ['#991012', '#c4884e', '#93bf8d', '#a3dbff']
 
-matplotlib.use('Agg')
-import seaborn as sns
-import matplotlib.pyplot as plt
-import matplotlib.cm as cm
 
+def _pyplot():
+    """
+    imports matplotlib (with a non-interactive backend) and seaborn on first use, they are
+    slow to import and only needed for the plots
+    """
+    if not getattr(_pyplot, "initialized", False):
+        import matplotlib
+        matplotlib.use('Agg')
+        import seaborn as sns
+        sns.set_palette(colors)
+        _pyplot.initialized = True
 
-import tensorflow as tf
-import numpy as np
-from scipy import interp
-from sklearn.metrics import auc, roc_curve, silhouette_score, silhouette_samples
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    return plt, sns
+
+
+def numpy_image_grid(images, grid_shape):
+    """
+    numpy_image_grid forms a grid of image tiles from a batch of images on the host,
+    the counterpart of image_grid for numpy arrays. Missing tiles are black.
+
+    :param images - array of images, shape (N, height, width, n_channels)
+    :param grid_shape - shape (in tiles) of the grid, e.g. (10, 10)
+    :return: array of shape (grid height * height, grid width * width, n_channels)
+    """
+    n_tiles = grid_shape[0] * grid_shape[1]
+    images = np.asarray(images)[:n_tiles]
+    image_shape = images.shape[1:]
+
+    if len(images) < n_tiles:
+        padding = np.zeros((n_tiles - len(images),) + image_shape, dtype=images.dtype)
+        images = np.concatenate([images, padding], axis=0)
+
+    # (rows, cols, h, w, c) -> (rows, h, cols, w, c), the transpose is only a view,
+    # the final reshape does the single copy
+    grid = images.reshape(grid_shape + image_shape).swapaxes(1, 2)
+    return grid.reshape((grid_shape[0] * image_shape[0],
+                         grid_shape[1] * image_shape[1],
+                         image_shape[2]))
 
-colors = ['#991012', '#c4884e', '#93bf8d', '#a3dbff']
-sns.set_palette(colors)
+
+def encode_png(image):
+    """
+    encode_png encodes an image with values in [0, 1] as PNG
+
+    :param image - array of shape (height, width, n_channels), 1, 3 or 4 channels
+    :return: bytes of the PNG file
+    """
+    import io
+    from PIL import Image
+
+    image = np.clip(np.asarray(image) * 255 + 0.5, 0, 255).astype(np.uint8)
+    if image.shape[-1] == 1:
+        image = image[:, :, 0]
+
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="PNG")
+    return buffer.getvalue()
 
 
 def image_grid(input_tensor, grid_shape, image_shape):
@@ -24,6 +72,8 @@ def image_grid(input_tensor, grid_shape, image_shape):
     :param grid_shape - shape (in tiles) of the grid, e.g. (10, 10)
     :param image_shape - shape of a single image, e.g. (28, 28, 1)
     """
+    import tensorflow as tf
+
     # take the subset of images
     input_tensor = input_tensor[:grid_shape[0] * grid_shape[1]]
     # add black tiles if needed
@@ -72,6 +122,7 @@ class ROCView(object):
         initialise the plots (figure, axes)
         :return:
         """
+        plt, sns = _pyplot()
         sns.set_style("whitegrid")
 
         fig = plt.figure()
@@ -97,6 +148,9 @@ class ROCView(object):
         :param tpr: array, true positive rate
         :param label: text to be put into the legend entry for this curve
         """
+        from sklearn.metrics import auc
+
+        plt, _ = _pyplot()
         roc_auc = auc(fpr, tpr)
         plt.plot(fpr, tpr, lw=2, label='{0} (AUC = {1:0.2f})'.format(label, roc_auc))
 
@@ -133,6 +187,7 @@ def micro_macro_roc(n_classes, y_expected, y_predicted):
                 "macro": (fpr, tpr)
             }
     """
+    from sklearn.metrics import roc_curve
 
     # Compute micro-average ROC curve
     micro_fpr, micro_tpr, _ = roc_curve(y_expected.ravel(), y_predicted.ravel())
@@ -148,7 +203,7 @@ def micro_macro_roc(n_classes, y_expected, y_predicted):
     # Then interpolate all ROC curves at this points
     mean_tpr = np.zeros_like(all_fpr)
     for i in range(n_classes):
-        mean_tpr += interp(all_fpr, per_class_fpr[i], per_class_tpr[i])
+        mean_tpr += np.interp(all_fpr, per_class_fpr[i], per_class_tpr[i])
 
     # Finally average it
     mean_tpr /= float(n_classes)
@@ -162,8 +217,21 @@ def micro_macro_roc(n_classes, y_expected, y_predicted):
     }
 
 
-def cluster_silhouette_view(X, y, file_path, n_clusters):
+def cluster_silhouette_view(X, y, file_path, n_clusters, score_per_sample=None):
+    """
+    cluster_silhouette_view plots the sorted silhouette scores of the samples of each cluster
+
+    :param X - array of shape (N, ...), the samples (e.g. encodings)
+    :param y - array of shape (N,), the cluster labels
+    :param file_path - where the plot is saved
+    :param n_clusters - number of clusters
+    :param score_per_sample - the silhouette scores of the samples, computed if not given
+    """
+    from learn.evaluation.silhouette import silhouette_samples
+    import matplotlib.cm as cm
+
     # initialize the figure
+    plt, sns = _pyplot()
     sns.set_style("whitegrid")
 
     fig = plt.figure()
@@ -175,12 +243,13 @@ def cluster_silhouette_view(X, y, file_path, n_clusters):
     plt.ylabel('Samples in clusters', size=10)
     plt.title('Silhouette scores', size=15)
 
-    # compute the silhoette average score of the clustering
-    score_avg = silhouette_score(X, y)
-    print("The average silhouette score is :", score_avg)
+    # Compute the silhouette scores for each sample, memory bounded
+    if score_per_sample is None:
+        score_per_sample = silhouette_samples(X, y)
 
-    # Compute the silhouette scores for each sample
-    score_per_sample = silhouette_samples(X, y)
+    # the silhoette average score of the clustering
+    score_avg = np.mean(score_per_sample)
+    print("The average silhouette score is :", score_avg)
 
     y_lower = 10
     for i in range(n_clusters):
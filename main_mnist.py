@@ -8,26 +8,40 @@ import tensorflow as tf
 from learn.models.infogan import InfoGAN2
 from learn.models.infogan import InfoganDiscriminatorImpl, InfoganPriorImpl, \
     InfoganEncoderImpl, InfoganGeneratorImpl
-from learn.train.observers import Logger, InfoganTensorBoard, TensorBoardLossObserver
+from learn.train.observers import Logger, InfoganTensorBoard, TensorBoardLossObserver, \
+    ClusteringMetricsObserver
 from learn.train import ModelTrainer
 from learn.data_management import SemiSupervisedMNISTProvider
-from learn.networks.convnets import EncoderNetwork, SharedNet, DiscriminatorNetwork, \
-    BinaryImgGeneratorNetwork
+from learn.networks.registry import build_network
 from learn.stats.distributions import Categorical, IsotropicGaussian, Bernoulli
 
 
 batch_size = 128
-
-if __name__ == "__main__":
-    experiment_dir = sys.argv[1]
-
-    meaningful_dists = {'c1': Categorical(n_classes=10),
+# e.g. 'float16' or 'bfloat16' for mixed precision training, None for full precision
+compute_dtype = None
+# static loss scale used when compute_dtype is 'float16', the other dtypes need none
+float16_loss_scale = 128.0
+# network variants, see learn.networks.registry.available_networks()
+shared_net_name = "shared_net"
+gen_net_name = "generator"
+# pass the real and generated samples through the shared net as one batch
+joint_shared_pass = False
+
+
+def build_infogan(batch_size=batch_size):
+    """
+    build_infogan puts together the MNIST InfoGAN configured above
+    """
+    loss_scale = float16_loss_scale if compute_dtype == 'float16' else None
+
+    meaningful_dists = {'c1': Categorical(n_classes=10, from_logits=True),
                         'c2': IsotropicGaussian(dim=1),
                         'c3': IsotropicGaussian(dim=1)
                         }
     noise_dists = {'z': IsotropicGaussian(dim=62)}
-    image_dist = Bernoulli()
-    prior_params = {'c1': {'p_vals': np.ones((batch_size, 10), dtype=np.float32) / 10},
+    image_dist = Bernoulli(from_logits=True)
+    # c1 is parametrized by logits, all zeros is the uniform distribution
+    prior_params = {'c1': {'p_vals': np.zeros((batch_size, 10), dtype=np.float32)},
                     'c2': {'mean': np.zeros((batch_size, 1), dtype=np.float32),
                            'std': np.ones((batch_size, 1), dtype=np.float32)},
                     'c3': {'mean': np.zeros((batch_size, 1), dtype=np.float32),
@@ -41,20 +55,25 @@ if __name__ == "__main__":
                              prior_params=prior_params,
                              recurrent_dim=None)
 
-    gen_net = BinaryImgGeneratorNetwork(latent_dim=74, image_shape=(28, 28, 1))
+    gen_net = build_network(gen_net_name, latent_dim=74, image_shape=(28, 28, 1),
+                            compute_dtype=compute_dtype)
     generator = InfoganGeneratorImpl(data_shape=(28, 28, 1),
                                      meaningful_dists=meaningful_dists,
                                      noise_dists=noise_dists,
                                      data_q_dist=image_dist,
                                      network=gen_net,
-                                     recurrent_dim=None)
+                                     recurrent_dim=None,
+                                     from_logits=True)
 
-    shared_net = SharedNet(data_shape=(28, 28, 1))
+    shared_net = build_network(shared_net_name, data_shape=(28, 28, 1),
+                               bn_group_size=batch_size if joint_shared_pass else None,
+                               compute_dtype=compute_dtype)
 
-    disc_net = DiscriminatorNetwork(shared_out_shape=(128, ))
-    discriminator = InfoganDiscriminatorImpl(network=disc_net)
+    disc_net = build_network("discriminator", shared_out_shape=(128, ),
+                             compute_dtype=compute_dtype)
+    discriminator = InfoganDiscriminatorImpl(network=disc_net, from_logits=True)
 
-    enc_net = EncoderNetwork(shared_out_shape=(128, ))
+    enc_net = build_network("encoder", shared_out_shape=(128, ), compute_dtype=compute_dtype)
     encoder = InfoganEncoderImpl(batch_size=batch_size,
                                  meaningful_dists=meaningful_dists,
                                  supervised_dist=None,
@@ -68,11 +87,22 @@ if __name__ == "__main__":
                      shared_net=shared_net,
                      discriminator=discriminator,
                      encoder=encoder,
-                     recurrent_dim=None)
+                     recurrent_dim=None,
+                     loss_scale=loss_scale,
+                     joint_shared_pass=joint_shared_pass)
+
+    return model
+
+
+if __name__ == "__main__":
+    experiment_dir = sys.argv[1]
+    model = build_infogan()
 
-    from keras.utils import plot_model
-    plot_model(model.gen_train_model, to_file='gen_train_model.png')
-    plot_model(model.disc_train_model, to_file='disc_train_model.png')
+    # drawing the model diagrams is slow, only do it when asked for
+    if "--plot-models" in sys.argv[2:]:
+        from keras.utils import plot_model
+        plot_model(model.gen_train_model, to_file='gen_train_model.png')
+        plot_model(model.disc_train_model, to_file='disc_train_model.png')
 
     # provide the data
     data_provider = SemiSupervisedMNISTProvider(batch_size)
@@ -80,12 +110,16 @@ if __name__ == "__main__":
 
     # define observers (callbacks during training)
     tb_writer = tf.summary.FileWriter(experiment_dir)
+    # the metrics observer goes first, the loggers report the metrics it adds
+    metrics_observer = ClusteringMetricsObserver(model=model, frequency=500,
+                                                 val_x=val_x, val_y=val_y,
+                                                 checkpoint_dir=experiment_dir)
     logger_observer = Logger(model=model, frequency=1)
     tb_observer = InfoganTensorBoard(model=model, tb_writer=tb_writer, frequency=10,
                                      val_x=val_x, val_y=val_y)
     tb_loss_observer = TensorBoardLossObserver(model=model, tb_writer=tb_writer, frequency=10)
 
-    observers = [logger_observer, tb_observer, tb_loss_observer]
+    observers = [metrics_observer, logger_observer, tb_observer, tb_loss_observer]
 
     # train the model
     model_trainer = ModelTrainer(model, data_provider, observers)
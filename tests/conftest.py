@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+import pytest
+
+N_JOINTS = 25
+
+
+def write_skeleton_file(file_path, bodies_per_frame, random):
+    """
+    write_skeleton_file writes a .skeleton file in the NTU RGB+D format, with random values
+    """
+    lines = [str(len(bodies_per_frame))]
+    for body_count in bodies_per_frame:
+        lines.append(str(body_count))
+        for body in range(body_count):
+            flags = random.randint(0, 2, size=6)
+            lean = random.uniform(-1, 1, size=2)
+            lines.append(" ".join(["7205759403792{:04d}".format(body)] +
+                                  [str(flag) for flag in flags] +
+                                  ["{:.6f}".format(x) for x in lean] + ["2"]))
+            lines.append(str(N_JOINTS))
+            for _ in range(N_JOINTS):
+                values = random.uniform(-2, 2, size=11)
+                lines.append(" ".join(["{:.6f}".format(x) for x in values] + ["2"]))
+
+    with open(file_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+@pytest.fixture
+def skeleton_dir(tmpdir):
+    """
+    a directory with .skeleton files of different lengths and body counts, not created in
+    sorted order, and a file that is not a .skeleton file
+    """
+    random = np.random.RandomState(0)
+    dir_path = str(tmpdir.mkdir("skeletons"))
+    sequences = [
+        ("S001C001P001R001A003.skeleton", [1, 1, 2, 1]),
+        ("S001C001P001R001A001.skeleton", [1, 0, 1, 1, 1, 1]),
+        ("S001C001P001R001A002.skeleton", [2, 2, 1]),
+        ("S001C001P001R001A004.skeleton", [1, 1, 1, 1, 2]),
+    ]
+    for file_name, bodies_per_frame in sequences:
+        write_skeleton_file(os.path.join(dir_path, file_name), bodies_per_frame, random)
+    with open(os.path.join(dir_path, "README.txt"), "w") as f:
+        f.write("not a skeleton file\n")
+    return dir_path
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from learn.data_management.augmentation import AugmentedProvider, ImageAffineAugmentation, \
+    SkeletonAugmentation
+
+
+@pytest.fixture
+def images():
+    return np.random.RandomState(0).uniform(size=(5, 7, 6, 2)).astype(np.float32)
+
+
+def test_identity_affine_transform_returns_the_images(images):
+    augment = ImageAffineAugmentation(seed=0)
+    np.testing.assert_allclose(augment(images), images, atol=1e-6)
+    # a smaller batch reuses the buffer
+    np.testing.assert_allclose(augment(images[:2]), images[:2], atol=1e-6)
+
+
+def test_half_turn_flips_the_images(images):
+    augment = ImageAffineAugmentation(seed=0)
+    augment._transforms = lambda n: np.tile(-np.eye(2), (n, 1, 1))
+    np.testing.assert_allclose(augment(images), images[:, ::-1, ::-1], atol=1e-6)
+
+
+def test_whole_pixel_shift_fills_zeros():
+    images = np.arange(16, dtype=np.float32).reshape((1, 4, 4, 1))
+    class ShiftOnly(object):
+        # the middle of the ranges for the matrices, a shift of -1 row and +1 column
+        def uniform(self, low, high, size):
+            if size == (1, 1, 2):
+                return np.reshape([-0.25, 0.25], size)
+            return np.full(size, (low + high) / 2.)
+
+    augment = ImageAffineAugmentation(seed=0)
+    augment.random = ShiftOnly()
+    # the output pixel (r, c) is the input pixel (r - 1, c + 1)
+
+    expected = np.zeros_like(images)
+    expected[0, 1:, :-1] = images[0, :-1, 1:]
+    np.testing.assert_allclose(augment(images), expected, atol=1e-6)
+
+
+@pytest.fixture
+def sequences():
+    sequences = np.random.RandomState(0).normal(size=(4, 10, 2, 25, 3)).astype(np.float32)
+    # padded frames and bodies
+    sequences[0, 6:] = 0
+    sequences[1, :, 1] = 0
+    return sequences
+
+
+def test_identity_skeleton_transform_returns_the_sequences(sequences):
+    np.testing.assert_allclose(SkeletonAugmentation(seed=0)(sequences), sequences, atol=1e-6)
+
+
+def test_rotation_keeps_lengths_and_padding(sequences):
+    augmented = SkeletonAugmentation(rotation_range=(30, 180, 10), seed=0)(sequences)
+    np.testing.assert_allclose(np.linalg.norm(augmented, axis=-1),
+                               np.linalg.norm(sequences, axis=-1), rtol=1e-5)
+    assert np.all(augmented[sequences == 0] == 0)
+
+
+def test_crop_is_inside_the_frames(sequences):
+    augmented = SkeletonAugmentation(crop_length=4, seed=0)(sequences)
+    assert augmented.shape == (4, 4) + sequences.shape[2:]
+    for cropped, sequence, n_frames in zip(augmented, sequences, [6, 10, 10, 10]):
+        starts = [start for start in range(n_frames - 4 + 1)
+                  if np.array_equal(sequence[start:start + 4], cropped)]
+        assert starts
+
+
+def test_augmented_provider():
+    class Provider(object):
+        n_iter = 2
+
+        def iterate_minibatches(self):
+            for _ in range(self.n_iter):
+                yield np.ones((3, 4, 4, 1), dtype=np.float32), np.arange(3)
+
+    provider = AugmentedProvider(Provider(), lambda samples: samples * 2)
+    assert provider.n_iter == 2
+    for samples, labels in provider.iterate_minibatches():
+        assert np.all(samples == 2)
+        np.testing.assert_array_equal(labels, np.arange(3))
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from learn.evaluation.metrics import adjusted_rand_index, clustering_metrics, \
+    contingency_matrix, normalized_mutual_info
+
+
+def test_contingency_matrix():
+    contingency = contingency_matrix([0, 0, 1, 2], [1, 1, 0, 0], n_pred=3)
+    np.testing.assert_array_equal(contingency, [[0, 2, 0], [1, 0, 0], [1, 0, 0]])
+
+
+def test_permuted_labels_are_a_perfect_clustering():
+    random = np.random.RandomState(0)
+    labels_true = random.randint(0, 10, size=500)
+    permutation = random.permutation(10)
+    labels_pred = permutation[labels_true]
+
+    metrics = clustering_metrics(labels_true, labels_pred)
+    assert metrics['accuracy'] == 1.0
+    assert metrics['nmi'] == pytest.approx(1.0)
+    assert metrics['ari'] == pytest.approx(1.0)
+    # the class of each cluster undoes the permutation
+    np.testing.assert_array_equal(metrics['mapping'][permutation], np.arange(10))
+
+
+def test_accuracy_of_a_partly_wrong_clustering():
+    labels_true = [0, 0, 0, 1, 1, 1]
+    # cluster 1 is class 0, cluster 0 is class 1, one sample is misclustered
+    labels_pred = [1, 1, 0, 0, 0, 0]
+    assert clustering_metrics(labels_true, labels_pred)['accuracy'] == pytest.approx(5. / 6)
+
+
+def test_more_clusters_than_classes():
+    metrics = clustering_metrics([0, 0, 1, 1], [0, 1, 2, 2])
+    np.testing.assert_array_equal(metrics['mapping'], [0, 0, 1])
+    assert metrics['accuracy'] == 1.0
+
+
+def test_known_values():
+    # the predicted clusters split class 1: the mutual information is H(true) = log(2),
+    # H(pred) = 1.5 log(2), the pairs are C(2, 2) = 1 of the 2 true pairs
+    contingency = contingency_matrix([0, 0, 1, 1], [0, 0, 1, 2])
+    assert normalized_mutual_info(contingency) == pytest.approx(0.8)
+    assert adjusted_rand_index(contingency) == pytest.approx(4. / 7)
+
+    # independent labelings
+    contingency = contingency_matrix([0, 0, 1, 1], [0, 1, 0, 1])
+    assert normalized_mutual_info(contingency) == pytest.approx(0.0)
+    assert adjusted_rand_index(contingency) == pytest.approx(-0.5)
+
+
+@pytest.mark.parametrize("labels_true, labels_pred", [
+    # both a single cluster
+    ([0, 0, 0, 0], [3, 3, 3, 3]),
+    # both every sample in its own cluster
+    ([0, 1, 2, 3], [3, 2, 1, 0]),
+    # no pairs at all
+    ([0], [0]),
+])
+def test_trivially_agreeing_labelings(labels_true, labels_pred):
+    assert adjusted_rand_index(contingency_matrix(labels_true, labels_pred)) == 1.0
+
+
+def test_single_cluster_against_singletons():
+    contingency = contingency_matrix(np.zeros(5, dtype=int), np.arange(5))
+    assert adjusted_rand_index(contingency) == 0.0
+
+
+def test_nearly_degenerate_labeling_is_not_rounded_to_one():
+    # a single cluster against a single cluster minus one sample: the pair counts differ by
+    # n - 1 only, a relative difference that a float comparison with tolerance misses
+    n = 10 ** 6
+    labels_pred = np.zeros(n, dtype=int)
+    labels_pred[0] = 1
+    contingency = contingency_matrix(np.zeros(n, dtype=int), labels_pred)
+    assert adjusted_rand_index(contingency) == 0.0
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from learn.data_management.mnist_semi_supervised import SemiSupervisedMNISTProvider
+
+N_TRAIN = 1000 + 437
+
+
+def fake_mnist():
+    # the training index of every sample is written into its first two pixels
+    indices = np.arange(N_TRAIN)
+    x_train = np.zeros((N_TRAIN, 28, 28), dtype=np.uint8)
+    x_train[:, 0, 0] = indices % 256
+    x_train[:, 0, 1] = indices // 256
+    y_train = indices % 10
+    return (x_train, y_train), (x_train[:100], y_train[:100])
+
+
+def sample_indices(x):
+    pixels = np.round(x[:, 0, :2, 0] * 255).astype(int)
+    return pixels[:, 0] + 256 * pixels[:, 1] - 1000
+
+
+@pytest.fixture(autouse=True)
+def no_download(monkeypatch):
+    monkeypatch.setattr(SemiSupervisedMNISTProvider, "_load_mnist", staticmethod(fake_mnist))
+
+
+def unlabeled_samples(provider, n_epochs):
+    seen = []
+    for _ in range(n_epochs):
+        for x, y in provider.iterate_minibatches():
+            if y is None:
+                seen.append(sample_indices(x))
+            else:
+                # the unlabeled rows have all zero labels
+                unlabeled = y.sum(axis=1) == 0
+                seen.append(sample_indices(x[unlabeled]))
+    return np.concatenate(seen)
+
+
+@pytest.mark.parametrize("labeled_per_batch", [None, 3])
+def test_every_unlabeled_sample_once_per_pass(labeled_per_batch):
+    provider = SemiSupervisedMNISTProvider(batch_size=16, supervision=0.1,
+                                           labeled_per_batch=labeled_per_batch)
+    n_unlabeled = len(provider.unlabeled_indices)
+    seen = unlabeled_samples(provider, n_epochs=5)
+
+    # the epochs are a little shorter than a pass, the passes continue across the epochs
+    assert len(seen) >= 4 * n_unlabeled
+    for start in range(0, len(seen) - n_unlabeled + 1, n_unlabeled):
+        np.testing.assert_array_equal(np.sort(seen[start:start + n_unlabeled]),
+                                      provider.unlabeled_indices)
+
+
+def test_labeled_batches_only_contain_labeled_samples():
+    provider = SemiSupervisedMNISTProvider(batch_size=16, supervision=0.1)
+    labeled = set(provider.labeled_indices)
+    for x, y in provider.iterate_minibatches():
+        if y is not None:
+            indices = sample_indices(x)
+            assert labeled.issuperset(indices)
+            np.testing.assert_array_equal(y.argmax(axis=1), (indices + 1000) % 10)
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from learn.data_management.sharded import ShardedArray, ShardedProvider, ShardWriter, \
+    write_shards
+
+
+@pytest.fixture
+def data():
+    random = np.random.RandomState(0)
+    samples = random.uniform(size=(103, 4, 3)).astype(np.float32)
+    labels = random.randint(0, 10, size=103).astype(np.int64)
+    return samples, labels
+
+
+@pytest.fixture
+def data_dir(tmpdir, data):
+    samples, labels = data
+    data_dir = str(tmpdir.join("shards"))
+    # chunks that do not line up with the shards
+    with ShardWriter(data_dir, shard_size=16) as writer:
+        for start, stop in [(0, 5), (5, 40), (40, 41), (41, 103)]:
+            writer.write(samples[start:stop], labels[start:stop])
+    return data_dir
+
+
+def test_round_trip(data_dir, data):
+    samples, labels = data
+    x, y = ShardedArray(data_dir, "samples"), ShardedArray(data_dir, "labels")
+
+    assert len(x.shards) == 7
+    assert x.shape == samples.shape and x.dtype == samples.dtype
+    assert y.shape == labels.shape and y.dtype == labels.dtype
+
+    indices = np.random.RandomState(1).permutation(103)[:50]
+    np.testing.assert_array_equal(x.gather(indices), samples[indices])
+    np.testing.assert_array_equal(y.gather(indices), labels[indices])
+    np.testing.assert_array_equal(x[:], samples)
+
+
+def test_indexing(data_dir, data):
+    samples, _ = data
+    x = ShardedArray(data_dir)
+
+    np.testing.assert_array_equal(x[10:60:7], samples[10:60:7])
+    np.testing.assert_array_equal(x[::-5], samples[::-5])
+    np.testing.assert_array_equal(x[-1], samples[-1])
+    np.testing.assert_array_equal(x[[0, -103, 102]], samples[[0, -103, 102]])
+    with pytest.raises(IndexError):
+        x[103]
+    with pytest.raises(IndexError):
+        x[[0, -104]]
+
+
+def test_gather_into_out(data_dir, data):
+    samples, _ = data
+    out = np.zeros((3, 4, 3), dtype=np.float32)
+    result = ShardedArray(data_dir).gather([100, 2, 50], out=out)
+    assert result is out
+    np.testing.assert_array_equal(out, samples[[100, 2, 50]])
+
+
+def test_write_shards_without_labels(tmpdir, data):
+    samples, _ = data
+    data_dir = str(tmpdir.join("shards"))
+    write_shards(data_dir, samples, shard_size=32)
+
+    np.testing.assert_array_equal(ShardedArray(data_dir)[:], samples)
+    provider = ShardedProvider(data_dir, batch_size=10, n_workers=0)
+    assert provider.y_train is None
+    for _, labels in provider.iterate_minibatches():
+        assert labels is None
+
+
+@pytest.mark.parametrize("n_workers", [0, 2])
+def test_provider_epoch(data_dir, data, n_workers):
+    samples, labels = data
+    provider = ShardedProvider(data_dir, batch_size=10, n_workers=n_workers, prefetch=2,
+                               seed=0)
+    assert provider.n_iter == 10
+
+    seen = []
+    for x, y in provider.iterate_minibatches():
+        assert x.shape == (10, 4, 3)
+        # the samples are unique, their rows identify them
+        rows = [int(np.flatnonzero(np.all(samples == sample, axis=(1, 2)))[0]) for sample in x]
+        np.testing.assert_array_equal(y, labels[rows])
+        seen += rows
+    assert len(set(seen)) == 100
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from learn.evaluation.silhouette import sampled_silhouette_score, silhouette_samples, \
+    silhouette_score
+
+
+def brute_force_silhouette(X, labels):
+    X = X.reshape((len(X), -1))
+    distances = np.sqrt(np.sum((X[:, None] - X[None, :]) ** 2, axis=-1))
+    scores = np.zeros(len(X))
+    for i in range(len(X)):
+        own = labels == labels[i]
+        if own.sum() == 1:
+            continue
+        a = distances[i, own].sum() / (own.sum() - 1)
+        b = min(distances[i, labels == label].mean()
+                for label in np.unique(labels) if label != labels[i])
+        scores[i] = (b - a) / max(a, b)
+    return scores
+
+
+@pytest.fixture
+def clusters():
+    random = np.random.RandomState(0)
+    labels = random.randint(0, 4, size=150)
+    X = random.normal(size=(150, 3, 2)) + labels[:, None, None]
+    # a single sample cluster, its silhouette is 0
+    labels[0] = 7
+    return X, labels
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 8 * 150 * 7, 64 * 1024 * 1024])
+def test_chunked_scores_equal_brute_force(clusters, chunk_bytes):
+    X, labels = clusters
+    expected = brute_force_silhouette(X, labels)
+
+    np.testing.assert_allclose(silhouette_samples(X, labels, chunk_bytes=chunk_bytes),
+                               expected, atol=1e-10)
+    assert silhouette_score(X, labels, chunk_bytes=chunk_bytes) == \
+        pytest.approx(expected.mean())
+
+
+def test_sampled_score(clusters):
+    X, labels = clusters
+    expected = brute_force_silhouette(X, labels).mean()
+
+    # all samples, the exact score
+    estimate, interval = sampled_silhouette_score(X, labels, n_samples=len(X))
+    assert estimate == pytest.approx(expected)
+    assert interval == (estimate, estimate)
+
+    estimate, (lower, upper) = sampled_silhouette_score(X, labels, n_samples=100,
+                                                        random_state=0, chunk_bytes=1)
+    assert lower < estimate < upper
+
+
+def test_single_cluster_is_an_error():
+    with pytest.raises(ValueError):
+        silhouette_samples(np.zeros((4, 2)), np.zeros(4))
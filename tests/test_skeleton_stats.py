@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from learn.data_management.skeleton_stats import compute_statistics, \
+    load_or_compute_statistics, normalize_batch
+from learn.data_management.skeleton_store import SkeletonStore
+
+
+@pytest.fixture
+def store(skeleton_dir, tmpdir):
+    return SkeletonStore.build_or_open(skeleton_dir, str(tmpdir.join("store")))
+
+
+def tracked_rows(store, start, stop):
+    rows = slice(store.body_range(start).start, store.body_range(stop - 1).stop)
+    xyz = np.asarray(store["xyz"][rows], dtype=np.float64)
+    return xyz[np.any(xyz.reshape((len(xyz), -1)) != 0, axis=1)]
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 3, 65536])
+@pytest.mark.parametrize("sequence_range", [None, (1, 3)])
+def test_combined_statistics_equal_numpy(store, chunk_rows, sequence_range):
+    stats = compute_statistics(store, "xyz", sequence_range, chunk_rows=chunk_rows)
+    rows = tracked_rows(store, *(sequence_range or (0, len(store))))
+
+    assert stats['count'] == len(rows)
+    np.testing.assert_allclose(stats['mean'], np.mean(rows, axis=0), rtol=1e-10)
+    np.testing.assert_allclose(stats['var'], np.var(rows, axis=0), rtol=1e-10)
+    np.testing.assert_allclose(stats['min'], np.min(rows, axis=0))
+    np.testing.assert_allclose(stats['max'], np.max(rows, axis=0))
+
+    axis_rows = rows.reshape((-1, rows.shape[-1]))
+    np.testing.assert_allclose(stats['axis_mean'], np.mean(axis_rows, axis=0), rtol=1e-10)
+    np.testing.assert_allclose(stats['axis_var'], np.var(axis_rows, axis=0), rtol=1e-10)
+
+
+def test_histograms(store):
+    stats = compute_statistics(store)
+    np.testing.assert_array_equal(stats['frame_count_hist'], [0, 0, 0, 1, 1, 1, 1])
+    # 13 frames with one body, 4 with two and one without
+    np.testing.assert_array_equal(stats['body_count_hist'], [1, 13, 4])
+
+
+def test_statistics_are_cached(store):
+    stats = load_or_compute_statistics(store, "xyz", (0, 2))
+    cached = load_or_compute_statistics(store, "xyz", (0, 2))
+    for name in stats:
+        np.testing.assert_array_equal(cached[name], stats[name])
+
+
+def test_normalize_batch_keeps_the_padding(store):
+    stats = compute_statistics(store)
+    batch = store.padded("xyz")
+    padding = np.all(batch == 0, axis=(-2, -1))
+    normalize_batch(batch, stats['mean'], stats['std'])
+
+    assert np.all(batch[padding] == 0)
+    tracked = batch[~padding]
+    np.testing.assert_allclose(tracked.mean(axis=0), 0, atol=1e-5)
+    np.testing.assert_allclose(tracked.std(axis=0), 1, atol=1e-4)
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pytest
+
+from learn.data_management.skeleton_store import SkeletonStore, build_store, \
+    parse_skeleton_file, skeleton_file_names
+from learn.data_management.skeleton_unsupervised import UnsupervisedSkeletonProvider
+
+
+def form_data(dir_path, file_limit):
+    # the text parsing path of the provider, without loading the whole provider
+    provider = UnsupervisedSkeletonProvider.__new__(UnsupervisedSkeletonProvider)
+    return provider._form_data(dir_path, file_limit)
+
+
+def test_file_names_are_sorted_and_filtered(skeleton_dir):
+    assert skeleton_file_names(skeleton_dir) == [
+        "S001C001P001R001A001.skeleton", "S001C001P001R001A002.skeleton",
+        "S001C001P001R001A003.skeleton", "S001C001P001R001A004.skeleton"]
+    assert skeleton_file_names(skeleton_dir, 2) == [
+        "S001C001P001R001A001.skeleton", "S001C001P001R001A002.skeleton"]
+
+
+@pytest.mark.parametrize("file_limit", [None, 3])
+def test_padded_equals_parsed_data(skeleton_dir, tmpdir, file_limit):
+    store = SkeletonStore.build_or_open(skeleton_dir, str(tmpdir.join("store")), file_limit)
+    padded = store.padded("xyz")
+
+    np.testing.assert_array_equal(padded, form_data(skeleton_dir, file_limit))
+    assert padded.shape == (file_limit or 4, 6, 2, 25, 3)
+
+
+def test_store_keeps_all_fields(skeleton_dir, tmpdir):
+    store_dir = str(tmpdir.join("store"))
+    build_store(skeleton_dir, store_dir)
+    store = SkeletonStore(store_dir)
+
+    file_path = os.path.join(skeleton_dir, store.sequence_names[2])
+    bodies_per_frame, body_ids, body_rows, joint_rows = parse_skeleton_file(file_path)
+    fields, frame_offsets = store.sequence(2, ["xyz", "orientation", "body_id", "lean"])
+
+    np.testing.assert_array_equal(np.diff(frame_offsets), bodies_per_frame)
+    np.testing.assert_array_equal(fields["body_id"], body_ids)
+    np.testing.assert_allclose(fields["xyz"], joint_rows[:, :, :3], rtol=1e-6)
+    np.testing.assert_allclose(fields["orientation"], joint_rows[:, :, 7:11], rtol=1e-6)
+    np.testing.assert_allclose(fields["lean"], body_rows[:, 6:8], rtol=1e-6)
+
+
+def test_padded_truncates(skeleton_dir, tmpdir):
+    store = SkeletonStore.build_or_open(skeleton_dir, str(tmpdir.join("store")))
+    np.testing.assert_array_equal(store.padded("xyz", max_frames=2, max_bodies=1),
+                                  store.padded("xyz")[:, :2, :1])
+
+
+def test_store_is_rebuilt_for_another_file_limit(skeleton_dir, tmpdir):
+    store_dir = str(tmpdir.join("store"))
+    assert len(SkeletonStore.build_or_open(skeleton_dir, store_dir, 2)) == 2
+    assert len(SkeletonStore.build_or_open(skeleton_dir, store_dir)) == 4
+
+
+def test_directory_without_skeleton_files(tmpdir):
+    empty_dir = str(tmpdir.mkdir("empty"))
+    tmpdir.join("empty", "README.txt").write("not a skeleton file\n")
+
+    with pytest.raises(ValueError, match="empty"):
+        build_store(empty_dir, str(tmpdir.join("store")))
+    with pytest.raises(ValueError, match="empty"):
+        form_data(empty_dir, None)
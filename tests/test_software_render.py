@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from learn.utils.software_render import clip_segments, project, rasterize_segments
+
+WIDTH, HEIGHT = 40, 30
+
+
+def clip(start, end, visible=True):
+    starts, ends, visible = clip_segments(np.array([start], dtype=np.float32),
+                                          np.array([end], dtype=np.float32),
+                                          np.array([visible]), WIDTH, HEIGHT)
+    return starts[0], ends[0], visible[0]
+
+
+@pytest.mark.parametrize("start, end", [
+    ((1, 2), (30, 20)),
+    ((0, 0), (WIDTH, HEIGHT)),
+    # a single point
+    ((5, 5), (5, 5)),
+])
+def test_inside_segments_are_unchanged(start, end):
+    clipped_start, clipped_end, visible = clip(start, end)
+    assert visible
+    np.testing.assert_allclose(clipped_start, start)
+    np.testing.assert_allclose(clipped_end, end)
+
+
+@pytest.mark.parametrize("start, end", [
+    ((-10, 5), (-1, 20)),
+    ((50, 5), (60, 5)),
+    ((5, -3), (30, -1)),
+    # vertical and horizontal segments beside the image, parallel to a boundary
+    ((-2, 5), (-2, 20)),
+    ((5, HEIGHT + 1), (30, HEIGHT + 1)),
+    # a single point outside
+    ((-1, -1), (-1, -1)),
+    # crossing the lines of two boundaries, but not the image
+    ((-10, 25), (20, 55)),
+])
+def test_outside_segments_are_not_visible(start, end):
+    assert not clip(start, end)[2]
+
+
+def test_crossing_segments_end_at_the_boundaries():
+    clipped_start, clipped_end, visible = clip((-10, 15), (50, 15))
+    assert visible
+    np.testing.assert_allclose(clipped_start, (0, 15))
+    np.testing.assert_allclose(clipped_end, (WIDTH, 15))
+
+    # diagonal, through the left and the top boundary
+    clipped_start, clipped_end, visible = clip((-5, 10), (10, -5))
+    assert visible
+    np.testing.assert_allclose(clipped_start, (0, 5))
+    np.testing.assert_allclose(clipped_end, (5, 0))
+
+
+def test_invisible_segments_stay_invisible():
+    assert not clip((1, 2), (30, 20), visible=False)[2]
+
+
+def test_rasterized_lines():
+    out = np.zeros((2, HEIGHT, WIDTH, 3), dtype=np.uint8)
+    starts = np.array([[(2, 3), (-10, 10)], [(5, 5), (0, 0)]], dtype=np.float32)
+    ends = np.array([[(12, 3), (100, 10)], [(5, 20), (0, 0)]], dtype=np.float32)
+    visible = np.array([[True, True], [True, False]])
+    rasterize_segments(starts, ends, visible, out)
+
+    expected = np.zeros((2, HEIGHT, WIDTH), dtype=bool)
+    expected[0, 3, 2:13] = True
+    expected[0, 10, :] = True
+    expected[1, 5:21, 5] = True
+    np.testing.assert_array_equal(out.any(axis=-1), expected)
+
+
+def test_rasterize_into_a_view():
+    out = np.zeros((1, HEIGHT, 2 * WIDTH, 3), dtype=np.uint8)
+    view = out[:, :, ::2]
+    rasterize_segments(np.array([[(0, 1)]], dtype=np.float32),
+                       np.array([[(WIDTH - 1, 1)]], dtype=np.float32), np.array([[True]]), view)
+    assert np.all(view[0, 1] == 255)
+    assert np.all(out[0, 1, 1::2] == 0)
+
+
+def test_projection_of_the_camera_axis():
+    # the point in front of the camera lands in the image center, behind it is not visible
+    pixels, visible = project(np.array([[0, 0.5, 0], [0, 0.5, 10]]), WIDTH, HEIGHT)
+    np.testing.assert_allclose(pixels[0], (WIDTH / 2., HEIGHT / 2.))
+    np.testing.assert_array_equal(visible, [True, False])
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+keras = pytest.importorskip("keras")
+
+import keras.backend as K  # noqa: E402
+from keras.layers import GRU, Input  # noqa: E402
+from keras.models import Model  # noqa: E402
+
+from learn.networks.layers import WindowedGRU  # noqa: E402
+
+BATCH_SIZE = 2
+WINDOW_LENGTH = 3
+N_WINDOWS = 4
+DATA_DIM = 5
+UNITS = 6
+
+
+@pytest.fixture
+def layers():
+    windowed = WindowedGRU(UNITS, BATCH_SIZE, return_sequences=True)
+    window_input = Input(shape=(WINDOW_LENGTH, DATA_DIM))
+    windowed_model = Model(window_input, windowed(window_input))
+    stateless_model = Model(window_input, windowed(window_input, stateless=True))
+
+    # the reference, a plain GRU with the same weights over any number of timesteps
+    gru = GRU(UNITS, return_sequences=True)
+    sequence_input = Input(shape=(None, DATA_DIM))
+    gru_model = Model(sequence_input, gru(sequence_input))
+    gru.set_weights(windowed.get_weights())
+
+    window_fn = K.function([window_input], [windowed_model.outputs[0]],
+                           updates=windowed_model.updates)
+    stateless_fn = K.function([window_input], [stateless_model.outputs[0]])
+    return windowed, window_fn, stateless_fn, gru_model
+
+
+def random_sequences(n):
+    return np.random.normal(size=(n, WINDOW_LENGTH * N_WINDOWS, DATA_DIM)).astype(np.float32)
+
+
+def windows(sequences):
+    return [sequences[:, w * WINDOW_LENGTH:(w + 1) * WINDOW_LENGTH] for w in range(N_WINDOWS)]
+
+
+def test_windows_chain_and_reset(layers):
+    windowed, window_fn, stateless_fn, gru_model = layers
+
+    for _ in range(2):
+        # every sequence starts from zero states, its windows continue the previous ones
+        windowed.reset_states()
+        sequences = random_sequences(BATCH_SIZE)
+        outputs = []
+        for window in windows(sequences):
+            outputs.append(window_fn([window])[0])
+            # the stateless calls do not touch the states of the chain
+            stateless_fn([window])
+
+        np.testing.assert_allclose(np.concatenate(outputs, axis=1), gru_model.predict(sequences),
+                                   rtol=1e-4, atol=1e-5)
+
+
+def test_stateless_calls_are_independent_windows(layers):
+    windowed, window_fn, stateless_fn, gru_model = layers
+
+    window_fn([windows(random_sequences(BATCH_SIZE))[0]])
+    # any batch size, zero initial states
+    window = windows(random_sequences(BATCH_SIZE + 3))[1]
+    np.testing.assert_allclose(stateless_fn([window])[0], gru_model.predict(window),
+                               rtol=1e-4, atol=1e-5)
+
+
+def test_infogan_resets_states_at_sequence_starts():
+    from learn.models.infogan import InfoGAN2
+
+    class NoLosses(object):
+        metrics_names = []
+
+    model = InfoGAN2.__new__(InfoGAN2)
+    model.windows_per_sequence = 3
+    model.n_windows_trained = 0
+    model.disc_train_model = model.gen_train_model = NoLosses()
+    model._train_disc_pass = lambda samples, labels=None: []
+    model._train_gen_pass = lambda: []
+
+    resets = []
+    trained = []
+    model.reset_states = lambda: resets.append(len(trained))
+    for i in range(8):
+        model.train_on_minibatch(None)
+        trained.append(i)
+
+    assert resets == [0, 3, 6]